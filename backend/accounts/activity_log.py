@@ -0,0 +1,176 @@
+"""
+Journal d'activité des utilisateurs écrit par lots
+"""
+
+import atexit
+import logging
+import threading
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Case, DateTimeField, F, Q, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLogService:
+    """
+    Enregistre les UserActivity sans INSERT dans la requête HTTP
+
+    Chaque activité est horodatée à l'appel puis, une fois la transaction
+    validée, ajoutée à un tampon propre au processus.
+
+    Le tampon est écrit en un seul bulk_create, toujours hors de la requête.
+    L'écriture a lieu dans un thread, immédiatement si le tampon atteint
+    ACTIVITY_LOG_BATCH_SIZE entrées, sinon au plus tard
+    ACTIVITY_LOG_FLUSH_INTERVAL secondes après la première entrée.
+
+    Le même lot met à jour la dernière activité de chaque utilisateur
+    concerné (un seul UPDATE), sans jamais la faire reculer. Le tampon est
+    vidé à l'arrêt du processus (atexit).
+    """
+
+    _lock = threading.Lock()
+    _pending = []
+    _last_activity = {}
+    _timer = None
+
+    # ===== ENREGISTREMENT =====
+
+    @staticmethod
+    def record(user, action: str, description: str,
+               ip_address: Optional[str] = None, user_agent: Optional[str] = None):
+        """
+        Ajoute une activité au journal
+
+        Args:
+            user: Utilisateur auteur de l'action
+            action: Code de l'action (UserActivity.ACTION_CHOICES)
+            description: Description lisible
+            ip_address: Adresse IP du client
+            user_agent: User-Agent du client
+        """
+        from .models import UserActivity
+
+        activity = UserActivity(
+            user_id=user.pk,
+            action=action,
+            description=description,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            timestamp=timezone.now()
+        )
+        # Une action annulée avec sa transaction n'est pas journalisée
+        transaction.on_commit(lambda: ActivityLogService.enqueue(activity))
+
+    @staticmethod
+    def record_request(request, user, action: str, description: str):
+        """Ajoute une activité avec l'adresse IP et le User-Agent de la requête"""
+        ActivityLogService.record(
+            user, action, description,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT')
+        )
+
+    @staticmethod
+    def enqueue(activity):
+        """Ajoute une activité au tampon et déclenche l'écriture si nécessaire"""
+        cls = ActivityLogService
+        with cls._lock:
+            cls._pending.append(activity)
+            previous = cls._last_activity.get(activity.user_id)
+            if previous is None or activity.timestamp > previous:
+                cls._last_activity[activity.user_id] = activity.timestamp
+
+            if len(cls._pending) >= getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 50):
+                delay = 0
+            elif cls._timer is None:
+                delay = getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 2.0)
+            else:
+                return
+
+            if cls._timer is not None:
+                cls._timer.cancel()
+            cls._timer = cls._start_timer(delay, cls._flush_in_thread)
+
+    # ===== ÉCRITURE =====
+
+    @staticmethod
+    def _start_timer(delay, function):
+        """Lance l'écriture différée dans un thread (remplacé dans les tests)"""
+        timer = threading.Timer(delay, function)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    @staticmethod
+    def _flush_in_thread():
+        try:
+            ActivityLogService.flush()
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def flush() -> int:
+        """
+        Écrit les activités en attente (un INSERT groupé et un UPDATE)
+
+        Returns:
+            Nombre d'activités écrites
+        """
+        cls = ActivityLogService
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+            activities, last_activity = cls._pending, cls._last_activity
+            cls._pending, cls._last_activity, cls._timer = [], {}, None
+
+        if not activities:
+            return 0
+
+        try:
+            return cls._write(activities, last_activity)
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'écriture du journal d'activité: {str(e)}")
+            return 0
+
+    @staticmethod
+    def _write(activities: List, last_activity: dict) -> int:
+        from .models import User, UserActivity
+
+        try:
+            with transaction.atomic():
+                UserActivity.objects.bulk_create(activities)
+        except DatabaseError:
+            # Un utilisateur supprimé entre-temps fait échouer tout le lot :
+            # écriture une par une pour conserver les autres activités
+            written = []
+            for activity in activities:
+                try:
+                    with transaction.atomic():
+                        activity.save(force_insert=True)
+                    written.append(activity)
+                except DatabaseError:
+                    logger.warning(f"Activité ignorée pour l'utilisateur {activity.user_id}")
+            activities = written
+
+        if last_activity:
+            # Pas de save() : ni écrasement des autres champs, ni invalidation
+            # de l'utilisateur en cache pour un simple horodatage. Une valeur
+            # plus récente (connexion écrite entre-temps) est conservée.
+            User.objects.filter(pk__in=last_activity).update(last_activity=Case(
+                *[
+                    When(Q(pk=user_id) & (Q(last_activity__isnull=True) | Q(last_activity__lt=timestamp)),
+                         then=Value(timestamp))
+                    for user_id, timestamp in last_activity.items()
+                ],
+                default=F('last_activity'),
+                output_field=DateTimeField()
+            ))
+
+        return len(activities)
+
+
+atexit.register(ActivityLogService.flush)
@@ -0,0 +1,93 @@
+"""
+Authentification JWT avec cache de l'utilisateur
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication sans SELECT de l'utilisateur à chaque requête
+
+    Les champs de l'utilisateur (sauf le mot de passe, chargé à la demande)
+    sont mis en cache pour AUTH_PRINCIPAL_CACHE_TIMEOUT secondes sous une clé
+    (utilisateur, identifiant du jeton). Chaque entrée porte la version de
+    l'utilisateur, incrémentée à chaque enregistrement ou suppression du User
+    (changement de rôle, désactivation, déconnexion...) : une entrée d'une
+    ancienne version est ignorée. La version initiale est horodatée plutôt
+    que fixée à 0 : après éviction de la clé, la nouvelle version ne peut pas
+    correspondre à une entrée mise en cache auparavant. Les permissions
+    restent résolues par PermissionResolver, avec leur propre version.
+
+    Cache indisponible : l'utilisateur est lu en base, et son enregistrement
+    n'échoue pas faute de pouvoir l'invalider.
+    """
+
+    CACHE_KEY = 'auth:principal:{user_id}:{token_id}'
+    VERSION_KEY = 'auth:principal_version:{user_id}'
+    EXCLUDED_FIELDS = ('password',)
+
+    def get_user(self, validated_token):
+        token_id = validated_token.get(api_settings.JTI_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+
+        # La vérification de révocation compare le hash du mot de passe : pas de cache
+        if api_settings.CHECK_REVOKE_TOKEN or token_id is None or user_id is None:
+            return super().get_user(validated_token)
+
+        principal_key = self.CACHE_KEY.format(user_id=user_id, token_id=token_id)
+        version_key = self.VERSION_KEY.format(user_id=user_id)
+        try:
+            cached = cache.get_many([principal_key, version_key])
+        except Exception as e:
+            logger.warning(f"Cache des utilisateurs indisponible: {str(e)}")
+            return super().get_user(validated_token)
+        version = cached.get(version_key)
+        if version is None:
+            version = cache.get_or_set(version_key, time.time_ns, None)
+
+        principal = cached.get(principal_key)
+        if principal is not None and principal['version'] == version:
+            return self.user_model.from_db(
+                router.db_for_read(self.user_model),
+                principal['fields'],
+                principal['values']
+            )
+
+        user = super().get_user(validated_token)
+
+        fields = [
+            field.attname for field in self.user_model._meta.concrete_fields
+            if field.attname not in self.EXCLUDED_FIELDS
+        ]
+        try:
+            cache.set(principal_key, {
+                'version': version,
+                'fields': fields,
+                'values': [getattr(user, field) for field in fields]
+            }, getattr(settings, 'AUTH_PRINCIPAL_CACHE_TIMEOUT', 60))
+        except Exception as e:
+            logger.warning(f"Cache des utilisateurs indisponible: {str(e)}")
+
+        return user
+
+    @staticmethod
+    def invalidate(user_id):
+        """Invalide toutes les entrées en cache d'un utilisateur"""
+        key = CachedJWTAuthentication.VERSION_KEY.format(user_id=user_id)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f"Invalidation de l'utilisateur {user_id} en cache impossible: {str(e)}")
@@ -0,0 +1,106 @@
+"""
+Commande Django pour mesurer le coût de l'authentification JWT par requête
+"""
+
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import CachedJWTAuthentication
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compare les requêtes SQL par appel API avec JWTAuthentication et CachedJWTAuthentication'
+
+    DEFAULT_ENDPOINTS = [
+        '/api/sales/',
+        '/api/sales/tables/list/',
+        '/api/sales/reservations/today/',
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            required=True,
+            help='Utilisateur qui effectue les appels',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=20,
+            help='Nombre d\'appels par endpoint (défaut: 20)',
+        )
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            dest='endpoints',
+            help='Endpoint à mesurer (répétable, endpoints des ventes par défaut)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur {options['username']} introuvable")
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        endpoints = options['endpoints'] or self.DEFAULT_ENDPOINTS
+
+        self.stdout.write(
+            self.style.SUCCESS(f"🚀 Authentification JWT: {options['requests']} appels par endpoint")
+        )
+
+        for endpoint in endpoints:
+            self.stdout.write(f'\n📍 {endpoint}')
+            results = {}
+            for authentication_class in (JWTAuthentication, CachedJWTAuthentication):
+                results[authentication_class] = self.measure(
+                    client, endpoint, authentication_class, options['requests']
+                )
+                queries, user_queries, milliseconds, status_code = results[authentication_class]
+                self.stdout.write(
+                    f'   {authentication_class.__name__:<25} HTTP {status_code}  '
+                    f'{queries:.1f} requêtes/appel (dont {user_queries:.1f} sur accounts_user)  '
+                    f'{milliseconds:.1f} ms/appel'
+                )
+
+            saved = results[JWTAuthentication][0] - results[CachedJWTAuthentication][0]
+            self.stdout.write(self.style.SUCCESS(f'   ✅ {saved:.1f} requête(s) économisée(s) par appel'))
+
+    def measure(self, client, endpoint, authentication_class, count):
+        """
+        Appelle l'endpoint count fois après un premier appel de préchauffage
+
+        Returns:
+            (requêtes/appel, requêtes accounts_user/appel, ms/appel, dernier code HTTP)
+        """
+        # get_authenticators plutôt que authentication_classes : les vues
+        # @api_view copient cet attribut à la décoration
+        with mock.patch.object(APIView, 'get_authenticators', lambda view: [authentication_class()]):
+            client.get(endpoint)
+
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                for _ in range(count):
+                    response = client.get(endpoint)
+                elapsed = time.perf_counter() - started
+
+        user_queries = sum(
+            1 for query in context.captured_queries
+            if 'FROM "accounts_user"' in query['sql'] and '"accounts_user"."password"' in query['sql']
+        )
+        return (
+            len(context.captured_queries) / count,
+            user_queries / count,
+            elapsed * 1000 / count,
+            response.status_code
+        )
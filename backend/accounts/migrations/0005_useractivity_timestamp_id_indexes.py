@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_useractivity_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['timestamp', 'id'], name='activity_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='activity_user_timestamp_idx'),
+        ),
+    ]
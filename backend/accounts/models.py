@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import RegexValidator
+from django.utils import timezone
 
 class User(AbstractUser):
     """
@@ -132,12 +133,9 @@ class User(AbstractUser):
         if self.role == 'admin':
             return True
 
-        # Vérifier les permissions personnalisées
-        return self.custom_permissions.filter(
-            permission__code=permission_code,
-            permission__is_active=True,
-            is_active=True
-        ).exists()
+        # Vérifier les permissions personnalisées (chargées une fois, en cache)
+        from .permission_resolver import PermissionResolver
+        return permission_code in PermissionResolver.get_codes(self)
 
     def get_permissions(self):
         """
@@ -162,17 +160,18 @@ class User(AbstractUser):
         """
         Retourne les permissions groupées par catégorie
         """
-        permissions = self.get_permissions()
+        from .permission_resolver import PermissionResolver
+
         grouped = {}
 
-        for permission in permissions:
-            category = permission.category
+        for permission in PermissionResolver.get_permissions(self):
+            category = permission['category']
             if category not in grouped:
                 grouped[category] = []
             grouped[category].append({
-                'code': permission.code,
-                'name': permission.name,
-                'description': permission.description
+                'code': permission['code'],
+                'name': permission['name'],
+                'description': permission['description']
             })
 
         return grouped
@@ -224,8 +223,10 @@ class UserActivity(models.Model):
         verbose_name='User Agent'
     )
 
+    # Horodatage de l'action, pas de l'écriture (journal écrit par lots)
     timestamp = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name='Horodatage'
     )
 
@@ -233,6 +234,11 @@ class UserActivity(models.Model):
         verbose_name = 'Activité utilisateur'
         verbose_name_plural = 'Activités utilisateurs'
         ordering = ['-timestamp']
+        indexes = [
+            # Pagination par curseur (timestamp, id), globale et par utilisateur
+            models.Index(fields=['timestamp', 'id'], name='activity_timestamp_id_idx'),
+            models.Index(fields=['user', 'timestamp', 'id'], name='activity_user_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.get_action_display()} - {self.timestamp}"
@@ -0,0 +1,109 @@
+"""
+Résolution des permissions des utilisateurs avec cache
+"""
+
+import time
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class PermissionResolver:
+    """
+    Service pour charger les permissions d'un utilisateur une seule fois
+
+    L'ensemble des permissions actives d'un utilisateur est chargé en une
+    requête, mis en cache sous une clé versionnée (version globale + version
+    de l'utilisateur + rôle), puis mémorisé sur l'instance User, donc pour
+    la durée de la requête HTTP. En régime établi, une vérification de
+    permission ne coûte aucune requête SQL.
+
+    Les versions sont incrémentées à chaque modification d'une UserPermission
+    (version de l'utilisateur) ou d'une Permission (version globale). Une
+    version absente est créée horodatée : après éviction, elle ne peut pas
+    retrouver une valeur déjà utilisée, ni servir une permission retirée.
+    """
+
+    GLOBAL_VERSION_KEY = 'permissions:version'
+    USER_VERSION_KEY = 'permissions:version:{user_id}'
+    MEMO_ATTRIBUTE = '_resolved_permissions'
+
+    # ===== LECTURE =====
+
+    @staticmethod
+    def get_permissions(user) -> List[Dict]:
+        """
+        Permissions actives de l'utilisateur, triées par catégorie et nom
+
+        Returns:
+            [{'code', 'name', 'description', 'category'}]
+        """
+        memo = getattr(user, PermissionResolver.MEMO_ATTRIBUTE, None)
+        if memo is not None:
+            return memo
+
+        version_keys = [
+            PermissionResolver.GLOBAL_VERSION_KEY,
+            PermissionResolver.USER_VERSION_KEY.format(user_id=user.pk)
+        ]
+        versions = cache.get_many(version_keys)
+        for key in version_keys:
+            if key not in versions:
+                versions[key] = cache.get_or_set(key, time.time_ns, None)
+        cache_key = f"permissions:{user.pk}:{user.role}:{versions[version_keys[0]]}:{versions[version_keys[1]]}"
+
+        permissions = cache.get(cache_key)
+        if permissions is None:
+            permissions = PermissionResolver.load_permissions(user)
+            cache.set(cache_key, permissions, getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 3600))
+
+        setattr(user, PermissionResolver.MEMO_ATTRIBUTE, permissions)
+        return permissions
+
+    @staticmethod
+    def load_permissions(user) -> List[Dict]:
+        """Charge les permissions depuis la base (une requête)"""
+        from .models import Permission
+
+        queryset = Permission.objects.filter(is_active=True)
+        if user.role != 'admin':
+            # Les admins ont toutes les permissions
+            queryset = queryset.filter(
+                user_assignments__user=user,
+                user_assignments__is_active=True
+            ).distinct()
+
+        return list(
+            queryset.order_by('category', 'name')
+            .values('code', 'name', 'description', 'category')
+        )
+
+    @staticmethod
+    def get_codes(user) -> frozenset:
+        """Codes des permissions actives de l'utilisateur"""
+        return frozenset(permission['code'] for permission in PermissionResolver.get_permissions(user))
+
+    # ===== INVALIDATION =====
+
+    @staticmethod
+    def _bump(key: str):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+
+    @staticmethod
+    def invalidate_user(user_id: int):
+        """Nouvelle version des permissions d'un utilisateur"""
+        PermissionResolver._bump(PermissionResolver.USER_VERSION_KEY.format(user_id=user_id))
+
+    @staticmethod
+    def invalidate_all():
+        """Nouvelle version des permissions de tous les utilisateurs"""
+        PermissionResolver._bump(PermissionResolver.GLOBAL_VERSION_KEY)
+
+    @staticmethod
+    def forget(user):
+        """Oublie les permissions mémorisées sur l'instance"""
+        user.__dict__.pop(PermissionResolver.MEMO_ATTRIBUTE, None)
@@ -0,0 +1,34 @@
+"""
+Signaux d'invalidation des permissions en cache
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import CachedJWTAuthentication
+from .models import Permission, User, UserPermission
+from .permission_resolver import PermissionResolver
+
+
+@receiver([post_save, post_delete], sender=UserPermission)
+def invalidate_user_permissions(sender, instance, **kwargs):
+    """Une permission attribuée a changé : nouvelle version pour l'utilisateur"""
+    PermissionResolver.invalidate_user(instance.user_id)
+    # Après validation aussi, pour qu'une lecture concurrente pendant la
+    # transaction ne remette pas en cache l'ancien état
+    transaction.on_commit(lambda: PermissionResolver.invalidate_user(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=Permission)
+def invalidate_all_permissions(sender, instance, **kwargs):
+    """Une permission a changé : nouvelle version pour tous les utilisateurs"""
+    PermissionResolver.invalidate_all()
+    transaction.on_commit(PermissionResolver.invalidate_all)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    """Rôle, statut ou session modifiés : l'utilisateur en cache n'est plus valide"""
+    CachedJWTAuthentication.invalidate(instance.pk)
+    transaction.on_commit(lambda: CachedJWTAuthentication.invalidate(instance.pk))
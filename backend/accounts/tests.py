@@ -1,3 +1,272 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .activity_log import ActivityLogService
+from .models import Permission, User, UserActivity, UserPermission
+from .permission_resolver import PermissionResolver
+
+
+class PermissionResolverTests(TestCase):
+    """Tests du cache des permissions utilisateur"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='x', role='admin')
+        cls.cashier = User.objects.create_user(username='caissier', password='x', role='cashier')
+        cls.sales_view = Permission.objects.create(code='sales_view', name='Voir les ventes', category='sales')
+        cls.reports_view = Permission.objects.create(code='reports_view', name='Voir les rapports', category='reports')
+        UserPermission.objects.create(user=cls.cashier, permission=cls.sales_view)
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh_user(self):
+        """Nouvelle instance, comme pour une nouvelle requête"""
+        return User.objects.get(pk=self.cashier.pk)
+
+    def test_checks_cost_no_query_in_steady_state(self):
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_permission('sales_view'))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_permission('sales_view'))
+            self.assertFalse(user.has_permission('reports_view'))
+            self.assertEqual(
+                user.get_permissions_by_category(),
+                {'sales': [{'code': 'sales_view', 'name': 'Voir les ventes', 'description': None}]}
+            )
+
+    def test_assignment_changes_are_visible(self):
+        self.assertFalse(self.fresh_user().has_permission('reports_view'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserPermission.objects.create(user=self.cashier, permission=self.reports_view)
+        self.assertTrue(self.fresh_user().has_permission('reports_view'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sales_view.is_active = False
+            self.sales_view.save()
+        self.assertFalse(self.fresh_user().has_permission('sales_view'))
+
+    def test_evicted_versions_are_never_reused(self):
+        from .permission_resolver import PermissionResolver
+
+        self.assertTrue(self.fresh_user().has_permission('sales_view'))
+
+        # Versions évincées pendant que la permission est retirée
+        cache.delete_many([
+            PermissionResolver.GLOBAL_VERSION_KEY,
+            PermissionResolver.USER_VERSION_KEY.format(user_id=self.cashier.pk)
+        ])
+        UserPermission.objects.filter(user=self.cashier).update(is_active=False)
+        self.assertFalse(self.fresh_user().has_permission('sales_view'))
+
+    def test_assign_permissions_view_invalidates(self):
+        from rest_framework.test import APIClient
+
+        self.assertFalse(self.fresh_user().has_permission('reports_view'))
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post(
+            f'/api/accounts/users/{self.cashier.pk}/assign-permissions/',
+            {'permissions': ['reports_view']}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        user = self.fresh_user()
+        self.assertTrue(user.has_permission('reports_view'))
+        self.assertFalse(user.has_permission('sales_view'))
+
+    def test_admin_has_every_permission(self):
+        self.assertEqual(PermissionResolver.get_codes(self.admin), {'sales_view', 'reports_view'})
+
+
+@override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0)
+class CachedJWTAuthenticationTests(TestCase):
+    """Tests de l'authentification JWT avec utilisateur en cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='serveur', password='x', role='server')
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        cache.clear()
+        timer = mock.patch.object(ActivityLogService, '_start_timer')
+        timer.start()
+        self.addCleanup(timer.stop)
+        self.addCleanup(ActivityLogService.flush)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def profile(self):
+        return self.client.get('/api/accounts/profile/')
+
+    def count_user_selects(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/sales/')
+        self.assertEqual(response.status_code, 200)
+        return sum(1 for query in context.captured_queries if 'FROM "accounts_user"' in query['sql'])
+
+    def test_user_is_loaded_once(self):
+        self.assertEqual(self.count_user_selects(), 1)
+        self.assertEqual(self.count_user_selects(), 0)
+
+    def test_role_change_and_deactivation_invalidate(self):
+        self.assertEqual(self.profile().data['role'], 'server')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = 'cashier'
+            self.user.save()
+        self.assertEqual(self.profile().data['role'], 'cashier')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_evicted_version_is_never_reused(self):
+        from .authentication import CachedJWTAuthentication
+
+        version_key = CachedJWTAuthentication.VERSION_KEY.format(user_id=self.user.pk)
+        self.assertEqual(self.profile().data['role'], 'server')
+
+        # Version évincée pendant que l'utilisateur est rétrogradé
+        cache.delete(version_key)
+        User.objects.filter(pk=self.user.pk).update(role='cashier')
+        self.assertEqual(self.profile().data['role'], 'cashier')
+
+        cache.delete(version_key)
+        CachedJWTAuthentication.invalidate(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_unavailable_cache_falls_back_to_database(self):
+        error = ConnectionError('cache indisponible')
+        with mock.patch.multiple(cache, get_many=mock.Mock(side_effect=error),
+                                 set=mock.Mock(side_effect=error), incr=mock.Mock(side_effect=error)):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.role = 'cashier'
+                self.user.save()
+            response = self.profile()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['role'], 'cashier')
+
+    def test_logout_invalidates(self):
+        from .authentication import CachedJWTAuthentication
+
+        self.profile()
+        version_key = CachedJWTAuthentication.VERSION_KEY.format(user_id=self.user.pk)
+        version = cache.get(version_key, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/accounts/logout/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(cache.get(version_key), version)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active_session)
+
+
+class ActivityLogServiceTests(TestCase):
+    """Tests du journal d'activité écrit par lots"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'serveur{index}', password='x', role='server')
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.timer = mock.patch.object(ActivityLogService, '_start_timer').start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(ActivityLogService.flush)
+
+    def test_login_does_not_insert_activity(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(2):
+                response = self.client.post(
+                    '/api/accounts/login/', {'username': 'serveur0', 'password': 'x'},
+                    HTTP_USER_AGENT='Tablette'
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserActivity.objects.exists())
+        self.assertTrue(User.objects.get(pk=self.users[0].pk).is_active_session)
+        self.timer.assert_called_once()
+
+        # INSERT groupé et UPDATE de last_activity, dans un savepoint
+        with self.assertNumQueries(4):
+            self.assertEqual(ActivityLogService.flush(), 1)
+
+        activity = UserActivity.objects.get()
+        self.assertEqual((activity.action, activity.user_agent), ('login', 'Tablette'))
+
+    def test_flush_writes_one_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users * 4:
+                ActivityLogService.record(user, 'view', 'Consultation')
+
+        with self.assertNumQueries(4):
+            self.assertEqual(ActivityLogService.flush(), 12)
+
+        self.assertEqual(UserActivity.objects.count(), 12)
+        last = UserActivity.objects.filter(user=self.users[1]).order_by('-timestamp').first()
+        self.assertEqual(User.objects.get(pk=self.users[1].pk).last_activity, last.timestamp)
+        self.assertEqual(ActivityLogService.flush(), 0)
+
+    def test_flush_never_moves_last_activity_back(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ActivityLogService.record(self.users[0], 'view', 'Consultation')
+            ActivityLogService.record(self.users[1], 'view', 'Consultation')
+
+        # Connexion enregistrée directement après la mise en tampon
+        later = timezone.now() + timedelta(minutes=1)
+        User.objects.filter(pk=self.users[0].pk).update(last_activity=later)
+        ActivityLogService.flush()
+
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).last_activity, later)
+        self.assertEqual(
+            User.objects.get(pk=self.users[1].pk).last_activity,
+            UserActivity.objects.get(user=self.users[1]).timestamp
+        )
+
+    @override_settings(ACTIVITY_LOG_BATCH_SIZE=5)
+    def test_batch_size_triggers_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(4):
+                ActivityLogService.record(self.users[0], 'view', 'Consultation')
+        self.assertFalse(UserActivity.objects.exists())
+
+        self.assertEqual(self.timer.call_args.args[0], 2.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ActivityLogService.record(self.users[0], 'view', 'Consultation')
+        # Lot complet : écriture immédiate, mais dans le thread du minuteur
+        self.assertFalse(UserActivity.objects.exists())
+        self.timer.assert_called_with(0, ActivityLogService._flush_in_thread)
+        self.assertEqual(ActivityLogService.flush(), 5)
+        self.assertEqual(UserActivity.objects.count(), 5)
+
+    def test_rolled_back_action_is_not_logged(self):
+        from django.db import transaction
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                ActivityLogService.record(self.users[0], 'view', 'Consultation')
+                raise ValueError
+
+        self.assertEqual(ActivityLogService.flush(), 0)
@@ -12,7 +12,12 @@ from django.core.mail import send_mail
 from django.conf import settings
 import secrets
 import string
+
+from core.pagination import TimestampKeysetPagination
+
+from .activity_log import ActivityLogService
 from .models import User, UserActivity, Permission, UserPermission
+from .permission_resolver import PermissionResolver
 from .serializers import (
     UserSerializer, UserLoginSerializer, UserActivitySerializer,
     ChangePasswordSerializer, UserProfileSerializer, UserWithPermissionsSerializer,
@@ -58,10 +63,9 @@ class UserListCreateView(generics.ListCreateAPIView):
         user = serializer.save()
 
         # Enregistrer l'activité
-        UserActivity.objects.create(
-            user=self.request.user,
-            action='create',
-            description=f"Création de l'utilisateur {user.username}"
+        ActivityLogService.record(
+            self.request.user, 'create',
+            f"Création de l'utilisateur {user.username}"
         )
 
 
@@ -84,10 +88,9 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
         user = serializer.save()
 
         # Enregistrer l'activité
-        UserActivity.objects.create(
-            user=self.request.user,
-            action='update',
-            description=f"Modification de l'utilisateur {user.username}"
+        ActivityLogService.record(
+            self.request.user, 'update',
+            f"Modification de l'utilisateur {user.username}"
         )
 
     def perform_destroy(self, instance):
@@ -96,10 +99,9 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
             raise permissions.PermissionDenied("Seuls les admins peuvent supprimer des utilisateurs.")
 
         # Enregistrer l'activité avant suppression
-        UserActivity.objects.create(
-            user=self.request.user,
-            action='delete',
-            description=f"Suppression de l'utilisateur {instance.username}"
+        ActivityLogService.record(
+            self.request.user, 'delete',
+            f"Suppression de l'utilisateur {instance.username}"
         )
 
         instance.delete()
@@ -122,16 +124,10 @@ def login_view(request):
         # Mettre à jour le statut de session
         user.is_active_session = True
         user.last_activity = timezone.now()
-        user.save()
+        user.save(update_fields=['is_active_session', 'last_activity'])
 
         # Enregistrer l'activité de connexion
-        UserActivity.objects.create(
-            user=user,
-            action='login',
-            description='Connexion réussie',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT')
-        )
+        ActivityLogService.record_request(request, user, 'login', 'Connexion réussie')
 
         return Response({
             'message': 'Connexion réussie',
@@ -153,16 +149,10 @@ def logout_view(request):
     """
     user = request.user
     user.is_active_session = False
-    user.save()
+    user.save(update_fields=['is_active_session'])
 
     # Enregistrer l'activité de déconnexion
-    UserActivity.objects.create(
-        user=user,
-        action='logout',
-        description='Déconnexion',
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT')
-    )
+    ActivityLogService.record_request(request, user, 'logout', 'Déconnexion')
 
     return Response({'message': 'Déconnexion réussie'}, status=status.HTTP_200_OK)
 
@@ -183,11 +173,7 @@ def profile_view(request):
             serializer.save()
             
             # Enregistrer l'activité
-            UserActivity.objects.create(
-                user=request.user,
-                action='update',
-                description='Mise à jour du profil'
-            )
+            ActivityLogService.record(request.user, 'update', 'Mise à jour du profil')
             
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -216,11 +202,7 @@ def preferences_view(request):
         # Dans une implémentation complète, on sauvegarderait dans un modèle UserPreferences
         
         # Enregistrer l'activité
-        UserActivity.objects.create(
-            user=request.user,
-            action='update',
-            description='Mise à jour des préférences'
-        )
+        ActivityLogService.record(request.user, 'update', 'Mise à jour des préférences')
         
         updated_preferences = {
             'language': language or 'fr',
@@ -243,11 +225,7 @@ def change_password_view(request):
         user.save()
 
         # Enregistrer l'activité
-        UserActivity.objects.create(
-            user=user,
-            action='update',
-            description='Changement de mot de passe'
-        )
+        ActivityLogService.record(user, 'update', 'Changement de mot de passe')
 
         return Response({'message': 'Mot de passe changé avec succès'}, status=status.HTTP_200_OK)
 
@@ -256,17 +234,19 @@ def change_password_view(request):
 
 class UserActivityListView(generics.ListAPIView):
     """
-    Vue pour lister les activités des utilisateurs
+    Vue pour lister les activités des utilisateurs (paginées par curseur
+    sur timestamp, id)
     """
     serializer_class = UserActivitySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TimestampKeysetPagination
 
     def get_queryset(self):
         # Les admins voient toutes les activités, les autres seulement les leurs
         if self.request.user.is_admin:
-            return UserActivity.objects.all()
+            return UserActivity.objects.select_related('user')
         else:
-            return UserActivity.objects.filter(user=self.request.user)
+            return UserActivity.objects.filter(user=self.request.user).select_related('user')
 
 
 @api_view(['GET'])
@@ -277,8 +257,7 @@ def check_permissions_view(request):
     """
     user = request.user
     # Créer un dictionnaire de permissions pour un accès rapide
-    user_permissions = user.get_permissions()
-    permissions_dict = {perm.code: True for perm in user_permissions}
+    permissions_dict = {code: True for code in PermissionResolver.get_codes(user)}
 
     permissions_data = {
         'role': user.role,
@@ -367,11 +346,13 @@ def assign_permissions_view(request, user_id):
         )
         created_permissions.append(user_permission)
 
+    # Nouvelle version des permissions en cache de l'utilisateur
+    PermissionResolver.invalidate_user(user.id)
+
     # Enregistrer l'activité
-    UserActivity.objects.create(
-        user=request.user,
-        action='update',
-        description=f"Attribution de {len(created_permissions)} permissions à {user.username}"
+    ActivityLogService.record(
+        request.user, 'update',
+        f"Attribution de {len(created_permissions)} permissions à {user.username}"
     )
 
     return Response({
@@ -450,12 +431,9 @@ def reset_password_view(request, pk):
     user.save()
 
     # Enregistrer l'activité avec le mot de passe temporaire pour référence admin
-    UserActivity.objects.create(
-        user=request.user,
-        action='reset_password',
-        description=f'Mot de passe réinitialisé pour {user.get_full_name()} - Mot de passe temporaire: {temp_password}',
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
+    ActivityLogService.record_request(
+        request, request.user, 'reset_password',
+        f'Mot de passe réinitialisé pour {user.get_full_name()} - Mot de passe temporaire: {temp_password}'
     )
 
     return Response({
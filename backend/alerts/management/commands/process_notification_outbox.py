@@ -0,0 +1,51 @@
+"""
+Commande Django pour envoyer les notifications en attente (sans Celery)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from alerts.outbox import OutboxService
+
+
+class Command(BaseCommand):
+    help = 'Envoie les notifications de la file NotificationOutbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Tourner en continu (quand Redis/Celery ne sont pas disponibles)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Pause en secondes entre deux passes quand la file est vide',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Nombre maximum de notifications par passe',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            summary = OutboxService.drain(batch_size=options['batch_size'])
+            if any(summary.values()):
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"📨 Envoyées: {summary['sent']}, à réessayer: {summary['retried']}, "
+                        f"abandonnées: {summary['failed']}"
+                    )
+                )
+
+            if not options['loop']:
+                break
+
+            # Repasser immédiatement si le lot était plein
+            processed = sum(summary.values())
+            if processed < options['batch_size']:
+                time.sleep(options['interval'])
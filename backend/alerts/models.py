@@ -118,3 +118,84 @@ class Alert(models.Model):
         if user:
             self.resolved_by = user
         self.save()
+
+
+class NotificationOutbox(models.Model):
+    """
+    File d'attente durable des notifications (email, SMS, WebSocket)
+
+    Les messages sont écrits dans la même transaction que l'événement qui
+    les déclenche, puis envoyés par un worker (voir alerts.outbox).
+    """
+
+    CHANNELS = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+        ('websocket', 'WebSocket'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sent', 'Envoyé'),
+        ('failed', 'Échec'),
+    ]
+
+    channel = models.CharField(
+        max_length=20,
+        choices=CHANNELS,
+        verbose_name='Canal'
+    )
+
+    payload = models.JSONField(
+        verbose_name='Contenu'
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Statut'
+    )
+
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Tentatives'
+    )
+
+    max_attempts = models.PositiveIntegerField(
+        default=5,
+        verbose_name='Tentatives maximum'
+    )
+
+    last_error = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name='Dernière erreur'
+    )
+
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Prochaine tentative'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Date d\'envoi'
+    )
+
+    class Meta:
+        verbose_name = 'Notification en attente'
+        verbose_name_plural = 'Notifications en attente'
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} - {self.get_status_display()} ({self.attempts})"
@@ -0,0 +1,223 @@
+"""
+Service d'envoi différé des notifications (outbox)
+"""
+
+import logging
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxService:
+    """
+    Service pour écrire et vider la file NotificationOutbox
+
+    enqueue_* s'exécute dans la transaction de l'appelant : si elle est
+    annulée, la notification l'est aussi. drain() est appelé par le worker
+    (tâche Celery ou commande process_notification_outbox) et envoie les
+    messages groupés par canal, avec nouvelle tentative et délai croissant.
+
+    Aucune transaction ni aucun verrou n'est ouvert pendant les envois
+    (SMTP, SMS, channel layer) : les messages sont réservés dans une
+    transaction courte, envoyés, puis leurs résultats enregistrés dans une
+    seconde transaction courte. Une erreur inattendue (canal inconnu,
+    payload invalide) compte comme une tentative échouée du message
+    concerné, sans interrompre le reste du lot.
+    """
+
+    # ===== ÉCRITURE =====
+
+    @staticmethod
+    def enqueue(channel: str, payload: Dict) -> NotificationOutbox:
+        """Ajoute une notification à la file"""
+        return NotificationOutbox.objects.create(channel=channel, payload=payload)
+
+    @staticmethod
+    def enqueue_email(subject: str, message: str, recipients: List[str], html_message: str = None):
+        return OutboxService.enqueue('email', {
+            'subject': subject,
+            'message': message,
+            'html_message': html_message,
+            'recipients': recipients
+        })
+
+    @staticmethod
+    def enqueue_sms(phone: str, message: str):
+        return OutboxService.enqueue('sms', {'phone': phone, 'message': message})
+
+    @staticmethod
+    def enqueue_websocket(group: str, event: Dict):
+        return OutboxService.enqueue('websocket', {'group': group, 'event': event})
+
+    # ===== ENVOI =====
+
+    @staticmethod
+    def retry_delay(attempts: int) -> timedelta:
+        """Délai avant la prochaine tentative (exponentiel, plafonné à 1h)"""
+        base = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS', 30)
+        return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+    @staticmethod
+    def claim(batch_size: int = 100) -> List[NotificationOutbox]:
+        """
+        Réserve les notifications dues (transaction courte)
+
+        Les messages réservés restent 'pending' mais leur prochaine tentative
+        est repoussée de NOTIFICATION_OUTBOX_LEASE_SECONDS : un autre worker
+        ne les reprend pas pendant l'envoi, et ceux d'un worker arrêté en
+        cours d'envoi redeviennent dus à l'expiration du bail.
+        """
+        now = timezone.now()
+        lease = timedelta(seconds=getattr(settings, 'NOTIFICATION_OUTBOX_LEASE_SECONDS', 300))
+
+        with transaction.atomic():
+            pending = NotificationOutbox.objects.filter(
+                status='pending',
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at', 'id')
+
+            if connection.features.has_select_for_update_skip_locked:
+                pending = pending.select_for_update(skip_locked=True)
+
+            messages = list(pending[:batch_size])
+            NotificationOutbox.objects.filter(
+                pk__in=[message.pk for message in messages]
+            ).update(next_attempt_at=now + lease)
+
+        return messages
+
+    @staticmethod
+    def drain(batch_size: int = 100) -> Dict:
+        """
+        Envoie les notifications dues
+
+        Returns:
+            {'sent': int, 'retried': int, 'failed': int}
+        """
+        messages = OutboxService.claim(batch_size)
+
+        by_channel = {}
+        for message in messages:
+            by_channel.setdefault(message.channel, []).append(message)
+
+        errors = {}
+        senders = {
+            'email': OutboxService._send_emails,
+            'sms': OutboxService._send_sms,
+            'websocket': OutboxService._send_websocket,
+        }
+        for channel, channel_messages in by_channel.items():
+            sender = senders.get(channel)
+            if sender is None:
+                errors.update({message.pk: f"Canal inconnu: {channel}" for message in channel_messages})
+                continue
+            try:
+                errors.update(sender(channel_messages))
+            except Exception as e:
+                logger.exception(f"Erreur d'envoi des notifications {channel}")
+                errors.update({message.pk: f"{type(e).__name__}: {e}" for message in channel_messages})
+
+        with transaction.atomic():
+            return OutboxService._record_results(messages, errors)
+
+    @staticmethod
+    def _record_results(messages, errors) -> Dict:
+        now = timezone.now()
+        summary = {'sent': 0, 'retried': 0, 'failed': 0}
+
+        for message in messages:
+            message.attempts += 1
+            error = errors.get(message.pk)
+            if error is None:
+                message.status = 'sent'
+                message.sent_at = now
+                message.last_error = None
+                summary['sent'] += 1
+            elif message.attempts >= message.max_attempts:
+                message.status = 'failed'
+                message.last_error = error
+                summary['failed'] += 1
+                logger.error(f"Notification {message.pk} abandonnée: {error}")
+            else:
+                message.next_attempt_at = now + OutboxService.retry_delay(message.attempts)
+                message.last_error = error
+                summary['retried'] += 1
+
+        NotificationOutbox.objects.bulk_update(
+            messages, ['status', 'attempts', 'sent_at', 'last_error', 'next_attempt_at']
+        )
+        return summary
+
+    @staticmethod
+    def _send_emails(messages) -> Dict[int, str]:
+        """Envoie les emails sur une seule connexion SMTP"""
+        errors = {}
+        try:
+            email_connection = get_connection(fail_silently=False)
+            email_connection.open()
+        except Exception as e:
+            return {message.pk: f"Connexion SMTP: {e}" for message in messages}
+
+        try:
+            for message in messages:
+                payload = message.payload
+                try:
+                    email = EmailMultiAlternatives(
+                        subject=payload['subject'],
+                        body=payload['message'],
+                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        to=payload['recipients'],
+                        connection=email_connection
+                    )
+                    if payload.get('html_message'):
+                        email.attach_alternative(payload['html_message'], 'text/html')
+                    email.send()
+                except Exception as e:
+                    errors[message.pk] = f"{type(e).__name__}: {e}"
+        finally:
+            email_connection.close()
+
+        return errors
+
+    @staticmethod
+    def _send_sms(messages) -> Dict[int, str]:
+        from core.notifications import SMSService
+
+        errors = {}
+        for message in messages:
+            try:
+                result = SMSService.send_sms(message.payload['phone'], message.payload['message'])
+                if not result.get('success'):
+                    errors[message.pk] = result.get('error') or 'Échec SMS'
+            except Exception as e:
+                errors[message.pk] = str(e)
+        return errors
+
+    @staticmethod
+    def _send_websocket(messages) -> Dict[int, str]:
+        """Diffuse tous les messages WebSocket dans une seule boucle asynchrone"""
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return {message.pk: 'Channel layer non configuré' for message in messages}
+
+        async def broadcast():
+            errors = {}
+            for message in messages:
+                try:
+                    await channel_layer.group_send(message.payload['group'], message.payload['event'])
+                except Exception as e:
+                    errors[message.pk] = str(e)
+            return errors
+
+        return async_to_sync(broadcast)()
@@ -0,0 +1,10 @@
+from celery import shared_task
+
+from .outbox import OutboxService
+
+
+@shared_task
+def drain_notification_outbox(batch_size=100):
+    """Tâche périodique pour envoyer les notifications en attente"""
+    summary = OutboxService.drain(batch_size=batch_size)
+    return f"Notifications envoyées: {summary['sent']}, à réessayer: {summary['retried']}, abandonnées: {summary['failed']}"
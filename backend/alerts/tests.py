@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from sales.models import Table
+from sales.services import ReservationService
+from .models import NotificationOutbox
+from .outbox import OutboxService
+
+
+class NotificationOutboxTests(TestCase):
+    """Tests de la file d'attente des notifications"""
+
+    def test_reservation_confirmation_is_queued_not_sent(self):
+        user = User.objects.create_user(username='hotesse', password='x', role='server')
+        table = Table.objects.create(number='T1', capacity=4)
+
+        result = ReservationService.create_reservation(
+            table_id=table.id, customer_name='Client', party_size=2,
+            reservation_date=(timezone.localdate() + timedelta(days=1)).isoformat(),
+            reservation_time='19:00', user=user,
+            customer_email='client@example.com', customer_phone='+25779000000'
+        )
+
+        self.assertTrue(result['success'])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(NotificationOutbox.objects.values_list('channel', flat=True)),
+            ['email', 'sms']
+        )
+
+    def test_drain_sends_email_and_websocket_batches(self):
+        channel_layer = get_channel_layer()
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)('kitchen_alerts', channel_name)
+
+        for index in range(3):
+            OutboxService.enqueue_email(f"Alerte {index}", 'Stock faible', ['gerant@example.com'], '<p>Stock</p>')
+        OutboxService.enqueue_websocket('kitchen_alerts', {'type': 'send_alert', 'alert': {'message': 'Stock'}})
+
+        summary = OutboxService.drain()
+
+        self.assertEqual(summary, {'sent': 4, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(async_to_sync(channel_layer.receive)(channel_name)['alert'], {'message': 'Stock'})
+        self.assertFalse(NotificationOutbox.objects.filter(status='pending').exists())
+
+    def test_failed_sms_is_retried_with_backoff_then_abandoned(self):
+        # Aucun fournisseur SMS n'est configuré dans l'environnement de test
+        message = OutboxService.enqueue_sms('+25779000000', 'Test')
+        message.max_attempts = 2
+        message.save()
+
+        self.assertEqual(OutboxService.drain(), {'sent': 0, 'retried': 1, 'failed': 0})
+        message.refresh_from_db()
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertTrue(message.last_error)
+
+        # Pas encore dû
+        self.assertEqual(OutboxService.drain(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+        NotificationOutbox.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(OutboxService.drain(), {'sent': 0, 'retried': 0, 'failed': 1})
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'failed')
+
+    def test_unexpected_errors_count_as_failed_attempts(self):
+        from unittest import mock
+
+        bad_email = OutboxService.enqueue('email', {'subject': 'Sans destinataires'})
+        good_email = OutboxService.enqueue_email('Alerte', 'Stock faible', ['gerant@example.com'])
+        websocket = OutboxService.enqueue_websocket('kitchen_alerts', {'type': 'send_alert'})
+        unknown = OutboxService.enqueue('fax', {})
+        NotificationOutbox.objects.filter(pk=unknown.pk).update(max_attempts=1)
+
+        with mock.patch.object(OutboxService, '_send_websocket', side_effect=KeyError('group')):
+            summary = OutboxService.drain()
+
+        self.assertEqual(summary, {'sent': 1, 'retried': 2, 'failed': 1})
+        self.assertEqual(len(mail.outbox), 1)
+        for message in (bad_email, websocket, unknown):
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, 1)
+            self.assertTrue(message.last_error)
+        self.assertIn('KeyError', bad_email.last_error)
+        self.assertEqual(unknown.status, 'failed')
+        good_email.refresh_from_db()
+        self.assertEqual(good_email.status, 'sent')
+
+    def test_messages_are_sent_outside_the_claim_transaction(self):
+        from unittest import mock
+        from django.db import connection
+
+        depth = len(connection.atomic_blocks)
+        seen = []
+
+        def send(messages):
+            seen.append(len(connection.atomic_blocks))
+            # Réservé : un autre worker ne le reprend pas pendant l'envoi
+            seen.append(NotificationOutbox.objects.filter(next_attempt_at__lte=timezone.now()).exists())
+            return {}
+
+        OutboxService.enqueue_sms('+25779000000', 'Test')
+        with mock.patch.object(OutboxService, '_send_sms', side_effect=send):
+            self.assertEqual(OutboxService.drain(), {'sent': 1, 'retried': 0, 'failed': 0})
+
+        self.assertEqual(seen, [depth, False])
+
+    def test_retry_delay_grows(self):
+        self.assertLess(OutboxService.retry_delay(1), OutboxService.retry_delay(2))
+        self.assertEqual(OutboxService.retry_delay(20), timedelta(hours=1))
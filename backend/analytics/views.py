@@ -0,0 +1,55 @@
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.utils import timezone
+from datetime import datetime, timedelta
+from calendar import monthrange
+
+from sales.rollup_service import SalesRollupService
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sales_chart(request):
+    """
+    Courbe des ventes payées pour le tableau de bord
+
+    Paramètres:
+        date: Date de référence (YYYY-MM-DD, aujourd'hui par défaut)
+        period: day (par heure), week (7 derniers jours) ou month (jours du mois)
+    """
+    today = timezone.localdate()
+    reference_date = request.query_params.get('date')
+    period = request.query_params.get('period', 'day')
+
+    try:
+        reference_date = datetime.strptime(reference_date, '%Y-%m-%d').date() if reference_date else today
+    except ValueError:
+        reference_date = today
+
+    if period == 'week':
+        timeline = SalesRollupService.get_timeline(
+            'day', reference_date - timedelta(days=6), reference_date
+        )
+    elif period == 'month':
+        timeline = SalesRollupService.get_timeline(
+            'day',
+            reference_date.replace(day=1),
+            reference_date.replace(day=monthrange(reference_date.year, reference_date.month)[1])
+        )
+    else:
+        period = 'day'
+        timeline = SalesRollupService.get_timeline('hour', reference_date)
+
+    return Response({
+        'date': reference_date,
+        'period': period,
+        'data': [
+            {
+                'time': row['label'],
+                'sales': float(row['revenue']),
+                'count': row['sales_count']
+            }
+            for row in timeline
+        ]
+    })
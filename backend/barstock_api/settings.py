@@ -66,6 +66,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.PerformanceLogMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,7 +82,7 @@ ROOT_URLCONF = 'barstock_api.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -166,7 +167,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -188,6 +189,18 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
 }
 
+# Durée de vie de l'utilisateur authentifié en cache (accounts.authentication)
+AUTH_PRINCIPAL_CACHE_TIMEOUT = 60
+
+# Échantillonnage des logs de performance (monitoring.middleware)
+PERFORMANCE_LOG_SAMPLE_RATE = 0.1
+PERFORMANCE_LOG_BATCH_SIZE = 100
+PERFORMANCE_LOG_FLUSH_INTERVAL = 5.0
+
+# Journal d'activité écrit par lots (accounts.activity_log)
+ACTIVITY_LOG_BATCH_SIZE = 50
+ACTIVITY_LOG_FLUSH_INTERVAL = 2.0
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite dev server
@@ -298,8 +311,36 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'core.notifications.check_overdue_reservations',
         'schedule': crontab(minute='*/30'),  # Toutes les 30 minutes
     },
+    'drain-notification-outbox': {
+        'task': 'alerts.tasks.drain_notification_outbox',
+        'schedule': 5.0,  # Toutes les 5 secondes
+    },
+    'render-report-jobs': {
+        'task': 'reports.tasks.render_report_jobs',
+        'schedule': 5.0,  # Toutes les 5 secondes
+    },
+    'cleanup-report-artifacts': {
+        'task': 'reports.tasks.cleanup_report_artifacts',
+        'schedule': crontab(minute=0),  # Toutes les heures
+    },
+    'refresh-dashboard-stats': {
+        'task': 'reports.tasks.update_dashboard_stats_periodic',
+        'schedule': crontab(minute='*/5'),  # Recalcul complet toutes les 5 minutes
+    },
 }
 
+# Rapports générés en arrière-plan (reports.report_jobs) : durée de conservation
+# des fichiers des périodes non closes (ceux des jours clos sont conservés) et
+# délai, compté depuis la réservation par le worker, après lequel une
+# génération non terminée est considérée comme abandonnée
+REPORT_ARTIFACT_RETENTION_HOURS = 24
+REPORT_JOB_TIMEOUT_SECONDS = 600
+
+# File d'attente des notifications (alerts.outbox) : délai de base entre deux
+# tentatives et durée de réservation d'un message pendant son envoi
+NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS = 30
+NOTIFICATION_OUTBOX_LEASE_SECONDS = 300
+
 # Configuration Redis pour WebSockets et Cache
 CHANNEL_LAYERS = {
     'default': {
@@ -321,6 +362,26 @@ CACHES = {
     }
 }
 
+# Durée de vie du menu commercial en cache (invalidé à chaque changement de stock)
+MENU_AVAILABILITY_CACHE_TIMEOUT = 300
+
+# Durée de vie des permissions utilisateur en cache (versionnées à chaque modification)
+PERMISSION_CACHE_TIMEOUT = 3600
+
+# Durée de vie du plan de salle en cache (versionné à chaque changement)
+FLOOR_PLAN_CACHE_TIMEOUT = 60
+
+# Durée de vie des factures rendues en cache et de leur version (incrémentée à chaque modification de la vente)
+INVOICE_CACHE_TIMEOUT = 86400
+
+# Grille des créneaux de réservation (sales.availability_service)
+RESERVATION_OPENING_TIME = '11:00'
+RESERVATION_CLOSING_TIME = '23:00'
+RESERVATION_SLOT_MINUTES = 30
+
+# Fenêtre de regroupement des diffusions du tableau de bord (secondes)
+DASHBOARD_BROADCAST_WINDOW = 1.0
+
 # Configuration Celery avec Redis
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
@@ -48,6 +48,35 @@ class NotificationService:
         
         return results
     
+    @staticmethod
+    def queue_reservation_confirmation(reservation) -> Dict:
+        """
+        Met en file d'attente la confirmation de réservation (email et SMS)
+
+        Les messages sont écrits dans la transaction courante et envoyés par
+        le worker de la file NotificationOutbox.
+        """
+        from alerts.outbox import OutboxService
+
+        results = {
+            'email_queued': False,
+            'sms_queued': False
+        }
+
+        if reservation.customer_email:
+            email = EmailService.build_reservation_confirmation(reservation)
+            OutboxService.enqueue_email(recipients=[reservation.customer_email], **email)
+            results['email_queued'] = True
+
+        if reservation.customer_phone:
+            OutboxService.enqueue_sms(
+                reservation.customer_phone,
+                SMSService.build_reservation_confirmation(reservation)
+            )
+            results['sms_queued'] = True
+
+        return results
+
     @staticmethod
     def send_reservation_reminder(reservation) -> Dict:
         """Envoie un rappel de réservation"""
@@ -107,30 +136,37 @@ class NotificationService:
 class EmailService:
     """Service pour les notifications email"""
     
+    @staticmethod
+    def build_reservation_confirmation(reservation) -> Dict:
+        """Prépare le sujet et le contenu de l'email de confirmation"""
+        context = {
+            'reservation': reservation,
+            'restaurant_name': getattr(settings, 'RESTAURANT_NAME', 'BarStockWise'),
+            'restaurant_phone': getattr(settings, 'RESTAURANT_PHONE', ''),
+            'restaurant_address': getattr(settings, 'RESTAURANT_ADDRESS', ''),
+        }
+        
+        # Rendu du template HTML
+        html_message = render_to_string('emails/reservation_confirmation.html', context)
+        
+        return {
+            'subject': f'Confirmation de réservation - {settings.RESTAURANT_NAME}',
+            'message': strip_tags(html_message),
+            'html_message': html_message
+        }
+    
     @staticmethod
     def send_reservation_confirmation(reservation) -> Dict:
         """Envoie un email de confirmation de réservation"""
         try:
-            subject = f'Confirmation de réservation - {settings.RESTAURANT_NAME}'
-            
-            # Contexte pour le template
-            context = {
-                'reservation': reservation,
-                'restaurant_name': getattr(settings, 'RESTAURANT_NAME', 'BarStockWise'),
-                'restaurant_phone': getattr(settings, 'RESTAURANT_PHONE', ''),
-                'restaurant_address': getattr(settings, 'RESTAURANT_ADDRESS', ''),
-            }
-            
-            # Rendu du template HTML
-            html_message = render_to_string('emails/reservation_confirmation.html', context)
-            plain_message = strip_tags(html_message)
+            email = EmailService.build_reservation_confirmation(reservation)
             
             send_mail(
-                subject=subject,
-                message=plain_message,
+                subject=email['subject'],
+                message=email['message'],
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[reservation.customer_email],
-                html_message=html_message,
+                html_message=email['html_message'],
                 fail_silently=False,
             )
             
@@ -271,9 +307,9 @@ class SMSService:
             return {'success': False, 'error': str(e)}
     
     @staticmethod
-    def send_reservation_confirmation(reservation) -> Dict:
-        """Envoie SMS de confirmation de réservation"""
-        message = (
+    def build_reservation_confirmation(reservation) -> str:
+        """Texte du SMS de confirmation de réservation"""
+        return (
             f"Bonjour {reservation.customer_name}, "
             f"votre réservation pour {reservation.party_size} personne(s) "
             f"le {reservation.reservation_date.strftime('%d/%m/%Y')} "
@@ -281,6 +317,11 @@ class SMSService:
             f"(Table {reservation.table.number}) est confirmée. "
             f"Merci ! - {getattr(settings, 'RESTAURANT_NAME', 'BarStockWise')}"
         )
+    
+    @staticmethod
+    def send_reservation_confirmation(reservation) -> Dict:
+        """Envoie SMS de confirmation de réservation"""
+        message = SMSService.build_reservation_confirmation(reservation)
         
         return SMSService.send_sms(reservation.customer_phone, message)
     
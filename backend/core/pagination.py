@@ -0,0 +1,172 @@
+"""
+Pagination par curseur (clé composite date, id) des historiques
+
+Les listes d'historique (ventes, mouvements de stock et d'ingrédients,
+activités, logs de performance) sont triées de la plus récente à la plus
+ancienne. Une page reprend après la dernière ligne de la page précédente
+(date, id) au lieu d'un OFFSET, et aucun COUNT(*) n'est exécuté par défaut :
+servie par un index composite (date, id), une page coûte le même prix qu'elle
+soit la première ou au bout d'un an d'historique.
+
+Le nombre total de lignes reste disponible à la demande (?count=true).
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par clé sur (ordering_field, id), du plus récent au plus ancien
+
+    Paramètres : cursor (liens next/previous de la réponse), page_size
+    (max_page_size au plus), count=true pour ajouter le nombre total de
+    lignes, ordering=<champ> pour lire du plus ancien au plus récent. Le
+    curseur encode la position (date, id) et le sens de lecture. Seul le
+    champ de pagination peut servir de tri (-<champ> par défaut) : tout
+    autre ordering est refusé (400) plutôt qu'ignoré.
+    """
+
+    ordering_field = 'created_at'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Curseur de pagination invalide'
+
+    # ===== CURSEUR =====
+
+    def encode_cursor(self, row, reverse: bool) -> str:
+        values = [getattr(row, self.ordering_field).isoformat(), row.pk, reverse]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor: str):
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError(cursor)
+            return value, int(pk), bool(reverse)
+        except (ValueError, TypeError):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+
+    # ===== PARAMÈTRES =====
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def is_descending(self, request) -> bool:
+        """Sens du tri demandé (du plus récent au plus ancien par défaut)"""
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in (None, '', f'-{self.ordering_field}'):
+            return True
+        if ordering == self.ordering_field:
+            return False
+        raise ValidationError({self.ordering_query_param: (
+            f"Tri non supporté : {ordering}. "
+            f"Utilisez -{self.ordering_field} ou {self.ordering_field}."
+        )})
+
+    def count_requested(self, request) -> bool:
+        return request.query_params.get(self.count_query_param, '').lower() in ['true', '1', 'yes']
+
+    # ===== PAGINATION =====
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Lignes de la page demandée (page_size + 1 lignes lues pour savoir
+        s'il en reste)
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        descending = self.is_descending(request)
+        self.count = queryset.count() if self.count_requested(request) else None
+
+        field = self.ordering_field
+        cursor = request.query_params.get(self.cursor_query_param)
+        position = self.decode_cursor(cursor) if cursor else None
+        reverse = position is not None and position[2]
+        # En remontant vers la page précédente, la lecture se fait à rebours
+        read_descending = descending != reverse
+
+        if position is not None:
+            value, pk, _ = position
+            # Borne simple sur la date (parcours de l'index) et départage par id
+            if read_descending:
+                queryset = queryset.filter(Q(**{f'{field}__lte': value}),
+                                           Q(**{f'{field}__lt': value}) | Q(pk__lt=pk))
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__gte': value}),
+                                           Q(**{f'{field}__gt': value}) | Q(pk__gt=pk))
+
+        ordering = (f'-{field}', '-pk') if read_descending else (field, 'pk')
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # En remontant, la page suivante existe toujours (celle d'où l'on vient)
+        has_next = reverse or has_more
+        has_previous = has_more if reverse else position is not None
+
+        self.next_cursor = self.encode_cursor(rows[-1], False) if has_next and rows else None
+        self.previous_cursor = self.encode_cursor(rows[0], True) if has_previous and rows else None
+        return rows
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.previous_cursor)
+
+    def get_paginated_data(self, data) -> dict:
+        """Corps de réponse paginé ('count' seulement si demandé)"""
+        page = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.count is not None:
+            page['count'] = self.count
+        page['results'] = data
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': 'Seulement avec count=true'},
+                'results': schema,
+            },
+        }
+
+
+class TimestampKeysetPagination(KeysetPagination):
+    """Pagination par clé des modèles datés par 'timestamp' (activités, logs)"""
+
+    ordering_field = 'timestamp'
@@ -0,0 +1,172 @@
+"""
+Découpage temporel des agrégats (heure, jour, semaine, mois)
+
+Tous les créneaux d'une période sont calculés en une seule requête
+GROUP BY sur une annotation Trunc, dans le fuseau horaire local
+(Africa/Bujumbura par défaut), puis les créneaux vides sont complétés
+en Python.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from django.db import models
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+
+class TimeBuckets:
+    """
+    Créneaux temporels entre deux dates locales (incluses)
+
+    Exemple:
+        buckets = TimeBuckets('hour', today)
+        rows = buckets.aggregate(Sale.objects.filter(status='paid'), 'created_at',
+                                 total=Sum('total_amount'))
+        # [{'bucket': datetime(... 00:00), 'total': 0}, ..., 24 créneaux]
+    """
+
+    GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+    def __init__(self, granularity: str, date_from: date, date_to: Optional[date] = None, tzinfo=None):
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(f"Granularité invalide: {granularity}")
+
+        self.granularity = granularity
+        self.date_from = date_from
+        self.date_to = date_to or date_from
+        self.tzinfo = tzinfo or timezone.get_current_timezone()
+
+    # ===== CRÉNEAUX =====
+
+    def _truncate(self, value: date) -> date:
+        """Début du créneau (jour, semaine ou mois) contenant une date"""
+        if self.granularity == 'week':
+            return value - timedelta(days=value.weekday())
+        if self.granularity == 'month':
+            return value.replace(day=1)
+        return value
+
+    def _local_datetime(self, day: date, hour: int = 0) -> datetime:
+        return timezone.make_aware(datetime.combine(day, time(hour)), self.tzinfo)
+
+    def keys(self) -> List:
+        """
+        Liste ordonnée de tous les créneaux de la période
+
+        Les créneaux horaires sont des datetimes locaux, les autres des dates
+        (lundi pour les semaines, premier du mois pour les mois).
+        """
+        keys = []
+        day = self._truncate(self.date_from)
+        while day <= self.date_to:
+            if self.granularity == 'hour':
+                keys.extend(self._local_datetime(day, hour) for hour in range(24))
+                day += timedelta(days=1)
+            elif self.granularity == 'day':
+                keys.append(day)
+                day += timedelta(days=1)
+            elif self.granularity == 'week':
+                keys.append(day)
+                day += timedelta(weeks=1)
+            else:
+                keys.append(day)
+                day = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return keys
+
+    def bounds(self):
+        """Bornes [début, fin[ de la période en datetimes locaux"""
+        return (
+            self._local_datetime(self.date_from),
+            self._local_datetime(self.date_to + timedelta(days=1))
+        )
+
+    # ===== REQUÊTES =====
+
+    def expression(self, field: str, is_datetime: bool = True):
+        """
+        Annotation Trunc du champ
+
+        Les champs datetime sont tronqués dans le fuseau local ; les champs
+        date n'ont pas de fuseau.
+        """
+        if not is_datetime:
+            return Trunc(field, self.granularity, output_field=models.DateField())
+        if self.granularity == 'hour':
+            return Trunc(field, 'hour', output_field=models.DateTimeField(), tzinfo=self.tzinfo)
+        return Trunc(field, self.granularity, output_field=models.DateField(), tzinfo=self.tzinfo)
+
+    @staticmethod
+    def _is_datetime(queryset, field: str) -> bool:
+        return isinstance(queryset.model._meta.get_field(field), models.DateTimeField)
+
+    def filter(self, queryset, field: str):
+        """Restreint le queryset à la période (requête par intervalle indexable)"""
+        if self._is_datetime(queryset, field):
+            start, end = self.bounds()
+            return queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end})
+        return queryset.filter(**{f'{field}__gte': self.date_from, f'{field}__lte': self.date_to})
+
+    def _normalize(self, value):
+        """Ramène une valeur Trunc renvoyée par la base à une clé de créneau"""
+        if isinstance(value, datetime):
+            value = timezone.localtime(value, self.tzinfo) if timezone.is_aware(value) else value
+            if self.granularity == 'hour':
+                return self._local_datetime(value.date(), value.hour)
+            value = value.date()
+        return self._truncate(value)
+
+    def aggregate(self, queryset, field: str, hour_field: Optional[str] = None,
+                  default=0, **aggregates) -> List[Dict]:
+        """
+        Calcule les agrégats de chaque créneau en une seule requête
+
+        Args:
+            queryset: Queryset source (non encore filtré sur la période)
+            field: Champ date/datetime servant au découpage
+            hour_field: Champ heure déjà calculé (agrégats pré-découpés date + heure)
+            default: Valeur des agrégats pour les créneaux vides
+            **aggregates: Expressions d'agrégat (Sum, Count...)
+
+        Returns:
+            Liste ordonnée de {'bucket': clé, <agrégat>: valeur} couvrant
+            tous les créneaux de la période
+        """
+        queryset = self.filter(queryset, field)
+
+        if hour_field and self.granularity == 'hour':
+            rows = queryset.values(field, hour_field).annotate(**aggregates).order_by()
+            by_bucket = {
+                self._local_datetime(row[field], row[hour_field]): row
+                for row in rows
+            }
+        else:
+            is_datetime = self._is_datetime(queryset, field)
+            if is_datetime or self.granularity != 'day':
+                queryset = queryset.annotate(bucket=self.expression(field, is_datetime))
+                group_by = 'bucket'
+            else:
+                group_by = field
+            rows = queryset.values(group_by).annotate(**aggregates).order_by()
+            by_bucket = {self._normalize(row[group_by]): row for row in rows}
+
+        return [
+            {
+                'bucket': key,
+                **{
+                    name: (by_bucket[key][name] if key in by_bucket else None) or default
+                    for name in aggregates
+                }
+            }
+            for key in self.keys()
+        ]
+
+    # ===== LIBELLÉS =====
+
+    def label(self, key) -> str:
+        """Libellé d'affichage d'un créneau"""
+        if self.granularity == 'hour':
+            return key.strftime('%H:00')
+        if self.granularity == 'month':
+            return key.strftime('%Y-%m')
+        return key.isoformat()
@@ -1,3 +1,80 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db.models import Count, Sum
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from core.time_buckets import TimeBuckets
+from .models import Expense, ExpenseCategory
+
+
+class TimeBucketsTests(TestCase):
+    """Tests du découpage temporel comparé aux agrégats créneau par créneau"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='gerant', password='x', role='manager')
+        cls.category = ExpenseCategory.objects.create(name='Fournitures')
+
+        # Heures locales proches de minuit pour vérifier le fuseau horaire
+        moments = [
+            (date(2024, 3, 1), time(0, 30), '1500'),
+            (date(2024, 3, 1), time(23, 45), '2500'),
+            (date(2024, 3, 2), time(12, 0), '1000'),
+            (date(2024, 3, 15), time(9, 15), '4000'),
+            (date(2024, 3, 31), time(23, 59), '700'),
+            (date(2024, 4, 1), time(0, 5), '9999'),
+        ]
+        for index, (day, moment, amount) in enumerate(moments):
+            Expense.objects.create(
+                reference=f"DEP-{index}",
+                category=cls.category,
+                description='Achat',
+                amount=Decimal(amount),
+                payment_method='cash',
+                user=cls.user,
+                expense_date=timezone.make_aware(datetime.combine(day, moment))
+            )
+
+    def test_daily_buckets_match_per_day_aggregates(self):
+        month_expenses = Expense.objects.filter(expense_date__year=2024, expense_date__month=3)
+        expected = [
+            {
+                'day': day,
+                'total': month_expenses.filter(expense_date__day=day).aggregate(
+                    total=Sum('amount'))['total'] or Decimal('0.00')
+            }
+            for day in range(1, 32)
+        ]
+
+        with self.assertNumQueries(1):
+            rows = TimeBuckets('day', date(2024, 3, 1), date(2024, 3, 31)).aggregate(
+                Expense.objects.all(), 'expense_date', default=Decimal('0.00'), total=Sum('amount')
+            )
+
+        self.assertEqual([{'day': row['bucket'].day, 'total': row['total']} for row in rows], expected)
+
+    def test_hourly_buckets_match_per_hour_counts(self):
+        day_expenses = Expense.objects.filter(expense_date__date=date(2024, 3, 1))
+        expected = [day_expenses.filter(expense_date__hour=hour).count() for hour in range(24)]
+
+        buckets = TimeBuckets('hour', date(2024, 3, 1))
+        rows = buckets.aggregate(Expense.objects.all(), 'expense_date', count=Count('id'))
+
+        self.assertEqual([row['count'] for row in rows], expected)
+        self.assertEqual(buckets.label(rows[23]['bucket']), '23:00')
+
+    def test_week_and_month_buckets(self):
+        weeks = TimeBuckets('week', date(2024, 3, 1), date(2024, 3, 10)).aggregate(
+            Expense.objects.all(), 'expense_date', total=Sum('amount')
+        )
+        self.assertEqual([row['bucket'] for row in weeks], [date(2024, 2, 26), date(2024, 3, 4)])
+        self.assertEqual([row['total'] for row in weeks], [Decimal('5000'), 0])
 
-# Create your tests here.
+        months = TimeBuckets('month', date(2024, 2, 1), date(2024, 4, 30)).aggregate(
+            Expense.objects.all(), 'expense_date', total=Sum('amount')
+        )
+        self.assertEqual([row['bucket'] for row in months], [date(2024, 2, 1), date(2024, 3, 1), date(2024, 4, 1)])
+        self.assertEqual([row['total'] for row in months], [0, Decimal('9700'), Decimal('9999')])
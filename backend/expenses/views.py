@@ -6,10 +6,12 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.db.models import Sum, Count, Avg, Q
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from calendar import monthrange
 
+from core.time_buckets import TimeBuckets
+
 from .models import ExpenseCategory, Expense
 from .serializers import (
     ExpenseCategorySerializer, ExpenseSerializer, ExpenseSummarySerializer,
@@ -170,17 +172,19 @@ class MonthlyExpenseReportView(APIView):
             count=Count('id')
         ).order_by('-total')
 
-        # Répartition quotidienne
-        daily_breakdown = []
+        # Répartition quotidienne (un seul GROUP BY, jours vides complétés)
         days_in_month = monthrange(year, month)[1]
-
-        for day in range(1, days_in_month + 1):
-            day_total = month_expenses.filter(expense_date__day=day).aggregate(
-                total=Sum('amount'))['total'] or Decimal('0.00')
-            daily_breakdown.append({
-                'day': day,
-                'total': day_total
-            })
+        buckets = TimeBuckets('day', date(year, month, 1), date(year, month, days_in_month))
+        daily_breakdown = [
+            {
+                'day': row['bucket'].day,
+                'total': row['total']
+            }
+            for row in buckets.aggregate(
+                Expense.objects.all(), 'expense_date',
+                default=Decimal('0.00'), total=Sum('amount')
+            )
+        ]
 
         report = {
             'month': f"{month:02d}",
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_stockmovement_product_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stockmovement',
+            name='stock_move_product_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='stock_move_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['created_at', 'id'], name='stock_move_created_id_idx'),
+        ),
+    ]
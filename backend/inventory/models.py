@@ -111,6 +111,12 @@ class StockMovement(models.Model):
         verbose_name = 'Mouvement de stock'
         verbose_name_plural = 'Mouvements de stock'
         ordering = ['-created_at']
+        indexes = [
+            # Dernier mouvement d'un produit (résumé du stock) et historique
+            # d'un produit paginé par curseur (created_at, id)
+            models.Index(fields=['product', 'created_at', 'id'], name='stock_move_product_date_idx'),
+            models.Index(fields=['created_at', 'id'], name='stock_move_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.get_movement_type_display()} - {self.quantity}"
@@ -244,7 +244,15 @@ class StockSummarySerializer(serializers.Serializer):
     current_stock = serializers.IntegerField()
     minimum_stock = serializers.IntegerField()
     stock_value = serializers.DecimalField(max_digits=12, decimal_places=2)
-    last_movement_date = serializers.DateTimeField()
+    last_movement_date = serializers.DateTimeField(allow_null=True)
     needs_restock = serializers.BooleanField()
 
 
+class StockCategoryTotalSerializer(serializers.Serializer):
+    category_id = serializers.IntegerField()
+    category_name = serializers.CharField()
+    product_count = serializers.IntegerField()
+    restock_count = serializers.IntegerField()
+    stock_value = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
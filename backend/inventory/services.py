@@ -0,0 +1,337 @@
+"""
+Services de mouvements de stock des produits
+"""
+
+import base64
+import json
+from collections import Counter
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.db import models, transaction
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, When
+)
+from django.utils import timezone
+
+from products.models import Product
+from .models import Purchase, StockMovement
+
+
+class InsufficientStockError(ValueError):
+    """Stock insuffisant pour un ou plusieurs produits"""
+
+
+class StockLedgerService:
+    """
+    Service pour appliquer des mouvements de stock en lot
+
+    Les produits concernés sont verrouillés en une seule requête
+    select_for_update (triée par id pour éviter les interblocages), le stock
+    est mis à jour par un UPDATE conditionnel unique sur F('current_stock')
+    et les StockMovement sont écrits avec bulk_create.
+    """
+
+    @staticmethod
+    def consume(quantities: Dict[int, int], user, reason='sale', reference=None, notes=None) -> List[StockMovement]:
+        """
+        Décompte le stock de plusieurs produits
+
+        Args:
+            quantities: {product_id: quantité}
+            user: Utilisateur à l'origine du mouvement
+
+        Raises:
+            InsufficientStockError: si un produit n'a pas assez de stock
+                (aucun stock n'est alors modifié)
+        """
+        return StockLedgerService._apply(quantities, -1, 'out', reason, user, reference, notes)
+
+    @staticmethod
+    def restore(quantities: Dict[int, int], user, reason='sale', reference=None, notes=None) -> List[StockMovement]:
+        """Remet en stock plusieurs produits (retour, annulation)"""
+        return StockLedgerService._apply(quantities, 1, 'return', reason, user, reference, notes)
+
+    @staticmethod
+    def receive(quantities: Dict[int, int], unit_prices: Dict[int, Decimal], user, supplier=None,
+                reference=None, notes=None) -> List[StockMovement]:
+        """
+        Entre en stock plusieurs produits (réception d'achat)
+
+        Args:
+            quantities: {product_id: quantité reçue}
+            unit_prices: {product_id: prix d'achat unitaire}
+        """
+        return StockLedgerService._apply(
+            quantities, 1, 'in', 'purchase', user, reference, notes,
+            unit_prices=unit_prices, supplier=supplier
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def _apply(quantities, sign, movement_type, reason, user, reference, notes,
+               unit_prices=None, supplier=None) -> List[StockMovement]:
+        quantities = Counter({
+            product_id: quantity for product_id, quantity in quantities.items() if quantity
+        })
+        if not quantities:
+            return []
+
+        products = list(
+            Product.objects.select_for_update()
+            .filter(pk__in=quantities.keys())
+            .order_by('pk')
+        )
+
+        if sign < 0:
+            missing = [
+                product.name for product in products
+                if product.current_stock < quantities[product.pk]
+            ]
+            if missing:
+                raise InsufficientStockError(f"Stock insuffisant pour {', '.join(missing)}")
+
+        # UPDATE unique, conditionnel pour ne jamais passer sous zéro
+        condition = Q()
+        for product_id, quantity in quantities.items():
+            condition |= Q(pk=product_id, current_stock__gte=quantity) if sign < 0 else Q(pk=product_id)
+
+        updated = Product.objects.filter(condition).update(current_stock=Case(
+            *[
+                When(pk=product_id, then=F('current_stock') + sign * quantity)
+                for product_id, quantity in quantities.items()
+            ],
+            default=F('current_stock'),
+            output_field=models.PositiveIntegerField()
+        ))
+        if updated != len(products):
+            raise InsufficientStockError("Stock modifié pendant l'opération, veuillez réessayer")
+
+        movements = []
+        for product in products:
+            quantity = quantities[product.pk]
+            stock_before = product.current_stock
+            product.current_stock = stock_before + sign * quantity
+            unit_price = (unit_prices or {}).get(product.pk, product.selling_price)
+            movements.append(StockMovement(
+                product=product,
+                movement_type=movement_type,
+                reason=reason,
+                quantity=quantity,
+                unit_price=unit_price,
+                total_amount=unit_price * quantity,
+                stock_before=stock_before,
+                stock_after=product.current_stock,
+                supplier=supplier,
+                user=user,
+                reference=reference,
+                notes=notes
+            ))
+        StockMovement.objects.bulk_create(movements)
+
+        # bulk_create n'émet pas post_save : un seul événement pour le lot
+        transaction.on_commit(lambda: StockLedgerService.movements_committed(movements))
+
+        # Détection des seuils une seule fois par lot, après validation
+        crossed = [
+            product for product, movement in zip(products, movements)
+            if min(movement.stock_before, movement.stock_after) <= product.minimum_stock
+        ]
+        if crossed:
+            transaction.on_commit(lambda: StockLedgerService.check_stock_levels(crossed))
+
+        return movements
+
+    @staticmethod
+    def movements_committed(movements):
+        """Tableau de bord et rapports mis à jour une fois pour un lot de mouvements"""
+        from reports.dashboard import DashboardBroadcaster
+        from reports.report_jobs import ReportJobService
+
+        DashboardBroadcaster.stock_movements_created(movements)
+        ReportJobService.bump_data_version()
+
+    @staticmethod
+    def check_stock_levels(products):
+        """Crée ou résout les alertes de stock des produits qui ont franchi leur seuil"""
+        from reports.stock_alerts import StockAlertService
+
+        StockAlertService.reconcile([product.pk for product in products])
+
+
+class PurchaseStatusError(ValueError):
+    """Achat dans un statut qui ne permet pas la réception (déjà réceptionné, annulé...)"""
+
+
+class PurchaseReceivingService:
+    """
+    Service de réception des achats en stock
+
+    Le changement de statut est un UPDATE conditionnel exécuté en premier
+    dans la transaction : de deux demandes simultanées (double clic), une
+    seule réserve l'achat, l'autre reçoit PurchaseStatusError et aucun stock
+    n'est ajouté deux fois. Les produits sont ensuite mis à jour en lot par
+    StockLedgerService.receive.
+    """
+
+    @staticmethod
+    def validate_delivery(purchase_id: int, user) -> Purchase:
+        """Valider une livraison reçue"""
+        return PurchaseReceivingService._receive(purchase_id, user, 'received', 'validated')
+
+    @staticmethod
+    def confirm_purchase(purchase_id: int, user) -> Purchase:
+        """Confirmer un achat en attente"""
+        return PurchaseReceivingService._receive(purchase_id, user, 'pending', 'confirmed')
+
+    @staticmethod
+    @transaction.atomic
+    def _receive(purchase_id, user, from_status, to_status) -> Purchase:
+        """Entrée en stock des quantités reçues de chaque ligne, au prix d'achat de la ligne"""
+        claimed = Purchase.objects.filter(pk=purchase_id, status=from_status).update(
+            status=to_status, updated_at=timezone.now()
+        )
+        if not claimed:
+            raise PurchaseStatusError(f"L'achat {purchase_id} n'est pas au statut {from_status}")
+
+        purchase = Purchase.objects.select_related('supplier').get(pk=purchase_id)
+        lines = list(purchase.items.values_list('product_id', 'quantity_received', 'unit_price'))
+
+        if to_status == 'confirmed':
+            reference = f"Achat #{purchase.reference}"
+            notes = f"Confirmation achat du {timezone.localtime(purchase.order_date).strftime('%d/%m/%Y')}"
+        else:
+            reference, notes = purchase.reference, None
+
+        StockLedgerService.receive(
+            {product_id: quantity for product_id, quantity, _ in lines},
+            {product_id: unit_price for product_id, _, unit_price in lines},
+            # Endpoints encore publics : à défaut, l'auteur de l'achat
+            user=user if user is not None and user.is_authenticated else purchase.user,
+            supplier=purchase.supplier,
+            reference=reference,
+            notes=notes
+        )
+        return purchase
+
+
+class InvalidCursorError(ValueError):
+    """Curseur de pagination illisible"""
+
+
+class StockSummaryService:
+    """
+    Service du résumé du stock par produit
+
+    Une seule requête par page : valeur du stock, besoin de
+    réapprovisionnement et date du dernier mouvement (sous-requête servie par
+    l'index (product, created_at) de StockMovement) sont calculés en base.
+    La pagination par clé reprend après le dernier produit de la page
+    (catégorie, nom, id) au lieu d'un OFFSET : le coût d'une page ne dépend
+    pas de sa position dans le catalogue.
+    """
+
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+
+    @staticmethod
+    def stock_value_expression():
+        return ExpressionWrapper(
+            F('current_stock') * F('purchase_price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        )
+
+    @staticmethod
+    def filtered_products(category_id: Optional[int] = None, needs_restock: Optional[bool] = None):
+        """Produits filtrés par catégorie et besoin de réapprovisionnement"""
+        products = Product.objects.all()
+        if category_id is not None:
+            products = products.filter(category_id=category_id)
+        if needs_restock is not None:
+            restock = Q(current_stock__lte=F('minimum_stock'))
+            products = products.filter(restock if needs_restock else ~restock)
+        return products
+
+    @staticmethod
+    def encode_cursor(row: Dict) -> str:
+        values = [row['category_name'], row['product_name'], row['product_id']]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        try:
+            category_name, name, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return str(category_name), str(name), int(product_id)
+        except (ValueError, TypeError):
+            raise InvalidCursorError("Curseur de pagination invalide")
+
+    @staticmethod
+    def get_page(category_id: Optional[int] = None, needs_restock: Optional[bool] = None,
+                 cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """
+        Page du résumé du stock, triée par catégorie puis nom
+
+        Raises:
+            InvalidCursorError: si le curseur ne vient pas d'une page précédente
+
+        Returns:
+            {'results': [...], 'next_cursor': str ou None}
+        """
+        page_size = max(1, min(page_size, StockSummaryService.MAX_PAGE_SIZE))
+        products = StockSummaryService.filtered_products(category_id, needs_restock)
+
+        if cursor:
+            category_name, name, product_id = StockSummaryService.decode_cursor(cursor)
+            products = products.filter(
+                Q(category__name__gt=category_name)
+                | Q(category__name=category_name, name__gt=name)
+                | Q(category__name=category_name, name=name, pk__gt=product_id)
+            )
+
+        last_movement = StockMovement.objects.filter(
+            product=OuterRef('pk')
+        ).order_by('-created_at').values('created_at')[:1]
+
+        rows = list(
+            products.annotate(
+                product_id=F('pk'),
+                product_name=F('name'),
+                category_name=F('category__name'),
+                stock_value=StockSummaryService.stock_value_expression(),
+                last_movement_date=Subquery(last_movement),
+                needs_restock=ExpressionWrapper(
+                    Q(current_stock__lte=F('minimum_stock')), output_field=models.BooleanField()
+                )
+            ).order_by('category__name', 'name', 'pk').values(
+                'product_id', 'product_name', 'category_name', 'current_stock',
+                'minimum_stock', 'stock_value', 'last_movement_date', 'needs_restock'
+            )[:page_size + 1]
+        )
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = StockSummaryService.encode_cursor(rows[-1])
+
+        return {'results': rows, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def get_category_totals(category_id: Optional[int] = None,
+                            needs_restock: Optional[bool] = None) -> List[Dict]:
+        """
+        Totaux par catégorie (une requête GROUP BY)
+
+        Returns:
+            [{'category_id', 'category_name', 'product_count',
+              'restock_count', 'stock_value'}]
+        """
+        return list(
+            StockSummaryService.filtered_products(category_id, needs_restock)
+            .values('category_id', category_name=F('category__name'))
+            .annotate(
+                product_count=Count('pk'),
+                restock_count=Count('pk', filter=Q(current_stock__lte=F('minimum_stock'))),
+                stock_value=Sum(StockSummaryService.stock_value_expression())
+            )
+            .order_by('category_name')
+        )
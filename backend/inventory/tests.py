@@ -1,3 +1,407 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from accounts.models import User
+from products.models import Category, Product
+from reports.models import StockAlert
+from sales.models import Sale, SaleItem
+from .models import Purchase, PurchaseItem, StockMovement
+from .services import (
+    InsufficientStockError, PurchaseReceivingService, PurchaseStatusError, StockLedgerService
+)
+
+
+class StockLedgerServiceTests(TestCase):
+    """Tests des mouvements de stock en lot"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='caissier', password='x', role='cashier')
+        cls.category = Category.objects.create(name='Bières', type='boissons')
+        cls.beer = Product.objects.create(
+            name='Primus', category=cls.category, code='BOI-PRI', purchase_price=Decimal('1000'),
+            selling_price=Decimal('1500'), current_stock=20, minimum_stock=5
+        )
+        cls.soda = Product.objects.create(
+            name='Fanta', category=cls.category, code='BOI-FAN', purchase_price=Decimal('500'),
+            selling_price=Decimal('1000'), current_stock=3, minimum_stock=1
+        )
+
+    def test_consume_updates_stock_and_writes_movements(self):
+        movements = StockLedgerService.consume({self.beer.pk: 4, self.soda.pk: 1}, user=self.user, reference='V-1')
+
+        self.beer.refresh_from_db()
+        self.soda.refresh_from_db()
+        self.assertEqual(self.beer.current_stock, 16)
+        self.assertEqual(self.soda.current_stock, 2)
+        self.assertEqual(len(movements), 2)
+        self.assertEqual(
+            set(StockMovement.objects.values_list('product_id', 'movement_type', 'quantity', 'stock_before', 'stock_after')),
+            {(self.beer.pk, 'out', 4, 20, 16), (self.soda.pk, 'out', 1, 3, 2)}
+        )
+
+    def test_insufficient_stock_changes_nothing(self):
+        with self.assertRaises(InsufficientStockError):
+            StockLedgerService.consume({self.beer.pk: 4, self.soda.pk: 10}, user=self.user)
+
+        self.beer.refresh_from_db()
+        self.assertEqual(self.beer.current_stock, 20)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_query_count_does_not_grow_with_items(self):
+        with self.assertNumQueries(5):
+            # savepoint, verrouillage, UPDATE, INSERT, libération du savepoint
+            StockLedgerService.consume({self.beer.pk: 1, self.soda.pk: 1}, user=self.user)
+
+    def test_low_stock_alert_after_commit(self):
+        with mock.patch('reports.dashboard.DashboardBroadcaster.mark_dirty') as mark_dirty:
+            with self.captureOnCommitCallbacks(execute=True):
+                StockLedgerService.consume({self.beer.pk: 16}, user=self.user)
+
+        self.assertTrue(StockAlert.objects.filter(product=self.beer, alert_type='low_stock', status='active').exists())
+        self.assertEqual(
+            [call.args[0] for call in mark_dirty.call_args_list],
+            [{'low_stock_products': 1}, {'active_alerts': 1}]
+        )
+
+    def test_sale_payment_and_cancellation(self):
+        sale = Sale.objects.create(server=self.user, payment_method='cash')
+        SaleItem.objects.create(sale=sale, product=self.beer, quantity=3, unit_price=self.beer.selling_price)
+
+        sale.mark_as_paid(self.user)
+        self.beer.refresh_from_db()
+        self.assertEqual(self.beer.current_stock, 17)
+
+        sale.cancel_sale('Erreur')
+        self.beer.refresh_from_db()
+        self.assertEqual(self.beer.current_stock, 20)
+        self.assertEqual(
+            list(StockMovement.objects.order_by('id').values_list('movement_type', 'quantity')),
+            [('out', 3), ('return', 3)]
+        )
+
+
+class PurchaseReceivingTests(TestCase):
+    """Tests de la réception des achats en lot"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from suppliers.models import Supplier
+
+        cls.user = User.objects.create_user(username='gerant', password='x', role='manager')
+        cls.supplier = Supplier.objects.create(name='Brarudi')
+        category = Category.objects.create(name='Bières', type='boissons')
+        cls.beer = Product.objects.create(
+            name='Primus', category=category, code='BOI-PRI', purchase_price=Decimal('1000'),
+            selling_price=Decimal('1500'), current_stock=2, minimum_stock=5
+        )
+        cls.soda = Product.objects.create(
+            name='Fanta', category=category, code='BOI-FAN', purchase_price=Decimal('500'),
+            selling_price=Decimal('1000'), current_stock=10, minimum_stock=1
+        )
+
+    def setUp(self):
+        self.mark_dirty = mock.patch('reports.dashboard.DashboardBroadcaster.mark_dirty').start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.purchase = Purchase.objects.create(
+            reference='ACH-1', supplier=self.supplier, user=self.user, status='received'
+        )
+        PurchaseItem.objects.create(
+            purchase=self.purchase, product=self.beer, quantity_ordered=24,
+            quantity_received=24, unit_price=Decimal('900')
+        )
+        PurchaseItem.objects.create(
+            purchase=self.purchase, product=self.soda, quantity_ordered=12,
+            quantity_received=10, unit_price=Decimal('450')
+        )
+        StockAlert.objects.create(
+            product=self.beer, alert_type='low_stock', current_stock=2, threshold=5, message='Stock faible'
+        )
+
+    def test_validation_receives_stock_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            PurchaseReceivingService.validate_delivery(self.purchase.pk, self.user)
+
+        with self.assertRaises(PurchaseStatusError):
+            PurchaseReceivingService.validate_delivery(self.purchase.pk, self.user)
+
+        self.beer.refresh_from_db()
+        self.soda.refresh_from_db()
+        self.assertEqual((self.beer.current_stock, self.soda.current_stock), (26, 20))
+        self.assertEqual(
+            set(StockMovement.objects.values_list(
+                'product_id', 'quantity', 'unit_price', 'stock_before', 'stock_after', 'supplier_id'
+            )),
+            {
+                (self.beer.pk, 24, Decimal('900'), 2, 26, self.supplier.pk),
+                (self.soda.pk, 10, Decimal('450'), 10, 20, self.supplier.pk),
+            }
+        )
+        self.assertEqual(StockAlert.objects.get(product=self.beer).status, 'resolved')
+        self.assertEqual(
+            [call.args[0] for call in self.mark_dirty.call_args_list],
+            [{'low_stock_products': -1}, {'active_alerts': -1}]
+        )
+
+    def test_query_count_does_not_grow_with_lines(self):
+        # savepoint, statut, achat, lignes, savepoint, verrouillage, UPDATE,
+        # INSERT, libération des deux savepoints
+        with self.assertNumQueries(10):
+            PurchaseReceivingService.validate_delivery(self.purchase.pk, self.user)
+
+    def test_confirm_endpoint(self):
+        from rest_framework.test import APIClient
+
+        Purchase.objects.filter(pk=self.purchase.pk).update(status='pending')
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post(f'/api/inventory/purchases/{self.purchase.pk}/confirm/')
+        self.assertEqual(response.status_code, 200)
+        response = client.post(f'/api/inventory/purchases/{self.purchase.pk}/confirm/')
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(StockMovement.objects.count(), 2)
+        self.assertEqual(
+            StockMovement.objects.filter(product=self.beer).get().reference, 'Achat #ACH-1'
+        )
+
+
+class ConcurrentPaymentTests(TransactionTestCase):
+    """Plusieurs caissiers paient en même temps des ventes du même produit"""
+
+    PAYERS = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='x', role='cashier')
+        category = Category.objects.create(name='Bières', type='boissons')
+        self.beer = Product.objects.create(
+            name='Primus', category=category, code='BOI-PRI', purchase_price=Decimal('1000'),
+            selling_price=Decimal('1500'), current_stock=3, minimum_stock=0
+        )
+        self.sales = []
+        for _ in range(self.PAYERS):
+            sale = Sale.objects.create(server=self.user, payment_method='cash')
+            SaleItem.objects.create(sale=sale, product=self.beer, quantity=1, unit_price=self.beer.selling_price)
+            self.sales.append(sale)
+
+    def test_parallel_payers_never_oversell(self):
+        """
+        Sous SQLite un paiement concurrent peut échouer sur le verrou de
+        table : le caissier réessaie, comme le ferait la caisse.
+        """
+        barrier = threading.Barrier(self.PAYERS)
+        refused = []
+
+        def pay(sale):
+            barrier.wait()
+            try:
+                for attempt in range(50):
+                    try:
+                        Sale.objects.get(pk=sale.pk).mark_as_paid(self.user)
+                        return
+                    except OperationalError:
+                        time.sleep(0.01 * (attempt + 1))
+                    except InsufficientStockError as e:
+                        refused.append(e)
+                        return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=pay, args=(sale,)) for sale in self.sales]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.beer.refresh_from_db()
+        paid = Sale.objects.filter(status='paid').count()
+        self.assertEqual(paid, 3)
+        self.assertEqual(len(refused), self.PAYERS - 3)
+        self.assertEqual(self.beer.current_stock, 0)
+        self.assertEqual(StockMovement.objects.filter(product=self.beer).count(), 3)
+
+
+@override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0)
+class StockSummaryTests(TestCase):
+    """Tests du résumé du stock paginé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        cls.user = User.objects.create_user(username='gerant', password='x', role='manager')
+        cls.drinks = Category.objects.create(name='Boissons', type='boissons')
+        cls.dishes = Category.objects.create(name='Plats', type='plats')
+        cls.products = [
+            Product.objects.create(
+                name=f'Produit {index:02d}', category=cls.drinks if index % 2 else cls.dishes,
+                purchase_price=Decimal('100'), selling_price=Decimal('200'),
+                current_stock=index, minimum_stock=5
+            )
+            for index in range(12)
+        ]
+        for days in (3, 1):
+            movement = StockMovement.objects.create(
+                product=cls.products[1], movement_type='in', reason='purchase', quantity=1,
+                stock_before=0, stock_after=1, user=cls.user
+            )
+            StockMovement.objects.filter(pk=movement.pk).update(
+                created_at=timezone.now() - timedelta(days=days)
+            )
+        cls.last_movement = StockMovement.objects.order_by('-created_at').first()
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_keyset_pages_cover_catalogue_in_order(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 5}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/inventory/stock-summary/', params)
+            self.assertEqual(response.status_code, 200)
+            seen += [(row['category_name'], row['product_name']) for row in response.data['results']]
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_row_annotations_and_category_totals(self):
+        from .services import StockSummaryService
+
+        with self.assertNumQueries(1):
+            page = StockSummaryService.get_page(category_id=self.drinks.id)
+        first = page['results'][0]
+        self.assertEqual(first['product_id'], self.products[1].id)
+        self.assertEqual(first['stock_value'], Decimal('100'))
+        self.assertTrue(first['needs_restock'])
+        self.assertEqual(first['last_movement_date'], self.last_movement.created_at)
+        self.assertIsNone(page['results'][1]['last_movement_date'])
+
+        response = self.client.get('/api/inventory/stock-summary/', {'needs_restock': 'true'})
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(
+            [(row['category_name'], row['product_count'], row['restock_count']) for row in response.data['categories']],
+            [('Boissons', 3, 3), ('Plats', 3, 3)]
+        )
+        # Stocks 0..5 : 15 unités à 100 BIF
+        self.assertEqual(response.data['totals']['stock_value'], Decimal('1500'))
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/inventory/stock-summary/', {'cursor': 'x'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/inventory/stock-summary/', {'category': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0)
+class MovementPaginationTests(TestCase):
+    """Tests de la pagination par curseur (created_at, id) des mouvements"""
+
+    MOVEMENTS = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        cls.user = User.objects.create_user(username='gerant', password='x', role='admin')
+        category = Category.objects.create(name='Bières', type='boissons')
+        cls.beer = Product.objects.create(
+            name='Primus', category=category, purchase_price=Decimal('1000'),
+            selling_price=Decimal('1500'), current_stock=100, minimum_stock=5
+        )
+        movements = StockMovement.objects.bulk_create([
+            StockMovement(
+                product=cls.beer, movement_type='in', reason='purchase', quantity=1,
+                stock_before=index, stock_after=index + 1, user=cls.user
+            )
+            for index in range(cls.MOVEMENTS)
+        ])
+        # Trois mouvements par minute : départage par id à date égale
+        now = timezone.now()
+        for index, movement in enumerate(movements):
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=now - timedelta(minutes=index // 3))
+        cls.expected = list(StockMovement.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, link, key='results'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data[key]])
+            url = response.data[link]
+        return pages, response
+
+    def test_pages_walk_forward_and_back(self):
+        pages, last = self.walk('/api/inventory/movements/?page_size=7', 'next')
+
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 4])
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertNotIn('count', last.data)
+
+        back, first = self.walk(last.data['previous'], 'previous')
+        self.assertEqual(back, pages[-2::-1])
+        self.assertIsNotNone(first.data['next'])
+
+    def test_page_cost_does_not_depend_on_position(self):
+        from django.test.utils import CaptureQueriesContext
+
+        url = '/api/inventory/movements/?page_size=5'
+        queries = []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            queries.append(len(context.captured_queries))
+            url = response.data['next']
+
+        self.assertEqual(len(queries), 5)
+        self.assertEqual(set(queries), {1})
+
+    def test_exact_count_on_request(self):
+        response = self.client.get('/api/inventory/movements/', {'page_size': 5, 'count': 'true'})
+        self.assertEqual(response.data['count'], self.MOVEMENTS)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_product_history_is_paginated(self):
+        url = f'/api/inventory/movements/by-product/{self.beer.pk}/?page_size=10'
+        pages, last = self.walk(url, 'next', key='movements')
+
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual(last.data['product']['id'], self.beer.pk)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/inventory/movements/', {'cursor': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ascending_ordering_and_unsupported_ordering(self):
+        pages, last = self.walk('/api/inventory/movements/?page_size=7&ordering=created_at', 'next')
+        self.assertEqual(sum(pages, []), self.expected[::-1])
+
+        back, _ = self.walk(last.data['previous'], 'previous')
+        self.assertEqual(back, pages[-2::-1])
+
+        response = self.client.get('/api/inventory/movements/', {'ordering': 'quantity'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data)
@@ -12,10 +12,14 @@ from .models import StockMovement, Purchase, PurchaseItem
 from rest_framework import permissions
 from .serializers import (
     StockMovementSerializer, PurchaseSerializer, PurchaseItemSerializer,
-    StockSummarySerializer
+    StockSummarySerializer, StockCategoryTotalSerializer
+)
+from .services import (
+    InvalidCursorError, PurchaseReceivingService, PurchaseStatusError, StockSummaryService
 )
 from products.models import Product
 from accounts.permissions import IsAdminOrGerant, IsAuthenticated
+from core.pagination import KeysetPagination
 
 # Vue pour les approvisionnements (supplies)
 class SupplyViewSet(viewsets.ModelViewSet):
@@ -37,38 +41,16 @@ class SupplyViewSet(viewsets.ModelViewSet):
     def validate(self, request, pk=None):
         """Valider une livraison et mettre à jour le stock"""
         supply = self.get_object()
-        
-        if supply.status != 'received':
+
+        # Réception en lot, une seule fois même en cas de double validation
+        try:
+            PurchaseReceivingService.validate_delivery(supply.pk, request.user)
+        except PurchaseStatusError:
             return Response(
                 {'error': 'Seules les livraisons reçues peuvent être validées.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Mettre à jour le stock pour chaque produit
-        for item in supply.items.all():
-            product = item.product
-            product.current_stock += item.quantity_received
-            product.save()
-            
-            # Créer un mouvement de stock
-            StockMovement.objects.create(
-                product=product,
-                movement_type='in',
-                reason='purchase',
-                quantity=item.quantity_received,
-                unit_price=item.unit_price,
-                total_amount=item.total_price,
-                stock_before=product.current_stock - item.quantity_received,
-                stock_after=product.current_stock,
-                supplier=supply.supplier,
-                user=request.user,
-                reference=supply.reference
-            )
-        
-        # Changer le statut à validé
-        supply.status = 'validated'
-        supply.save()
-        
+
         return Response({'message': 'Livraison validée et stock mis à jour.'})
     
     @action(detail=True, methods=['post'])
@@ -88,14 +70,13 @@ class SupplyViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Livraison rejetée.'})
 
 class StockMovementViewSet(viewsets.ModelViewSet):
-    queryset = StockMovement.objects.all()
+    queryset = StockMovement.objects.select_related('product', 'user')
     serializer_class = StockMovementSerializer
     permission_classes = [IsAdminOrGerant]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['movement_type', 'product', 'product__category']
     search_fields = ['reference', 'notes', 'product__name']
-    ordering_fields = ['created_at', 'quantity', 'total_amount']
-    ordering = ['-created_at']
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -144,35 +125,15 @@ class PurchaseViewSet(viewsets.ModelViewSet):
         """Confirmer un achat et mettre à jour le stock"""
         purchase = self.get_object()
 
-        if purchase.status != 'pending':
+        # Confirmation et entrée en stock en lot, une seule fois
+        try:
+            PurchaseReceivingService.confirm_purchase(purchase.pk, request.user)
+        except PurchaseStatusError:
             return Response(
                 {'error': 'Seuls les achats en attente peuvent être confirmés.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Confirmer l'achat
-        purchase.status = 'confirmed'
-        purchase.save()
-
-        # Créer les mouvements de stock pour chaque item
-        for item in purchase.items.all():
-            StockMovement.objects.create(
-                product=item.product,
-                movement_type='in',
-                reason='purchase',
-                quantity=item.quantity,
-                unit_price=item.unit_cost,
-                stock_before=item.product.current_stock,
-                stock_after=item.product.current_stock + item.quantity,
-                reference=f"Achat #{purchase.reference}",
-                notes=f"Confirmation achat du {purchase.purchase_date}",
-                user=request.user
-            )
-
-            # Mettre à jour le stock du produit
-            item.product.current_stock += item.quantity
-            item.product.save()
-
         return Response({'message': 'Achat confirmé avec succès.'})
 
 class PurchaseItemViewSet(viewsets.ModelViewSet):
@@ -186,32 +147,48 @@ class StockSummaryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Résumé complet du stock"""
-        products = Product.objects.select_related('category').annotate(
-            stock_value=F('current_stock') * F('purchase_price'),
-            needs_restock=Q(current_stock__lte=F('minimum_stock'))
-        )
+        """
+        Résumé du stock paginé par curseur
+
+        Paramètres : category (id), needs_restock (true/false), cursor
+        (next_cursor de la page précédente), page_size (max 200).
+        Les totaux par catégorie portent sur tous les produits filtrés.
+        """
+        params = request.query_params
+        try:
+            category_id = int(params['category']) if params.get('category') else None
+            page_size = int(params.get('page_size', StockSummaryService.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'Les paramètres category et page_size doivent être des entiers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        summary_data = []
-        for product in products:
-            # Dernier mouvement
-            last_movement = StockMovement.objects.filter(
-                product=product
-            ).order_by('-created_at').first()
+        needs_restock = params.get('needs_restock')
+        if needs_restock is not None:
+            needs_restock = needs_restock.lower() in ['true', '1', 'yes']
 
-            summary_data.append({
-                'product_id': product.id,
-                'product_name': product.name,
-                'category_name': product.category.name,
-                'current_stock': product.current_stock,
-                'minimum_stock': product.minimum_stock,
-                'stock_value': product.stock_value,
-                'last_movement_date': last_movement.created_at if last_movement else None,
-                'needs_restock': product.current_stock <= product.minimum_stock
-            })
+        try:
+            page = StockSummaryService.get_page(
+                category_id=category_id,
+                needs_restock=needs_restock,
+                cursor=params.get('cursor'),
+                page_size=page_size
+            )
+        except InvalidCursorError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = StockSummarySerializer(summary_data, many=True)
-        return Response(serializer.data)
+        categories = StockSummaryService.get_category_totals(category_id, needs_restock)
+        return Response({
+            'results': StockSummarySerializer(page['results'], many=True).data,
+            'next_cursor': page['next_cursor'],
+            'categories': StockCategoryTotalSerializer(categories, many=True).data,
+            'totals': {
+                'product_count': sum(category['product_count'] for category in categories),
+                'restock_count': sum(category['restock_count'] for category in categories),
+                'stock_value': sum((category['stock_value'] for category in categories), Decimal('0.00')),
+            }
+        })
 
 class LowStockView(APIView):
     permission_classes = [IsAuthenticated]
@@ -239,7 +216,11 @@ class ProductMovementsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, product_id):
-        """Historique des mouvements pour un produit"""
+        """
+        Historique des mouvements pour un produit, paginé par curseur
+
+        Paramètres : cursor (liens next/previous), page_size, count=true
+        """
         try:
             product = Product.objects.get(id=product_id)
         except Product.DoesNotExist:
@@ -248,18 +229,22 @@ class ProductMovementsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        movements = StockMovement.objects.filter(
-            product=product
-        ).order_by('-created_at')
+        paginator = KeysetPagination()
+        movements = paginator.paginate_queryset(
+            StockMovement.objects.filter(product=product).select_related('product', 'user'),
+            request,
+            view=self
+        )
 
-        serializer = StockMovementSerializer(movements, many=True)
+        page = paginator.get_paginated_data(StockMovementSerializer(movements, many=True).data)
         return Response({
             'product': {
                 'id': product.id,
                 'name': product.name,
                 'current_stock': product.current_stock
             },
-            'movements': serializer.data
+            'movements': page.pop('results'),
+            **page
         })
 
 
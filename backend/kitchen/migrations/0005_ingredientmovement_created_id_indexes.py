@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0004_alter_ingredient_fournisseur'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredientmovement',
+            index=models.Index(fields=['created_at', 'id'], name='ingredient_move_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredientmovement',
+            index=models.Index(fields=['ingredient', 'created_at', 'id'], name='ingredient_move_ingr_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 
 class Ingredient(models.Model):
@@ -146,6 +147,71 @@ class Ingredient(models.Model):
 
         return self.quantite_restante
 
+    @classmethod
+    def lock(cls, ingredient_ids):
+        """
+        Verrouille des ingrédients en une seule requête (triée par id pour
+        éviter les interblocages)
+
+        Returns:
+            {ingredient_id: Ingredient}
+        """
+        return {
+            ingredient.pk: ingredient
+            for ingredient in cls.objects.select_for_update().filter(pk__in=ingredient_ids).order_by('pk')
+        }
+
+    @classmethod
+    def consume_batch(cls, consumptions, user=None, notes=None, reference=None):
+        """
+        Consomme plusieurs ingrédients déjà verrouillés (voir lock)
+
+        Tous les stocks sont décomptés par un seul bulk_update, les mouvements
+        écrits par un seul bulk_create et les alertes de stock vérifiées une
+        seule fois pour le lot, après validation de la transaction.
+
+        Args:
+            consumptions: Liste de (Ingredient, quantité)
+        """
+        totals = {}
+        for ingredient, quantity in consumptions:
+            ingredient, total = totals.get(ingredient.pk, (ingredient, Decimal('0.000')))
+            totals[ingredient.pk] = (ingredient, total + quantity)
+
+        for ingredient, quantity in totals.values():
+            if not ingredient.can_fulfill_quantity(quantity):
+                raise ValueError(f"Stock insuffisant pour {ingredient.nom}. "
+                                 f"Disponible: {ingredient.quantite_restante}, demandé: {quantity}")
+
+        now = timezone.now()
+        movements = []
+        changes = []
+        for ingredient, quantity in totals.values():
+            old_stock = ingredient.quantite_restante
+            changes.append((ingredient, ingredient.is_low_stock, ingredient.is_out_of_stock))
+            ingredient.quantite_restante -= quantity
+            ingredient.date_maj = now
+            movements.append(IngredientMovement(
+                ingredient=ingredient,
+                movement_type='out',
+                reason='consumption',
+                quantity=quantity,
+                stock_before=old_stock,
+                stock_after=ingredient.quantite_restante,
+                user=user,
+                notes=notes or "Consommation pour recette",
+                reference=reference
+            ))
+
+        ingredients = [ingredient for ingredient, _ in totals.values()]
+        cls.objects.bulk_update(ingredients, ['quantite_restante', 'date_maj'])
+        IngredientMovement.objects.bulk_create(movements)
+
+        from .signals import check_stock_transitions
+        transaction.on_commit(lambda: check_stock_transitions(changes))
+
+        return movements
+
 
 class IngredientMovement(models.Model):
     """
@@ -262,6 +328,11 @@ class IngredientMovement(models.Model):
         verbose_name = 'Mouvement d\'ingrédient'
         verbose_name_plural = 'Mouvements d\'ingrédients'
         ordering = ['-created_at']
+        indexes = [
+            # Pagination par curseur (created_at, id), globale et par ingrédient
+            models.Index(fields=['created_at', 'id'], name='ingredient_move_created_idx'),
+            models.Index(fields=['ingredient', 'created_at', 'id'], name='ingredient_move_ingr_idx'),
+        ]
 
     def __str__(self):
         return f"{self.ingredient.nom} - {self.get_movement_type_display()} - {self.quantity}"
@@ -387,72 +458,80 @@ class Recipe(models.Model):
         quantity: nombre de portions à préparer
 
         🔒 TRANSACTION ATOMIQUE: Soit tous les ingrédients sont décomptés, soit aucun
+
+        Les ingrédients (et leurs substituts) sont verrouillés en une requête ;
+        un ingrédient obligatoire manquant est remplacé par son premier substitut
+        disponible, un ingrédient optionnel manquant est ignoré.
         """
-        # 1. VALIDATION GLOBALE PRÉALABLE
-        validation_result = self.validate_ingredients_availability(quantity)
-        if not validation_result['can_prepare']:
-            raise ValidationError({
-                'message': f"Impossible de préparer {quantity}x {self.nom_recette}",
-                'missing_ingredients': validation_result['missing_ingredients'],
-                'total_ingredients': validation_result['total_ingredients'],
-                'available_ingredients': validation_result['available_ingredients']
-            })
+        recipe_ingredients = list(self.ingredients.all())
+        substitutions = {}
+        for substitution in IngredientSubstitution.objects.filter(
+            original_ingredient_id__in=[ri.ingredient_id for ri in recipe_ingredients],
+            is_active=True
+        ).order_by('priority'):
+            substitutions.setdefault(substitution.original_ingredient_id, []).append(substitution)
+
+        # 1. VERROUILLAGE UNIQUE DE TOUS LES INGRÉDIENTS CONCERNÉS
+        locked = Ingredient.lock(
+            {ri.ingredient_id for ri in recipe_ingredients}
+            | {sub.substitute_ingredient_id for subs in substitutions.values() for sub in subs}
+        )
+        remaining = {pk: ingredient.quantite_restante for pk, ingredient in locked.items()}
 
+        # 2. PLAN DE CONSOMMATION
+        consumptions = []
         consumed_ingredients = []
+        missing_ingredients = []
+        for ingredient_recipe in recipe_ingredients:
+            ingredient = locked[ingredient_recipe.ingredient_id]
+            total_needed = ingredient_recipe.quantite_utilisee_par_plat * quantity
+
+            if remaining[ingredient.pk] < total_needed:
+                substitute = None
+                for substitution in substitutions.get(ingredient.pk, []):
+                    needed_substitute = total_needed * substitution.conversion_ratio
+                    if remaining[substitution.substitute_ingredient_id] >= needed_substitute:
+                        substitute = locked[substitution.substitute_ingredient_id]
+                        break
+
+                if substitute is not None:
+                    ingredient, total_needed = substitute, needed_substitute
+                elif ingredient_recipe.is_optional:
+                    continue
+                else:
+                    missing_ingredients.append({
+                        'name': ingredient.nom,
+                        'needed': float(total_needed),
+                        'available': float(remaining[ingredient.pk]),
+                        'unit': ingredient.unite,
+                        'shortage': float(total_needed - remaining[ingredient.pk])
+                    })
+                    continue
+
+            remaining[ingredient.pk] -= total_needed
+            consumptions.append((ingredient, total_needed))
+            consumed_ingredients.append({
+                'ingredient': ingredient,
+                'quantity_consumed': total_needed,
+                'stock_before': remaining[ingredient.pk] + total_needed,
+                'stock_after': remaining[ingredient.pk]
+            })
 
-        # 2. DÉCOMPTE TRANSACTIONNEL
-        # Si une erreur survient, Django annulera automatiquement toute la transaction
-        try:
-            # Créer un point de sauvegarde pour rollback manuel si nécessaire
-            savepoint = transaction.savepoint()
-
-            for ingredient_recipe in self.ingredients.select_for_update().all():
-                total_needed = ingredient_recipe.quantite_utilisee_par_plat * quantity
-
-                # Vérification finale avant décompte (double sécurité)
-                ingredient = ingredient_recipe.ingredient
-                if not ingredient.can_fulfill_quantity(total_needed):
-                    raise ValidationError(
-                        f"Stock insuffisant pour {ingredient.nom}: "
-                        f"besoin {total_needed} {ingredient.unite}, "
-                        f"disponible {ingredient.quantite_restante} {ingredient.unite}"
-                    )
-
-                # Décompter l'ingrédient
-                ingredient.consume(
-                    quantity=total_needed,
-                    user=user,
-                    notes=f"Préparation de {quantity}x {self.nom_recette}"
-                )
-
-                consumed_ingredients.append({
-                    'ingredient': ingredient,
-                    'quantity_consumed': total_needed,
-                    'stock_before': ingredient.quantite_restante + total_needed,
-                    'stock_after': ingredient.quantite_restante
-                })
-
-            # Si on arrive ici, tout s'est bien passé
-            transaction.savepoint_commit(savepoint)
-
-        except Exception as e:
-            # Rollback automatique par Django + log de l'erreur
-            transaction.savepoint_rollback(savepoint)
-
-            # Log détaillé pour debug
-            error_msg = f"Erreur lors de la consommation des ingrédients pour {self.nom_recette}: {str(e)}"
-            print(f"🚨 {error_msg}")
-
-            # Re-lever l'exception avec plus de contexte
+        if missing_ingredients:
             raise ValidationError({
-                'message': error_msg,
-                'recipe': self.nom_recette,
-                'quantity_requested': quantity,
-                'ingredients_processed': len(consumed_ingredients),
-                'total_ingredients': self.ingredients.count(),
-                'original_error': str(e)
+                'message': f"Impossible de préparer {quantity}x {self.nom_recette}",
+                'missing_ingredients': missing_ingredients,
+                'total_ingredients': len(recipe_ingredients),
+                'available_ingredients': len(recipe_ingredients) - len(missing_ingredients)
             })
 
+        # 3. DÉCOMPTE EN LOT
+        Ingredient.consume_batch(
+            consumptions,
+            user=user,
+            notes=f"Préparation de {quantity}x {self.nom_recette}"
+        )
+
         return consumed_ingredients
 
     def validate_ingredients_availability(self, quantity=1, use_substitutions=True):
@@ -4,7 +4,6 @@ Signaux pour le système d'alertes automatiques des ingrédients
 
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils import timezone
@@ -43,10 +42,17 @@ def check_ingredient_stock_alerts(sender, instance, created, **kwargs):
         return
     
     # Vérifier si le statut a changé
-    old_quantite = getattr(instance, '_old_quantite', None)
     was_low_stock = getattr(instance, '_was_low_stock', False)
     was_out_of_stock = getattr(instance, '_was_out_of_stock', False)
-    
+
+    check_stock_transition(instance, was_low_stock, was_out_of_stock)
+
+
+def check_stock_transition(instance, was_low_stock, was_out_of_stock):
+    """
+    Crée l'alerte et envoie les notifications si l'ingrédient vient de
+    passer sous le seuil d'alerte ou en rupture
+    """
     current_is_low_stock = instance.is_low_stock
     current_is_out_of_stock = instance.is_out_of_stock
     
@@ -78,6 +84,17 @@ def check_ingredient_stock_alerts(sender, instance, created, **kwargs):
         send_stock_alert_notifications(instance)
 
 
+def check_stock_transitions(changes):
+    """
+    Vérifie les alertes d'un lot de consommations (Ingredient.consume_batch)
+
+    changes: Liste de (ingredient, était_en_stock_faible, était_en_rupture)
+    """
+    for ingredient, was_low_stock, was_out_of_stock in changes:
+        if ingredient.is_active:
+            check_stock_transition(ingredient, was_low_stock, was_out_of_stock)
+
+
 def create_stock_alert(ingredient, alert_type, message):
     """
     Crée une alerte de stock dans la base de données
@@ -108,6 +125,9 @@ def create_stock_alert(ingredient, alert_type, message):
 def send_stock_alert_notifications(ingredient):
     """
     Envoie les notifications d'alerte de stock
+
+    Les messages sont écrits dans la file NotificationOutbox (même transaction
+    que la modification du stock) et envoyés par le worker.
     """
     try:
         # Préparer le contexte pour les notifications
@@ -143,12 +163,14 @@ def send_stock_alert_notifications(ingredient):
 
 def send_email_alert(context):
     """
-    Envoie une alerte par email
+    Met en file d'attente une alerte par email
     """
     try:
         if not settings.EMAIL_HOST_USER:
             return
         
+        from alerts.outbox import OutboxService
+        
         # Liste des emails des gestionnaires (à configurer)
         manager_emails = [
             settings.EMAIL_HOST_USER,  # Email par défaut
@@ -159,16 +181,14 @@ def send_email_alert(context):
         html_message = render_to_string('emails/stock_alert.html', context)
         plain_message = context['message']
         
-        send_mail(
+        OutboxService.enqueue_email(
             subject=context['subject'],
             message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=manager_emails,
-            html_message=html_message,
-            fail_silently=True
+            recipients=manager_emails,
+            html_message=html_message
         )
         
-        print(f"📧 Email d'alerte envoyé pour {context['ingredient'].nom}")
+        print(f"📧 Email d'alerte en file d'attente pour {context['ingredient'].nom}")
         
     except Exception as e:
         print(f"Erreur envoi email: {e}")
@@ -176,11 +196,10 @@ def send_email_alert(context):
 
 def send_sms_alert(context):
     """
-    Envoie une alerte par SMS
+    Met en file d'attente une alerte par SMS pour chaque membre du personnel
     """
     try:
-        # Importer le service de notifications
-        from core.notifications import NotificationService
+        from alerts.outbox import OutboxService
         
         # Numéros de téléphone du personnel (configurés dans settings)
         staff_numbers = getattr(settings, 'STAFF_PHONE_NUMBERS', [])
@@ -191,17 +210,9 @@ def send_sms_alert(context):
         sms_message = f"{settings.RESTAURANT_NAME}: {context['message']}"
         
         for phone_number in staff_numbers:
-            try:
-                result = NotificationService.send_sms(
-                    phone_number=phone_number,
-                    message=sms_message
-                )
-                if result.get('success'):
-                    print(f"📱 SMS d'alerte envoyé à {phone_number}")
-                else:
-                    print(f"❌ Échec SMS à {phone_number}: {result.get('error')}")
-            except Exception as e:
-                print(f"Erreur SMS pour {phone_number}: {e}")
+            OutboxService.enqueue_sms(phone_number, sms_message)
+        
+        print(f"📱 {len(staff_numbers)} SMS d'alerte en file d'attente")
                 
     except Exception as e:
         print(f"Erreur service SMS: {e}")
@@ -209,37 +220,30 @@ def send_sms_alert(context):
 
 def send_websocket_alert(context):
     """
-    Envoie une alerte en temps réel via WebSocket
+    Met en file d'attente une alerte temps réel via WebSocket
     """
     try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
+        from alerts.outbox import OutboxService
         
-        channel_layer = get_channel_layer()
+        # Données à envoyer via WebSocket
+        alert_data = {
+            'type': 'stock_alert',
+            'ingredient_name': context['ingredient'].nom,
+            'current_stock': float(context['ingredient'].quantite_restante),
+            'minimum_stock': float(context['ingredient'].seuil_alerte),
+            'unit': context['ingredient'].unite,
+            'alert_level': 'critical' if context['ingredient'].is_out_of_stock else 'warning',
+            'message': context['message'],
+            'timestamp': context['timestamp'].isoformat()
+        }
         
-        if channel_layer:
-            # Données à envoyer via WebSocket
-            alert_data = {
-                'type': 'stock_alert',
-                'ingredient_name': context['ingredient'].nom,
-                'current_stock': float(context['ingredient'].quantite_restante),
-                'minimum_stock': float(context['ingredient'].seuil_alerte),
-                'unit': context['ingredient'].unite,
-                'alert_level': 'critical' if context['ingredient'].is_out_of_stock else 'warning',
-                'message': context['message'],
-                'timestamp': context['timestamp'].isoformat()
-            }
-            
-            # Envoyer à tous les clients connectés au groupe 'kitchen_alerts'
-            async_to_sync(channel_layer.group_send)(
-                'kitchen_alerts',
-                {
-                    'type': 'send_alert',
-                    'alert': alert_data
-                }
-            )
-            
-            print(f"🔔 Alerte WebSocket envoyée pour {context['ingredient'].nom}")
+        # Envoyer à tous les clients connectés au groupe 'kitchen_alerts'
+        OutboxService.enqueue_websocket('kitchen_alerts', {
+            'type': 'send_alert',
+            'alert': alert_data
+        })
+        
+        print(f"🔔 Alerte WebSocket en file d'attente pour {context['ingredient'].nom}")
             
     except Exception as e:
         print(f"Erreur WebSocket: {e}")
@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from products.models import Category, Product
+from .models import Ingredient, IngredientMovement, IngredientSubstitution, Recipe, RecipeIngredient
+
+
+class RecipeConsumptionTests(TestCase):
+    """Tests de la consommation des ingrédients en lot"""
+
+    INGREDIENTS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cuisinier', password='x', role='manager')
+        category = Category.objects.create(name='Grillades', type='plats')
+        cls.dish = Product.objects.create(
+            name='Brochettes', category=category, code='PLA-BRO',
+            purchase_price=Decimal('0'), selling_price=Decimal('8000')
+        )
+        cls.recipe = Recipe.objects.create(plat=cls.dish, nom_recette='Brochettes', created_by=cls.user)
+        cls.ingredients = []
+        for index in range(cls.INGREDIENTS):
+            ingredient = Ingredient.objects.create(
+                nom=f"Ingrédient {index:02d}", quantite_restante=Decimal('10.000'),
+                seuil_alerte=Decimal('2.000'), unite='kg', prix_unitaire=Decimal('100')
+            )
+            RecipeIngredient.objects.create(
+                recipe=cls.recipe, ingredient=ingredient,
+                quantite_utilisee_par_plat=Decimal('0.500'), unite='kg'
+            )
+            cls.ingredients.append(ingredient)
+
+    def test_consumes_every_ingredient(self):
+        consumed = self.recipe.consume_ingredients(quantity=2, user=self.user)
+
+        self.assertEqual(len(consumed), self.INGREDIENTS)
+        self.assertEqual(
+            set(Ingredient.objects.values_list('quantite_restante', flat=True)),
+            {Decimal('9.000')}
+        )
+        self.assertEqual(IngredientMovement.objects.filter(movement_type='out').count(), self.INGREDIENTS)
+
+    def test_query_count_for_twelve_ingredients(self):
+        with self.assertNumQueries(7):
+            # savepoint, ingrédients de recette, substitutions, verrouillage,
+            # bulk_update, bulk_create, libération du savepoint
+            self.recipe.consume_ingredients(quantity=1, user=self.user)
+
+    def test_missing_ingredient_changes_nothing(self):
+        Ingredient.objects.filter(pk=self.ingredients[5].pk).update(quantite_restante=Decimal('0.100'))
+
+        with self.assertRaises(ValidationError):
+            self.recipe.consume_ingredients(quantity=1, user=self.user)
+
+        self.assertEqual(Ingredient.objects.filter(quantite_restante=Decimal('10.000')).count(), self.INGREDIENTS - 1)
+        self.assertFalse(IngredientMovement.objects.exists())
+
+    def test_substitute_and_optional_ingredients(self):
+        missing, optional = self.ingredients[0], self.ingredients[1]
+        Ingredient.objects.filter(pk__in=[missing.pk, optional.pk]).update(quantite_restante=Decimal('0'))
+        RecipeIngredient.objects.filter(ingredient=optional).update(is_optional=True)
+        substitute = Ingredient.objects.create(
+            nom='Substitut', quantite_restante=Decimal('5.000'), unite='kg'
+        )
+        IngredientSubstitution.objects.create(
+            original_ingredient=missing, substitute_ingredient=substitute, conversion_ratio=Decimal('2.000')
+        )
+
+        consumed = self.recipe.consume_ingredients(quantity=1, user=self.user)
+
+        self.assertEqual(len(consumed), self.INGREDIENTS - 1)
+        substitute.refresh_from_db()
+        self.assertEqual(substitute.quantite_restante, Decimal('4.000'))
+
+    def test_low_stock_checked_once_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.recipe.consume_ingredients(quantity=17, user=self.user)
+
+        self.assertEqual(len(callbacks), 1)
+
+    @override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0)
+    def test_movement_listings_are_paginated(self):
+        from rest_framework.test import APIClient
+
+        self.recipe.consume_ingredients(quantity=2, user=self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/kitchen/movements/', {'page_size': 5, 'count': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(response.data['count'], self.INGREDIENTS)
+        self.assertIsNotNone(response.data['next'])
+
+        response = client.get(f'/api/kitchen/ingredients/{self.ingredients[0].pk}/movements/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['ingredient'] for row in response.data['results']], [self.ingredients[0].pk])
+        self.assertIsNone(response.data['next'])
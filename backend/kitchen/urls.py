@@ -5,6 +5,7 @@ from . import views
 # Router pour les ViewSets
 router = DefaultRouter()
 router.register(r'ingredients', views.IngredientViewSet)
+router.register(r'movements', views.IngredientMovementViewSet)
 
 urlpatterns = [
     # API ViewSets
@@ -9,6 +9,8 @@ from django.db.models import Sum, Count, F, Q
 from django.utils import timezone
 from datetime import timedelta
 
+from core.pagination import KeysetPagination
+
 from .models import Ingredient, IngredientMovement, Recipe, RecipeIngredient
 from .serializers import (
     IngredientSerializer, IngredientListSerializer, IngredientMovementSerializer,
@@ -343,6 +345,20 @@ class IngredientViewSet(viewsets.ModelViewSet):
             'generated_at': timezone.now().isoformat()
         })
 
+    @action(detail=True, methods=['get'])
+    def movements(self, request, pk=None):
+        """Historique des mouvements d'un ingrédient, paginé par curseur"""
+        ingredient = self.get_object()
+        paginator = KeysetPagination()
+        movements = paginator.paginate_queryset(
+            IngredientMovement.objects.filter(ingredient=ingredient).select_related(
+                'ingredient', 'supplier', 'user'
+            ),
+            request,
+            view=self
+        )
+        return paginator.get_paginated_response(IngredientMovementSerializer(movements, many=True).data)
+
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
         """Mettre à jour le stock d'un ingrédient avec traçabilité"""
@@ -397,3 +413,16 @@ class IngredientViewSet(viewsets.ModelViewSet):
                 )
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class IngredientMovementViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Historique des mouvements d'ingrédients, paginé par curseur (created_at, id)
+    """
+    queryset = IngredientMovement.objects.select_related('ingredient', 'supplier', 'user')
+    serializer_class = IngredientMovementSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_fields = ['ingredient', 'movement_type', 'reason', 'supplier']
+    search_fields = ['reference', 'notes', 'ingredient__nom']
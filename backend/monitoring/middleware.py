@@ -0,0 +1,79 @@
+"""
+Middleware de mesure des performances des requêtes
+"""
+
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .performance import PerformanceLogBuffer
+
+
+class QueryCollector:
+    """Wrapper d'exécution SQL qui compte les requêtes et leur durée"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class PerformanceLogMiddleware:
+    """
+    Mesure le temps de réponse, le nombre de requêtes SQL et le temps passé
+    en base d'un échantillon des requêtes (PERFORMANCE_LOG_SAMPLE_RATE)
+
+    Les requêtes non échantillonnées ne paient qu'un tirage aléatoire. Les
+    mesures sont regroupées par route (api/sales/<int:pk>/ plutôt que
+    /api/sales/42/) et écrites par PerformanceLogBuffer en arrière-plan.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = getattr(settings, 'PERFORMANCE_LOG_SAMPLE_RATE', 0.1)
+        if sample_rate <= 0 or random.random() >= sample_rate:
+            return self.get_response(request)
+
+        collector = QueryCollector()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        # Requêtes sans vue (404 de résolution, fichiers statiques) ignorées
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is not None:
+            self.log(request, response, resolver_match, elapsed, collector)
+
+        return response
+
+    def log(self, request, response, resolver_match, elapsed, collector):
+        from .models import PerformanceLog
+
+        user = getattr(request, 'user', None)
+        PerformanceLogBuffer.add(PerformanceLog(
+            endpoint=('/' + re.sub(r'[\^$]', '', resolver_match.route))[:200],
+            method=request.method,
+            response_time=round(elapsed * 1000, 2),
+            status_code=response.status_code,
+            query_count=collector.count,
+            db_time=round(collector.duration * 1000, 2),
+            user_id=user.pk if user is not None and user.is_authenticated else None,
+            timestamp=timezone.now()
+        ))
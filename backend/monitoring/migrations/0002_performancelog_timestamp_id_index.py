@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='performancelog',
+            name='monitoring__timesta_5178f7_idx',
+        ),
+        migrations.AddIndex(
+            model_name='performancelog',
+            index=models.Index(fields=['timestamp', 'id'], name='perf_log_timestamp_id_idx'),
+        ),
+    ]
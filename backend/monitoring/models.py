@@ -168,6 +168,16 @@ class PerformanceLog(models.Model):
         verbose_name='Code de statut'
     )
     
+    query_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Requêtes SQL'
+    )
+    
+    db_time = models.FloatField(
+        default=0,
+        verbose_name='Temps base de données (ms)'
+    )
+    
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -188,6 +198,8 @@ class PerformanceLog(models.Model):
         indexes = [
             models.Index(fields=['endpoint', '-timestamp']),
             models.Index(fields=['status_code', '-timestamp']),
+            # Fenêtres de temps et pagination par curseur (timestamp, id)
+            models.Index(fields=['timestamp', 'id'], name='perf_log_timestamp_id_idx'),
         ]
     
     def __str__(self):
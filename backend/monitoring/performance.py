@@ -0,0 +1,207 @@
+"""
+Collecte et statistiques des logs de performance des endpoints API
+"""
+
+import atexit
+import logging
+import math
+import threading
+from datetime import timedelta
+from itertools import groupby
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, close_old_connections, connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class PerformanceLogBuffer:
+    """
+    Tampon des PerformanceLog mesurés par PerformanceLogMiddleware
+
+    Les logs sont écrits par un thread en arrière-plan, jamais dans la
+    requête mesurée : en un seul bulk_create au plus tard
+    PERFORMANCE_LOG_FLUSH_INTERVAL secondes après le premier log en attente,
+    ou dès que PERFORMANCE_LOG_BATCH_SIZE logs sont en attente. Le tampon est
+    propre au processus et vidé à l'arrêt (atexit), sauf si la base a changé
+    entre-temps (base de test détruite à la fin des tests).
+
+    Un utilisateur supprimé avant l'écriture ne fait pas perdre le lot : ses
+    logs sont écrits sans utilisateur.
+    """
+
+    _lock = threading.Lock()
+    _pending = []
+    _database = None
+    _timer = None
+
+    @staticmethod
+    def _database_name():
+        return connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+
+    @staticmethod
+    def add(log):
+        """Ajoute un PerformanceLog (non enregistré) au tampon"""
+        cls = PerformanceLogBuffer
+        with cls._lock:
+            if not cls._pending:
+                cls._database = cls._database_name()
+            cls._pending.append(log)
+            if len(cls._pending) >= getattr(settings, 'PERFORMANCE_LOG_BATCH_SIZE', 100):
+                delay = 0
+            elif cls._timer is None:
+                delay = getattr(settings, 'PERFORMANCE_LOG_FLUSH_INTERVAL', 5.0)
+            else:
+                return
+
+            if cls._timer is not None:
+                cls._timer.cancel()
+            cls._timer = cls._start_timer(delay, cls._flush_in_thread)
+
+    @staticmethod
+    def reset():
+        """Abandonne les logs en attente et l'écriture programmée"""
+        cls = PerformanceLogBuffer
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+            cls._pending, cls._timer = [], None
+
+    @staticmethod
+    def _start_timer(delay, function):
+        """Lance l'écriture différée dans un thread (remplacé dans les tests)"""
+        timer = threading.Timer(delay, function)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    @staticmethod
+    def _flush_in_thread():
+        try:
+            PerformanceLogBuffer.flush()
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def flush() -> int:
+        """
+        Écrit les logs en attente (un INSERT groupé)
+
+        Returns:
+            Nombre de logs écrits
+        """
+        from .models import PerformanceLog
+
+        cls = PerformanceLogBuffer
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+            logs, database = cls._pending, cls._database
+            cls._pending, cls._database, cls._timer = [], None, None
+
+        if not logs or database != cls._database_name():
+            return 0
+
+        try:
+            try:
+                with transaction.atomic():
+                    PerformanceLog.objects.bulk_create(logs)
+            except IntegrityError:
+                PerformanceLogBuffer._detach_deleted_users(logs)
+                with transaction.atomic():
+                    PerformanceLog.objects.bulk_create(logs)
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'écriture des logs de performance: {str(e)}")
+            return 0
+
+        return len(logs)
+
+    @staticmethod
+    def _detach_deleted_users(logs):
+        """Retire des logs les utilisateurs supprimés depuis la mesure"""
+        from django.contrib.auth import get_user_model
+
+        user_ids = {log.user_id for log in logs if log.user_id is not None}
+        existing = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        for log in logs:
+            log.pk = None
+            if log.user_id not in existing:
+                log.user_id = None
+
+
+atexit.register(PerformanceLogBuffer.flush)
+
+
+class PerformanceStatsService:
+    """
+    Service pour les percentiles de temps de réponse par endpoint
+    """
+
+    PERCENTILES = (50, 95, 99)
+
+    @staticmethod
+    def percentile(sorted_values: List[float], percent: float) -> float:
+        """Percentile par rang le plus proche d'une liste triée"""
+        if not sorted_values:
+            return 0
+        rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+        return sorted_values[rank - 1]
+
+    @staticmethod
+    def get_endpoint_percentiles(hours: int = 24, method: Optional[str] = None,
+                                 min_count: int = 1) -> List[Dict]:
+        """
+        Percentiles du temps de réponse de chaque endpoint (une requête)
+
+        Les logs de la fenêtre sont lus triés par endpoint, méthode et temps
+        de réponse : chaque groupe est déjà trié pour le calcul des rangs.
+
+        Args:
+            hours: Fenêtre d'analyse en heures
+            method: Méthode HTTP (toutes par défaut)
+            min_count: Nombre minimal de mesures pour retenir un endpoint
+
+        Returns:
+            [{'endpoint', 'method', 'count', 'p50', 'p95', 'p99', 'max',
+              'avg_queries', 'avg_db_time', 'error_rate'}], du p95 le plus
+            élevé au plus faible
+        """
+        from .models import PerformanceLog
+
+        queryset = PerformanceLog.objects.filter(
+            timestamp__gte=timezone.now() - timedelta(hours=hours)
+        )
+        if method:
+            queryset = queryset.filter(method=method.upper())
+
+        rows = queryset.order_by('endpoint', 'method', 'response_time').values_list(
+            'endpoint', 'method', 'response_time', 'query_count', 'db_time', 'status_code'
+        )
+
+        results = []
+        for (endpoint, http_method), group in groupby(rows.iterator(), key=lambda row: row[:2]):
+            group = list(group)
+            count = len(group)
+            if count < min_count:
+                continue
+
+            response_times = [row[2] for row in group]
+            result = {
+                'endpoint': endpoint,
+                'method': http_method,
+                'count': count,
+            }
+            for percent in PerformanceStatsService.PERCENTILES:
+                result[f'p{percent}'] = round(PerformanceStatsService.percentile(response_times, percent), 2)
+            result.update({
+                'max': round(response_times[-1], 2),
+                'avg_queries': round(sum(row[3] for row in group) / count, 2),
+                'avg_db_time': round(sum(row[4] for row in group) / count, 2),
+                'error_rate': round(sum(1 for row in group if row[5] >= 500) / count * 100, 2)
+            })
+            results.append(result)
+
+        results.sort(key=lambda result: result['p95'], reverse=True)
+        return results
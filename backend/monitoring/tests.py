@@ -0,0 +1,116 @@
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .models import PerformanceLog
+from .performance import PerformanceLogBuffer, PerformanceStatsService
+
+
+class PerformanceLogMiddlewareTests(TestCase):
+    """Tests de la mesure échantillonnée des requêtes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='gerant', password='x', role='manager')
+
+    def setUp(self):
+        # Logs laissés par les requêtes échantillonnées des autres tests
+        PerformanceLogBuffer.reset()
+        PerformanceLog.objects.all().delete()
+        self.timer = mock.patch.object(PerformanceLogBuffer, '_start_timer').start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(PerformanceLogBuffer.reset)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(PERFORMANCE_LOG_SAMPLE_RATE=1)
+    def test_sampled_request_is_buffered_then_written(self):
+        response = self.client.get('/api/sales/42/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(PerformanceLog.objects.exists())
+        self.timer.assert_called_once()
+
+        self.assertEqual(PerformanceLogBuffer.flush(), 1)
+        log = PerformanceLog.objects.get()
+        self.assertEqual((log.endpoint, log.method, log.status_code), ('/api/sales/<int:pk>/', 'GET', 404))
+        self.assertGreaterEqual(log.query_count, 1)
+        self.assertEqual(log.user, self.user)
+
+    @override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_measured(self):
+        self.client.get('/api/sales/')
+        self.assertEqual(PerformanceLogBuffer.flush(), 0)
+
+    @override_settings(PERFORMANCE_LOG_SAMPLE_RATE=1, PERFORMANCE_LOG_BATCH_SIZE=2)
+    def test_full_batch_is_flushed_immediately(self):
+        self.client.get('/api/sales/')
+        self.client.get('/api/sales/')
+        self.assertEqual(self.timer.call_args_list[-1].args[0], 0)
+
+
+class PerformanceLogBufferTests(TransactionTestCase):
+    """Tests de l'écriture groupée des logs"""
+
+    def setUp(self):
+        PerformanceLogBuffer.reset()
+        PerformanceLog.objects.all().delete()
+        mock.patch.object(PerformanceLogBuffer, '_start_timer').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_deleted_user_does_not_drop_the_batch(self):
+        user = User.objects.create_user(username='gerant', password='x', role='manager')
+        deleted = User.objects.create_user(username='parti', password='x', role='server')
+        for log_user in (user, deleted):
+            PerformanceLogBuffer.add(PerformanceLog(
+                endpoint='/api/sales/', method='GET', response_time=10.0, status_code=200, user=log_user
+            ))
+        User.objects.filter(pk=deleted.pk).delete()
+
+        self.assertEqual(PerformanceLogBuffer.flush(), 2)
+        self.assertEqual(
+            sorted(PerformanceLog.objects.values_list('user_id', flat=True), key=str),
+            sorted([user.pk, None], key=str)
+        )
+
+
+@override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0)
+class PerformanceStatsServiceTests(TestCase):
+    """Tests des percentiles par endpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        PerformanceLogBuffer.reset()
+        PerformanceLog.objects.all().delete()
+        PerformanceLog.objects.bulk_create(
+            [
+                PerformanceLog(endpoint='/api/sales/', method='GET', response_time=float(value),
+                               status_code=200, query_count=4, db_time=1.5)
+                for value in range(100, 0, -1)
+            ] + [
+                PerformanceLog(endpoint='/api/sales/', method='POST', response_time=500.0,
+                               status_code=500, query_count=10)
+            ]
+        )
+
+    def test_percentiles_per_endpoint_and_method(self):
+        with self.assertNumQueries(1):
+            results = PerformanceStatsService.get_endpoint_percentiles()
+
+        self.assertEqual([result['method'] for result in results], ['POST', 'GET'])
+        get = results[1]
+        self.assertEqual((get['count'], get['p50'], get['p95'], get['p99'], get['max']), (100, 50, 95, 99, 100))
+        self.assertEqual((get['avg_queries'], get['avg_db_time'], get['error_rate']), (4, 1.5, 0))
+        self.assertEqual(results[0]['error_rate'], 100)
+
+    def test_percentiles_endpoint(self):
+        client = APIClient()
+        response = client.get('/api/monitoring/performance/percentiles/', {'method': 'get', 'min_count': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['endpoints']), 1)
+        self.assertEqual(response.data['endpoints'][0]['p99'], 99)
+
+        response = client.get('/api/monitoring/performance/percentiles/', {'hours': 'x'})
+        self.assertEqual(response.status_code, 400)
@@ -4,13 +4,17 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework import permissions
+from django.conf import settings
 from django.utils import timezone
 from django.db.models import Avg, Count
 from datetime import timedelta
 import psutil
 import platform
 
+from core.pagination import TimestampKeysetPagination
+
 from .models import SystemMetric, SystemAlert, PerformanceLog
+from .performance import PerformanceStatsService
 from .serializers import (
     SystemMetricSerializer, SystemAlertSerializer, 
     PerformanceLogSerializer, SystemStatsSerializer
@@ -46,13 +50,36 @@ class SystemAlertViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Alerte acquittée'})
 
 class PerformanceLogViewSet(viewsets.ReadOnlyModelViewSet):
-    """ViewSet pour les logs de performance"""
+    """ViewSet pour les logs de performance (paginés par curseur sur timestamp, id)"""
     queryset = PerformanceLog.objects.all()
     serializer_class = PerformanceLogSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    pagination_class = TimestampKeysetPagination
+    filter_backends = [DjangoFilterBackend]
     filterset_fields = ['endpoint', 'method', 'status_code']
-    ordering = ['-timestamp']
+
+    @action(detail=False, methods=['get'])
+    def percentiles(self, request):
+        """Percentiles p50/p95/p99 du temps de réponse par endpoint"""
+        try:
+            hours = int(request.query_params.get('hours', 24))
+            min_count = int(request.query_params.get('min_count', 1))
+        except ValueError:
+            return Response(
+                {'error': 'Les paramètres hours et min_count doivent être des entiers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        endpoints = PerformanceStatsService.get_endpoint_percentiles(
+            hours=hours,
+            method=request.query_params.get('method'),
+            min_count=min_count
+        )
+        return Response({
+            'hours': hours,
+            'sample_rate': getattr(settings, 'PERFORMANCE_LOG_SAMPLE_RATE', 0.1),
+            'endpoints': endpoints
+        })
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
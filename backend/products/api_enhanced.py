@@ -24,7 +24,7 @@ def sales_menu(request):
         categorized_menu = MenuService.get_menu_by_category()
         
         # Statistiques rapides
-        total_items = MenuItem.objects.filter(is_available=True).count()
+        total_items = sum(len(items) for items in categorized_menu.values())
         available_items = sum(
             1 for items in categorized_menu.values() 
             for item in items 
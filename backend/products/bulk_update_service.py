@@ -0,0 +1,148 @@
+"""
+Service de mise à jour des produits en lot
+"""
+
+from collections import defaultdict
+from typing import Dict, List
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product
+
+
+class ProductBulkUpdateError(ValueError):
+    """Mise à jour en lot refusée (aucun produit n'est alors modifié)"""
+
+    def __init__(self, errors: Dict):
+        super().__init__("Mise à jour en lot invalide")
+        self.errors = errors
+
+
+class ProductBulkUpdateService:
+    """
+    Service pour modifier de nombreux produits en quelques requêtes
+
+    Les produits sont lus (et verrouillés) en une seule requête in_bulk. Les
+    changements sont regroupés par ensemble de champs modifiés, et chaque
+    groupe est écrit avec un seul bulk_update. Les signaux post_save ne sont
+    pas émis : les alertes de stock sont évaluées une seule fois sur les
+    produits concernés, après validation.
+
+    Le stock actuel n'est pas modifiable en lot : il passe par les
+    mouvements de stock (StockLedgerService).
+    """
+
+    ALLOWED_FIELDS = [
+        'description', 'unit', 'purchase_price', 'selling_price', 'case_price',
+        'minimum_stock', 'units_per_case', 'waste_percentage', 'is_active', 'is_available'
+    ]
+
+    # Champs dont la modification peut créer ou résoudre une alerte de stock
+    STOCK_LEVEL_FIELDS = {'minimum_stock'}
+
+    # Champs comptés par le tableau de bord (produits actifs, en stock faible)
+    DASHBOARD_FIELDS = {'minimum_stock', 'is_active'}
+
+    BATCH_SIZE = 500
+
+    @staticmethod
+    @transaction.atomic
+    def apply(changes: List[Dict]) -> Dict:
+        """
+        Applique les changements validés ({'id': ..., champ: valeur})
+
+        Raises:
+            ProductBulkUpdateError: produit introuvable ou prix de vente
+                inférieur ou égal au prix d'achat
+
+        Returns:
+            {'updated_count': int, 'unchanged_count': int,
+             'changes': [{'id', 'fields': {champ: [ancien, nouveau]}}]}
+        """
+        products = Product.objects.select_for_update().in_bulk(
+            sorted({change['id'] for change in changes})
+        )
+
+        missing = sorted({change['id'] for change in changes} - products.keys())
+        if missing:
+            raise ProductBulkUpdateError({'missing_ids': missing})
+
+        diffs = defaultdict(dict)
+        for change in changes:
+            product = products[change['id']]
+            for field, value in change.items():
+                if field == 'id':
+                    continue
+                old_value = getattr(product, field)
+                if old_value != value:
+                    # Ancienne valeur du lot conservée si le produit apparaît deux fois
+                    old_value = diffs[product.pk].get(field, [old_value])[0]
+                    diffs[product.pk][field] = [old_value, value]
+                    setattr(product, field, value)
+
+        # Produit apparu plusieurs fois et revenu à sa valeur initiale
+        for product_id in list(diffs):
+            diffs[product_id] = {
+                field: values for field, values in diffs[product_id].items() if values[0] != values[1]
+            }
+            if not diffs[product_id]:
+                del diffs[product_id]
+
+        invalid_prices = [
+            product_id for product_id, fields in diffs.items()
+            if {'purchase_price', 'selling_price'} & fields.keys()
+            and products[product_id].selling_price <= products[product_id].purchase_price
+        ]
+        if invalid_prices:
+            raise ProductBulkUpdateError({
+                'selling_price': "Le prix de vente doit être supérieur au prix d'achat.",
+                'ids': sorted(invalid_prices)
+            })
+
+        # Un bulk_update par ensemble de champs modifiés
+        now = timezone.now()
+        groups = defaultdict(list)
+        for product_id, fields in diffs.items():
+            product = products[product_id]
+            product.updated_at = now
+            groups[tuple(sorted(fields))].append(product)
+
+        for fields, group in groups.items():
+            Product.objects.bulk_update(
+                group, list(fields) + ['updated_at'], batch_size=ProductBulkUpdateService.BATCH_SIZE
+            )
+
+        if diffs:
+            ProductBulkUpdateService._after_commit(
+                [
+                    products[product_id] for product_id, fields in diffs.items()
+                    if ProductBulkUpdateService.STOCK_LEVEL_FIELDS & fields.keys()
+                ],
+                recompute_dashboard=any(
+                    ProductBulkUpdateService.DASHBOARD_FIELDS & fields.keys() for fields in diffs.values()
+                )
+            )
+
+        return {
+            'updated_count': len(diffs),
+            'unchanged_count': len(products) - len(diffs),
+            'changes': [
+                {'id': product_id, 'fields': fields}
+                for product_id, fields in sorted(diffs.items())
+            ]
+        }
+
+    @staticmethod
+    def _after_commit(stock_level_products, recompute_dashboard=False):
+        """Ce que les signaux post_save de Product auraient déclenché, une fois pour le lot"""
+        from inventory.services import StockLedgerService
+        from reports.dashboard import DashboardBroadcaster
+        from reports.report_jobs import ReportJobService
+
+        transaction.on_commit(ReportJobService.bump_data_version)
+        if stock_level_products:
+            transaction.on_commit(lambda: StockLedgerService.check_stock_levels(stock_level_products))
+        if recompute_dashboard:
+            # Les compteurs de produits ne se déduisent pas des écarts d'un lot
+            transaction.on_commit(lambda: DashboardBroadcaster.mark_dirty(recompute=True))
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .bulk_update_service import ProductBulkUpdateService
 from .models import Category, Product
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -122,25 +123,32 @@ class ProductStockUpdateSerializer(serializers.Serializer):
         return value
 
 
+class ProductBulkUpdateItemSerializer(serializers.ModelSerializer):
+    """
+    Changements d'un produit dans une mise à jour en lot
+    (seuls les champs de ProductBulkUpdateService.ALLOWED_FIELDS)
+    """
+
+    id = serializers.IntegerField()
+
+    class Meta:
+        model = Product
+        fields = ['id'] + ProductBulkUpdateService.ALLOWED_FIELDS
+        extra_kwargs = {field: {'required': False} for field in ProductBulkUpdateService.ALLOWED_FIELDS}
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            unknown = sorted(set(data) - set(self.fields))
+            if unknown:
+                raise serializers.ValidationError(
+                    f"Champs non modifiables en lot: {', '.join(unknown)}."
+                )
+        return super().to_internal_value(data)
+
+
 class ProductBulkUpdateSerializer(serializers.Serializer):
     """
     Serializer pour les mises à jour en lot
     """
-    
-    products = serializers.ListField(
-        child=serializers.DictField(),
-        min_length=1
-    )
-    
-    def validate_products(self, value):
-        for item in value:
-            if 'id' not in item:
-                raise serializers.ValidationError("L'ID du produit est requis.")
-            
-            # Vérifier que le produit existe
-            try:
-                Product.objects.get(id=item['id'])
-            except Product.DoesNotExist:
-                raise serializers.ValidationError(f"Produit avec ID {item['id']} introuvable.")
-        
-        return value
+
+    products = ProductBulkUpdateItemSerializer(many=True, allow_empty=False)
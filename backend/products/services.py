@@ -3,6 +3,8 @@ Services pour la logique automatique de gestion des stocks et recettes
 """
 
 from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.utils import timezone
 from .models_enhanced import MenuItem, Recipe, Ingredient, RecipeIngredient
@@ -107,19 +109,55 @@ class StockService:
 
 class MenuService:
     """Service pour la gestion du menu commercial"""
-    
+
+    CACHE_KEY = 'menu:availability_snapshot'
+
     @staticmethod
-    def get_available_menu():
-        """Retourne le menu avec les disponibilités en temps réel"""
+    def _availability_info(item):
+        """
+        Disponibilité d'un article calculée sur les données préchargées
+        (même format que StockService.get_availability_info)
+        """
+        info = {
+            'item_name': item.name,
+            'type': item.type,
+            'is_available': item.is_available,
+            'available_quantity': 0,
+            'limiting_factors': []
+        }
+
+        if item.type == 'simple':
+            info['available_quantity'] = int(item.direct_stock)
+            if item.direct_stock <= 0:
+                info['limiting_factors'].append('Stock épuisé')
+
+        elif item.recipe:
+            portions = []
+            for recipe_ingredient in item.recipe.recipe_ingredients.all():
+                ingredient = recipe_ingredient.ingredient
+                required = recipe_ingredient.quantity
+                available = ingredient.current_stock
+
+                if required > 0:
+                    portions.append(int(available / required))
+                if available < required:
+                    info['limiting_factors'].append(
+                        f"Manque {ingredient.name}: {available}/{required} {ingredient.unit}"
+                    )
+
+            info['available_quantity'] = min(portions) if portions else 0
+
+        return info
+
+    @staticmethod
+    def build_availability_snapshot():
+        """Calcule le menu et ses disponibilités en une passe sur les données préchargées"""
         menu_items = MenuItem.objects.filter(is_available=True).select_related(
             'category', 'recipe'
         ).prefetch_related('recipe__recipe_ingredients__ingredient')
-        
-        menu_data = []
-        for item in menu_items:
-            availability_info = StockService.get_availability_info(item.id)
-            
-            item_data = {
+
+        return [
+            {
                 'id': item.id,
                 'name': item.name,
                 'category': item.category.name,
@@ -127,14 +165,30 @@ class MenuService:
                 'description': item.description,
                 'type': item.type,
                 'is_featured': item.is_featured,
-                'availability': availability_info,
+                'availability': MenuService._availability_info(item),
                 'margin_percentage': item.margin_percentage,
             }
-            
-            menu_data.append(item_data)
-        
+            for item in menu_items
+        ]
+
+    @staticmethod
+    def get_available_menu():
+        """Retourne le menu avec les disponibilités en temps réel (lu depuis le cache)"""
+        menu_data = cache.get(MenuService.CACHE_KEY)
+        if menu_data is None:
+            menu_data = MenuService.build_availability_snapshot()
+            cache.set(
+                MenuService.CACHE_KEY,
+                menu_data,
+                getattr(settings, 'MENU_AVAILABILITY_CACHE_TIMEOUT', 300)
+            )
         return menu_data
-    
+
+    @staticmethod
+    def invalidate_menu_cache():
+        """Invalide le menu en cache après une modification de stock ou de recette"""
+        cache.delete(MenuService.CACHE_KEY)
+
     @staticmethod
     def get_menu_by_category():
         """Retourne le menu organisé par catégories"""
@@ -0,0 +1,23 @@
+"""
+Signaux d'invalidation du menu commercial en cache
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models_enhanced import Ingredient, MenuCategory, MenuItem, Recipe, RecipeIngredient
+from .services import MenuService
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=MenuCategory)
+def invalidate_menu_availability(sender, instance, **kwargs):
+    """Le stock ou la composition du menu a changé : invalider le menu en cache"""
+    MenuService.invalidate_menu_cache()
+    # Invalider aussi après validation, pour qu'une lecture concurrente
+    # pendant la transaction ne remette pas en cache l'ancien état
+    transaction.on_commit(MenuService.invalidate_menu_cache)
@@ -1,3 +1,141 @@
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .models_enhanced import Ingredient, IngredientCategory, MenuCategory, MenuItem, Recipe, RecipeIngredient
+from .services import MenuService, StockService
+
+
+class MenuAvailabilitySnapshotTests(TestCase):
+    """Tests du menu commercial en cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ingredient_category = IngredientCategory.objects.create(name='Protéines', type='proteins')
+        menu_category = MenuCategory.objects.create(name='Plats', type='main_courses')
+        cls.meat = Ingredient.objects.create(
+            name='Boeuf', category=ingredient_category, current_stock=Decimal('2.000'),
+            unit='kg', minimum_stock=Decimal('1.000'), cost_per_unit=Decimal('12000')
+        )
+        cls.onion = Ingredient.objects.create(
+            name='Oignon', category=ingredient_category, current_stock=Decimal('0.100'),
+            unit='kg', minimum_stock=Decimal('1.000'), cost_per_unit=Decimal('2000')
+        )
+        for index in range(5):
+            recipe = Recipe.objects.create(name=f"Brochette {index}", instructions='Griller', prep_time=10)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=cls.meat, quantity=Decimal('0.250'), unit='kg')
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=cls.onion, quantity=Decimal('0.050'), unit='kg')
+            MenuItem.objects.create(
+                name=f"Brochette {index}", category=menu_category, type='recipe',
+                selling_price=Decimal('8000'), recipe=recipe
+            )
+        MenuItem.objects.create(
+            name='Primus', category=menu_category, type='simple',
+            selling_price=Decimal('1500'), direct_stock=Decimal('0')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_snapshot_matches_per_item_availability(self):
+        menu = MenuService.build_availability_snapshot()
+
+        self.assertEqual(len(menu), 6)
+        for item in menu:
+            self.assertEqual(item['availability'], StockService.get_availability_info(item['id']))
+
+    def test_snapshot_query_count_is_constant(self):
+        with self.assertNumQueries(3):
+            MenuService.build_availability_snapshot()
+
+    def test_menu_is_served_from_cache(self):
+        MenuService.get_available_menu()
+
+        with self.assertNumQueries(0):
+            menu = MenuService.get_available_menu()
+        self.assertEqual(len(menu), 6)
+
+    def test_stock_change_invalidates_cache(self):
+        brochette = next(item for item in MenuService.get_available_menu() if item['type'] == 'recipe')
+        self.assertEqual(brochette['availability']['available_quantity'], 2)
+
+        self.onion.current_stock = Decimal('5.000')
+        self.onion.save()
+
+        brochette = next(item for item in MenuService.get_available_menu() if item['id'] == brochette['id'])
+        self.assertEqual(brochette['availability']['available_quantity'], 8)
+        self.assertEqual(brochette['availability']['limiting_factors'], [])
+
+
+class ProductBulkUpdateTests(TestCase):
+    """Tests de la mise à jour des produits en lot"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from accounts.models import User
+        from .models import Category, Product
+
+        cls.user = User.objects.create_user(username='admin', password='x', role='admin')
+        category = Category.objects.create(name='Bières', type='boissons')
+        cls.products = [
+            Product.objects.create(
+                name=f'Bière {index}', category=category, purchase_price=Decimal('1000'),
+                selling_price=Decimal('1500'), current_stock=10, minimum_stock=5
+            )
+            for index in range(30)
+        ]
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, products):
+        return self.client.post('/api/products/bulk-update/', {'products': products}, format='json')
+
+    def test_price_list_is_written_in_constant_queries(self):
+        from .bulk_update_service import ProductBulkUpdateService
+        from .models import Product
+
+        changes = [{'id': product.id, 'selling_price': Decimal('1800')} for product in self.products]
+        changes[0]['minimum_stock'] = 5
+
+        # Lecture verrouillée + un UPDATE par ensemble de champs
+        # (plus SAVEPOINT / RELEASE de l'atomic dans TestCase)
+        with self.assertNumQueries(4):
+            result = ProductBulkUpdateService.apply(changes)
+
+        self.assertEqual(result['updated_count'], 30)
+        self.assertEqual(result['changes'][0]['fields'], {'selling_price': [Decimal('1500.00'), Decimal('1800')]})
+        self.assertEqual(Product.objects.filter(selling_price=Decimal('1800')).count(), 30)
+
+    def test_stock_alerts_evaluated_once_after_commit(self):
+        from reports.models import StockAlert
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([
+                {'id': self.products[0].id, 'minimum_stock': 20},
+                {'id': self.products[1].id, 'selling_price': '2000'}
+            ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(
+            list(StockAlert.objects.values_list('product_id', 'alert_type')),
+            [(self.products[0].id, 'low_stock')]
+        )
+
+    def test_invalid_requests_change_nothing(self):
+        from .models import Product
+
+        response = self.post([{'id': self.products[0].id, 'current_stock': 0}])
+        self.assertEqual(response.status_code, 400)
+
+        response = self.post([{'id': self.products[0].id, 'selling_price': '900'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ids'], [self.products[0].id])
+
+        response = self.post([{'id': self.products[0].id, 'is_available': False}, {'id': 0, 'is_available': False}])
+        self.assertEqual(response.data['missing_ids'], [0])
+        self.assertTrue(Product.objects.get(pk=self.products[0].id).is_available)
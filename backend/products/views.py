@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.db import models
+from .bulk_update_service import ProductBulkUpdateError, ProductBulkUpdateService
 from .models import Category, Product
 from .serializers import (
     CategorySerializer, ProductSerializer, ProductListSerializer,
@@ -182,31 +183,18 @@ def bulk_update_products(request):
         )
 
     serializer = ProductBulkUpdateSerializer(data=request.data)
-    if serializer.is_valid():
-        products_data = serializer.validated_data['products']
-        updated_products = []
-
-        for product_data in products_data:
-            try:
-                product = Product.objects.get(id=product_data['id'])
-
-                # Mettre à jour les champs fournis
-                for field, value in product_data.items():
-                    if field != 'id' and hasattr(product, field):
-                        setattr(product, field, value)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-                product.save()
-                updated_products.append(ProductSerializer(product).data)
-
-            except Product.DoesNotExist:
-                continue
-
-        return Response({
-            'message': f'{len(updated_products)} produits mis à jour avec succès.',
-            'updated_products': updated_products
-        })
+    try:
+        result = ProductBulkUpdateService.apply(serializer.validated_data['products'])
+    except ProductBulkUpdateError as e:
+        return Response(e.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'message': f"{result['updated_count']} produits mis à jour avec succès.",
+        **result
+    })
 
 
 @api_view(['GET'])
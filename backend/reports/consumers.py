@@ -5,6 +5,8 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+from .notifications import role_group_name
+
 User = get_user_model()
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -20,6 +22,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
+        # Rejoindre le groupe du rôle (diffusions par rôle)
+        role = await self.get_user_role()
+        self.role_group_name = role_group_name(role) if role else None
+        if self.role_group_name:
+            await self.channel_layer.group_add(
+                self.role_group_name,
+                self.channel_name
+            )
+        
         await self.accept()
         
         # Envoyer un message de bienvenue
@@ -30,11 +41,26 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         }))
     
     async def disconnect(self, close_code):
-        # Quitter le groupe
+        # Quitter les groupes
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
+        if getattr(self, 'role_group_name', None):
+            await self.channel_layer.group_discard(
+                self.role_group_name,
+                self.channel_name
+            )
+    
+    @database_sync_to_async
+    def get_user_role(self):
+        """Rôle de l'utilisateur de la connexion"""
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated and str(user.pk) == self.user_id:
+            return user.role
+        if not self.user_id.isdigit():
+            return None
+        return User.objects.filter(pk=self.user_id).values_list('role', flat=True).first()
     
     async def receive(self, text_data):
         """Recevoir des messages du client"""
@@ -62,6 +88,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'timestamp': timezone.now().isoformat()
         }))
     
+    async def stock_alerts_changed(self, event):
+        """Envoyer les alertes de stock ouvertes et résolues"""
+        await self.send(text_data=json.dumps({
+            'type': 'stock_alerts_changed',
+            'opened': event['opened'],
+            'resolved': event['resolved'],
+            'timestamp': event['timestamp']
+        }))
+
     async def sale_notification(self, event):
         """Envoyer une notification de vente"""
         await self.send(text_data=json.dumps({
@@ -154,6 +189,15 @@ class AlertConsumer(AsyncWebsocketConsumer):
             'timestamp': timezone.now().isoformat()
         }))
     
+    async def stock_alerts_changed(self, event):
+        """Alertes de stock ouvertes et résolues en un seul rapprochement"""
+        await self.send(text_data=json.dumps({
+            'type': 'stock_alerts_changed',
+            'opened': event['opened'],
+            'resolved': event['resolved'],
+            'timestamp': event['timestamp']
+        }))
+
     async def alert_resolved(self, event):
         """Alerte résolue"""
         await self.send(text_data=json.dumps({
@@ -187,35 +231,9 @@ class DashboardConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def get_dashboard_stats(self):
         """Récupérer les statistiques du tableau de bord"""
-        from .models import DailyReport
-        from sales.models import Sale
-        from products.models import Product
-        
-        today = timezone.now().date()
-        
-        # Statistiques du jour
-        today_sales = Sale.objects.filter(created_at__date=today).count()
-        today_revenue = Sale.objects.filter(
-            created_at__date=today, 
-            status='completed'
-        ).aggregate(
-            total=models.Sum('total_amount')
-        )['total'] or 0
-        
-        # Alertes
-        active_alerts = StockAlert.objects.filter(status='active').count()
-        low_stock_products = Product.objects.filter(
-            current_stock__lte=models.F('minimum_stock'),
-            is_active=True
-        ).count()
+        from .dashboard import DashboardBroadcaster
         
-        return {
-            'today_sales': today_sales,
-            'today_revenue': float(today_revenue),
-            'active_alerts': active_alerts,
-            'low_stock_products': low_stock_products,
-            'total_products': Product.objects.filter(is_active=True).count()
-        }
+        return DashboardBroadcaster.compute_stats()
     
     async def send_dashboard_stats(self):
         """Envoyer les statistiques du tableau de bord"""
@@ -0,0 +1,273 @@
+"""
+Diffusion groupée des statistiques du tableau de bord
+"""
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardBroadcaster:
+    """
+    Regroupe les mises à jour du tableau de bord
+
+    Les événements (vente créée, payée ou annulée, mouvement de stock,
+    alertes ouvertes ou résolues) ne recalculent rien :
+    ils ajoutent leurs écarts (deltas) à un tampon et marquent le tableau de
+    bord comme modifié. Au plus une diffusion vers 'dashboard_updates' a lieu
+    par fenêtre de DASHBOARD_BROADCAST_WINDOW secondes : les deltas sont
+    appliqués au dernier instantané en cache, sans requête ; un recalcul
+    complet n'a lieu que si l'instantané est absent, périmé (autre jour) ou
+    demandé explicitement (tâche périodique update_dashboard_stats_periodic,
+    modifications de produits en lot).
+
+    Le tampon est propre au processus ; l'instantané est partagé via le cache
+    (un compteur par statistique et par jour, modifié par cache.incr : deux
+    processus qui diffusent en même temps ne s'écrasent pas) et le
+    group_send passe par le channel layer configuré (mémoire ou Redis).
+    """
+
+    GROUP_NAME = 'dashboard_updates'
+    COUNTER_KEY = 'dashboard:stats:{date}:{name}'
+    COUNTERS = ['today_sales', 'today_revenue', 'active_alerts', 'low_stock_products', 'total_products']
+    # cache.incr n'accepte que des entiers : chiffre d'affaires en centimes
+    CENTS_COUNTERS = {'today_revenue'}
+    # Les compteurs d'un jour passé ne sont plus lus
+    SNAPSHOT_TIMEOUT = 2 * 86400
+
+    _lock = threading.Lock()
+    _pending = {}
+    _recompute = False
+    _timer = None
+
+    # ===== CALCUL =====
+
+    @staticmethod
+    def compute_stats() -> Dict:
+        """Statistiques complètes du tableau de bord (3 requêtes)"""
+        from django.db.models import Count, F, Q
+        from .models import StockAlert
+        from products.models import Product
+        from sales.stats_service import SalesStatsService
+
+        today = timezone.localdate()
+
+        # Statistiques du jour (une seule requête)
+        sales_stats = SalesStatsService.get_stats(today)
+
+        # Alertes et stock
+        active_alerts = StockAlert.objects.filter(status='active').count()
+        products = Product.objects.filter(is_active=True).aggregate(
+            total=Count('id'),
+            low_stock=Count('id', filter=Q(current_stock__lte=F('minimum_stock')))
+        )
+
+        return {
+            'today_sales': sales_stats['total_sales'],
+            'today_revenue': float(sales_stats['net_revenue']),
+            'active_alerts': active_alerts,
+            'low_stock_products': products['low_stock'],
+            'total_products': products['total']
+        }
+
+    # ===== INSTANTANÉ =====
+
+    @staticmethod
+    def counter_key(date: str, name: str) -> str:
+        return DashboardBroadcaster.COUNTER_KEY.format(date=date, name=name)
+
+    @staticmethod
+    def to_counter(name: str, value) -> int:
+        if name in DashboardBroadcaster.CENTS_COUNTERS:
+            return round(value * 100)
+        return int(value)
+
+    @staticmethod
+    def from_counter(name: str, value: int):
+        if name in DashboardBroadcaster.CENTS_COUNTERS:
+            return value / 100
+        return value
+
+    @staticmethod
+    def refresh_snapshot() -> Dict:
+        """Recalcule et met en cache l'instantané"""
+        cls = DashboardBroadcaster
+        stats = cls.compute_stats()
+        date = timezone.localdate().isoformat()
+        cache.set_many(
+            {cls.counter_key(date, name): cls.to_counter(name, stats[name]) for name in cls.COUNTERS},
+            cls.SNAPSHOT_TIMEOUT
+        )
+        return stats
+
+    @staticmethod
+    def read_snapshot(date: str) -> Optional[Dict]:
+        """Instantané du jour, None s'il manque un compteur"""
+        cls = DashboardBroadcaster
+        names = {cls.counter_key(date, name): name for name in cls.COUNTERS}
+        values = cache.get_many(list(names))
+        if len(values) != len(names):
+            return None
+        return {names[key]: cls.from_counter(names[key], value) for key, value in values.items()}
+
+    @staticmethod
+    def apply_deltas(date: str, deltas: Dict) -> bool:
+        """
+        Ajoute les écarts aux compteurs du jour (un cache.incr atomique chacun)
+
+        Returns:
+            False si un compteur manque : l'instantané doit être recalculé
+        """
+        cls = DashboardBroadcaster
+        for name, value in deltas.items():
+            delta = cls.to_counter(name, value)
+            if not delta:
+                continue
+            try:
+                cache.incr(cls.counter_key(date, name), delta)
+            except ValueError:
+                return False
+        return True
+
+    # ===== ÉVÉNEMENTS =====
+
+    @staticmethod
+    def mark_dirty(deltas: Dict = None, recompute: bool = False):
+        """
+        Signale une modification du tableau de bord
+
+        Args:
+            deltas: Écarts à appliquer à l'instantané ({compteur: écart})
+            recompute: Forcer un recalcul complet à la prochaine diffusion
+        """
+        cls = DashboardBroadcaster
+        with cls._lock:
+            for name, value in (deltas or {}).items():
+                cls._pending[name] = cls._pending.get(name, 0) + value
+            cls._recompute = cls._recompute or recompute
+
+            if cls._timer is None:
+                cls._timer = cls._start_timer(
+                    getattr(settings, 'DASHBOARD_BROADCAST_WINDOW', 1.0),
+                    cls._flush_in_thread
+                )
+
+    @staticmethod
+    def sale_created(sale):
+        """Écart d'une nouvelle vente (le chiffre d'affaires suit le paiement, sale_paid)"""
+        DashboardBroadcaster.mark_dirty({'today_sales': 1})
+
+    @staticmethod
+    def is_today(sale) -> bool:
+        """Le chiffre d'affaires du jour porte sur les ventes créées aujourd'hui"""
+        return timezone.localtime(sale.created_at).date() == timezone.localdate()
+
+    @staticmethod
+    def sale_paid(sale):
+        """Écart d'un paiement"""
+        if DashboardBroadcaster.is_today(sale):
+            DashboardBroadcaster.mark_dirty({'today_revenue': float(sale.final_amount)})
+
+    @staticmethod
+    def sale_cancelled(sale, was_paid: bool):
+        """Écart d'une annulation (seule une vente payée comptait dans le chiffre)"""
+        if was_paid and DashboardBroadcaster.is_today(sale):
+            DashboardBroadcaster.mark_dirty({'today_revenue': -float(sale.final_amount)})
+
+    @staticmethod
+    def stock_alerts_changed(opened_count: int, resolved_count: int):
+        """Écart des alertes actives après un rapprochement"""
+        if opened_count != resolved_count:
+            DashboardBroadcaster.mark_dirty({'active_alerts': opened_count - resolved_count})
+
+    @staticmethod
+    def stock_movement_created(movement):
+        """Écarts d'un mouvement de stock (franchissement du seuil minimum)"""
+        DashboardBroadcaster.stock_movements_created([movement])
+
+    @staticmethod
+    def stock_movements_created(movements):
+        """Écarts d'un lot de mouvements de stock, signalés en une fois"""
+        low_stock_delta = 0
+        for movement in movements:
+            product = movement.product
+            if not product.is_active:
+                continue
+
+            was_low = movement.stock_before <= product.minimum_stock
+            is_low = movement.stock_after <= product.minimum_stock
+            if was_low != is_low:
+                low_stock_delta += 1 if is_low else -1
+
+        if low_stock_delta:
+            DashboardBroadcaster.mark_dirty({'low_stock_products': low_stock_delta})
+
+    # ===== DIFFUSION =====
+
+    @staticmethod
+    def _start_timer(delay, function):
+        """Lance la diffusion différée dans un thread (remplacé dans les tests)"""
+        timer = threading.Timer(delay, function)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    @staticmethod
+    def reset():
+        """Abandonne les écarts en attente et la diffusion programmée"""
+        cls = DashboardBroadcaster
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+            cls._pending, cls._recompute, cls._timer = {}, False, None
+
+    @staticmethod
+    def _flush_in_thread():
+        try:
+            DashboardBroadcaster.flush()
+        except Exception as e:
+            logger.warning(f"Erreur lors de la mise à jour des statistiques: {str(e)}")
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def flush(recompute: bool = False) -> Dict:
+        """
+        Applique les écarts en attente et diffuse une seule mise à jour
+
+        Args:
+            recompute: Recalculer l'instantané au lieu d'appliquer les écarts
+        """
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        cls = DashboardBroadcaster
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+            deltas, recompute = cls._pending, recompute or cls._recompute
+            cls._pending, cls._recompute, cls._timer = {}, False, None
+
+        # Les compteurs sont datés : ceux d'hier ne sont jamais modifiés
+        date = timezone.localdate().isoformat()
+        stats = None
+        if not recompute and cls.apply_deltas(date, deltas):
+            stats = cls.read_snapshot(date)
+        if stats is None:
+            stats = cls.refresh_snapshot()
+
+        async_to_sync(get_channel_layer().group_send)(
+            cls.GROUP_NAME,
+            {
+                'type': 'stats_update',
+                'stats': stats
+            }
+        )
+        return stats
@@ -0,0 +1,49 @@
+"""
+Commande Django pour générer les rapports demandés (sans Celery)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.report_jobs import ReportJobService
+
+
+class Command(BaseCommand):
+    help = 'Génère les rapports en attente (ReportJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Tourner en continu (quand Redis/Celery ne sont pas disponibles)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Pause en secondes entre deux passes quand la file est vide',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Nombre maximum de rapports par passe',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            summary = ReportJobService.process_pending(batch_size=options['batch_size'])
+            if any(summary.values()):
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"📄 Rapports générés: {summary['done']}, en échec: {summary['failed']}"
+                    )
+                )
+
+            if not options['loop']:
+                break
+
+            # Repasser immédiatement si le lot était plein
+            if sum(summary.values()) < options['batch_size']:
+                time.sleep(options['interval'])
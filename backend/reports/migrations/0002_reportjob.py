@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(choices=[('daily', 'Rapport quotidien'), ('stock', 'Rapport de stock'), ('sales', 'Rapport de ventes')], max_length=20, verbose_name='Type de rapport')),
+                ('format', models.CharField(choices=[('pdf', 'PDF'), ('xlsx', 'Excel')], max_length=10, verbose_name='Format')),
+                ('start_date', models.DateField(verbose_name='Date de début')),
+                ('end_date', models.DateField(verbose_name='Date de fin')),
+                ('artifact_key', models.CharField(max_length=64, verbose_name='Clé du fichier')),
+                ('is_closed', models.BooleanField(default=False, help_text="Le fichier d'une période close ne change plus", verbose_name='Période close')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=20, verbose_name='Statut')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de fin de génération')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Génération de rapport',
+                'verbose_name_plural': 'Générations de rapports',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['artifact_key', 'status'], name='report_job_key_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date de réservation par le worker'),
+        ),
+    ]
@@ -95,44 +95,33 @@ class DailyReport(models.Model):
 
     def generate_report_data(self):
         """Générer automatiquement les données du rapport"""
-        from sales.models import Sale
-        from django.db.models import Sum, Count
-
-        # Ventes du jour
-        daily_sales = Sale.objects.filter(created_at__date=self.date)
-
-        # Calculs
-        self.total_sales = daily_sales.count()
+        from sales.rollup_service import SalesRollupService
+        from expenses.models import Expense
+        from products.models import Product
+        from django.db.models import Sum, Count, Q
 
-        paid_sales = daily_sales.filter(status='paid')
-        self.total_revenue = paid_sales.aggregate(total=Sum('final_amount'))['total'] or 0
-        self.total_discount = daily_sales.aggregate(total=Sum('discount_amount'))['total'] or 0
+        # Ventes payées du jour (agrégats matérialisés)
+        paid_totals = SalesRollupService.get_totals(self.date)
 
-        # Ventes par méthode de paiement
-        self.cash_sales = paid_sales.filter(payment_method='cash').count()
-        self.mobile_sales = paid_sales.filter(payment_method='mobile').count()
-        self.pending_sales = daily_sales.filter(status='pending').count()
+        self.total_sales = paid_totals['net_revenue']
+        self.total_profit = max(paid_totals['profit'], Decimal('0.00'))
+        self.number_of_sales = paid_totals['paid_sales']
 
-        # Produits vendus
-        from sales.models import SaleItem
-        self.products_sold = SaleItem.objects.filter(
-            sale__in=paid_sales
-        ).aggregate(total=Sum('quantity'))['total'] or 0
+        # Dépenses du jour
+        self.total_expenses = Expense.objects.filter(
+            expense_date__date=self.date
+        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
 
         # Alertes de stock
-        from products.models import Product
-        from django.db import models
-
-        self.low_stock_alerts = Product.objects.filter(
-            current_stock__lte=models.F('minimum_stock'),
-            current_stock__gt=0,
-            is_active=True
-        ).count()
-
-        self.out_of_stock_alerts = Product.objects.filter(
-            current_stock=0,
-            is_active=True
-        ).count()
+        stock_counts = Product.objects.filter(is_active=True).aggregate(
+            low_stock=Count('id', filter=Q(
+                current_stock__lte=models.F('minimum_stock'),
+                current_stock__gt=0
+            )),
+            out_of_stock=Count('id', filter=Q(current_stock=0))
+        )
+        self.stock_alerts_count = stock_counts['low_stock']
+        self.out_of_stock_count = stock_counts['out_of_stock']
 
         self.save()
 
@@ -217,3 +206,111 @@ class StockAlert(models.Model):
 
     def __str__(self):
         return f"{self.product.name} - {self.get_alert_type_display()}"
+
+
+class ReportJob(models.Model):
+    """
+    Demande de génération d'un rapport (PDF ou Excel) en arrière-plan
+
+    Le fichier produit est stocké sous une clé dérivée des paramètres du
+    rapport et, pour une période non close, de la version des données
+    (voir reports.report_jobs) : une même demande n'est générée qu'une fois.
+    """
+
+    REPORT_TYPES = [
+        ('daily', 'Rapport quotidien'),
+        ('stock', 'Rapport de stock'),
+        ('sales', 'Rapport de ventes'),
+    ]
+
+    FORMATS = [
+        ('pdf', 'PDF'),
+        ('xlsx', 'Excel'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+    ]
+
+    report_type = models.CharField(
+        max_length=20,
+        choices=REPORT_TYPES,
+        verbose_name='Type de rapport'
+    )
+
+    format = models.CharField(
+        max_length=10,
+        choices=FORMATS,
+        verbose_name='Format'
+    )
+
+    start_date = models.DateField(
+        verbose_name='Date de début'
+    )
+
+    end_date = models.DateField(
+        verbose_name='Date de fin'
+    )
+
+    artifact_key = models.CharField(
+        max_length=64,
+        verbose_name='Clé du fichier'
+    )
+
+    is_closed = models.BooleanField(
+        default=False,
+        verbose_name='Période close',
+        help_text='Le fichier d\'une période close ne change plus'
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Statut'
+    )
+
+    error = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name='Erreur'
+    )
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name='Demandé par'
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+
+    started_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Date de réservation par le worker'
+    )
+
+    completed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Date de fin de génération'
+    )
+
+    class Meta:
+        verbose_name = 'Génération de rapport'
+        verbose_name_plural = 'Générations de rapports'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['artifact_key', 'status'], name='report_job_key_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} {self.start_date} - {self.end_date} ({self.get_format_display()})"
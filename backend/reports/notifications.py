@@ -1,14 +1,38 @@
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.utils import timezone
-from django.db.models import F
 import json
 
 channel_layer = get_channel_layer()
 
+
+def role_group_name(role):
+    """Groupe WebSocket commun à tous les utilisateurs d'un rôle"""
+    return f'role_{role}'
+
+
 class NotificationService:
     """Service pour envoyer des notifications en temps réel"""
     
+    @staticmethod
+    def send_to_roles(roles, event):
+        """
+        Diffuser un événement aux utilisateurs des rôles donnés
+        
+        Un seul group_send par rôle : le coût ne dépend pas du nombre
+        d'utilisateurs, chaque NotificationConsumer ayant rejoint le groupe
+        de son rôle à la connexion.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        for role in dict.fromkeys(roles):
+            try:
+                async_to_sync(channel_layer.group_send)(role_group_name(role), event)
+            except Exception as e:
+                # Log l'erreur mais continuer pour les autres rôles
+                logger.warning(f"Erreur lors de l'envoi de notification au rôle {role}: {str(e)}")
+    
     @staticmethod
     def send_stock_alert(product, alert_type='low_stock'):
         """Envoyer une alerte de stock"""
@@ -38,26 +62,38 @@ class NotificationService:
             logger.warning(f"Erreur lors de l'envoi de notification système: {str(e)}")
             print(f"Erreur lors de l'envoi de notification système: {str(e)}")
         
-        # Envoyer aux admins et gérants
-        from accounts.models import User
-        admin_users = User.objects.filter(role__in=['admin', 'gerant'])
-        
-        for user in admin_users:
-            try:
-                async_to_sync(channel_layer.group_send)(
-                    f'notifications_{user.id}',
-                    {
-                        'type': 'stock_alert',
-                        'alert': alert_data
-                    }
-                )
-            except Exception as e:
-                # Log l'erreur mais continuer pour les autres utilisateurs
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Erreur lors de l'envoi de notification à l'utilisateur {user.id}: {str(e)}")
-                continue
+        # Envoyer aux admins et gérants (un envoi par rôle)
+        NotificationService.send_to_roles(['admin', 'gerant'], {
+            'type': 'stock_alert',
+            'alert': alert_data
+        })
     
+    @staticmethod
+    def send_stock_alerts_changed(opened, resolved):
+        """
+        Diffuser en un seul événement les alertes de stock ouvertes et résolues
+
+        Args:
+            opened: Données des nouvelles alertes (voir StockAlertService.reconcile)
+            resolved: Identifiants des alertes résolues
+        """
+        event = {
+            'type': 'stock_alerts_changed',
+            'opened': opened,
+            'resolved': resolved,
+            'timestamp': timezone.now().isoformat()
+        }
+
+        try:
+            async_to_sync(channel_layer.group_send)('global_alerts', event)
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Erreur lors de l'envoi des alertes de stock: {str(e)}")
+
+        if opened:
+            NotificationService.send_to_roles(['admin', 'gerant'], event)
+
     @staticmethod
     def send_sale_notification(sale):
         """Envoyer une notification de nouvelle vente"""
@@ -86,17 +122,10 @@ class NotificationService:
             )
             
             # Notifier les gérants et admins
-            from accounts.models import User
-            managers = User.objects.filter(role__in=['admin', 'gerant'])
-            
-            for user in managers:
-                async_to_sync(channel_layer.group_send)(
-                    f'notifications_{user.id}',
-                    {
-                        'type': 'sale_notification',
-                        'sale': sale_data
-                    }
-                )
+            NotificationService.send_to_roles(['admin', 'gerant'], {
+                'type': 'sale_notification',
+                'sale': sale_data
+            })
         except Exception as e:
             # Log l'erreur mais ne pas faire échouer la création de vente
             import logging
@@ -116,24 +145,11 @@ class NotificationService:
             if target_roles is None:
                 target_roles = ['admin', 'gerant', 'serveur']
             
-            from accounts.models import User
-            target_users = User.objects.filter(role__in=target_roles)
-            
-            notification_data = {
+            NotificationService.send_to_roles(target_roles, {
+                'type': 'system_notification',
                 'message': message,
-                'level': level,
-                'timestamp': timezone.now().isoformat()
-            }
-            
-            for user in target_users:
-                async_to_sync(channel_layer.group_send)(
-                    f'notifications_{user.id}',
-                    {
-                        'type': 'system_notification',
-                        'message': message,
-                        'level': level
-                    }
-                )
+                'level': level
+            })
         except Exception as e:
             # Log l'erreur mais ne pas faire échouer l'opération
             import logging
@@ -142,49 +158,11 @@ class NotificationService:
     
     @staticmethod
     def update_dashboard_stats():
-        """Mettre à jour les statistiques du tableau de bord"""
+        """Recalculer et diffuser immédiatement les statistiques du tableau de bord"""
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            
-            channel_layer = get_channel_layer()
-            
-            from .models import DailyReport
-            from sales.models import Sale
-            from products.models import Product
-            from django.db.models import Sum
-            
-            today = timezone.now().date()
-            
-            # Calculer les statistiques
-            today_sales = Sale.objects.filter(created_at__date=today).count()
-            today_revenue = Sale.objects.filter(
-                created_at__date=today, 
-                status='completed'
-            ).aggregate(total=Sum('total_amount'))['total'] or 0
-            
-            active_alerts = StockAlert.objects.filter(status='active').count()
-            low_stock_products = Product.objects.filter(
-                current_stock__lte=F('minimum_stock'),
-                is_active=True
-            ).count()
-            
-            stats = {
-                'today_sales': today_sales,
-                'today_revenue': float(today_revenue),
-                'active_alerts': active_alerts,
-                'low_stock_products': low_stock_products,
-                'total_products': Product.objects.filter(is_active=True).count()
-            }
+            from .dashboard import DashboardBroadcaster
             
-            # Envoyer les mises à jour
-            async_to_sync(channel_layer.group_send)(
-                'dashboard_updates',
-                {
-                    'type': 'stats_update',
-                    'stats': stats
-                }
-            )
+            DashboardBroadcaster.flush(recompute=True)
         except Exception as e:
             # Log l'erreur mais ne pas faire échouer l'opération
             import logging
@@ -193,57 +171,7 @@ class NotificationService:
     
     @staticmethod
     def check_and_send_stock_alerts():
-        """Vérifier et envoyer les alertes de stock automatiquement"""
-        from products.models import Product
-        from .models import StockAlert
-        
-        # Produits avec stock faible
-        low_stock_products = Product.objects.filter(
-            current_stock__lte=F('minimum_stock'),
-            current_stock__gt=0,
-            is_active=True
-        )
-        
-        for product in low_stock_products:
-            # Vérifier si une alerte existe déjà
-            existing_alert = StockAlert.objects.filter(
-                product=product,
-                alert_type='low_stock',
-                status='active'
-            ).first()
-            
-            if not existing_alert:
-                # Créer une nouvelle alerte
-                alert = StockAlert.objects.create(
-                    product=product,
-                    alert_type='low_stock',
-                    message=f"Stock faible pour {product.name}: {product.current_stock} unités restantes"
-                )
-                
-                # Envoyer la notification
-                NotificationService.send_stock_alert(product, 'low_stock')
-        
-        # Produits en rupture de stock
-        out_of_stock_products = Product.objects.filter(
-            current_stock=0,
-            is_active=True
-        )
-        
-        for product in out_of_stock_products:
-            existing_alert = StockAlert.objects.filter(
-                product=product,
-                alert_type='out_of_stock',
-                status='active'
-            ).first()
-            
-            if not existing_alert:
-                alert = StockAlert.objects.create(
-                    product=product,
-                    alert_type='out_of_stock',
-                    message=f"Rupture de stock pour {product.name}"
-                )
-                
-                NotificationService.send_stock_alert(product, 'out_of_stock')
+        """Vérifier et envoyer les alertes de stock automatiquement (tout le catalogue)"""
+        from .stock_alerts import StockAlertService
 
-# Import nécessaire pour éviter les erreurs circulaires
-from .models import StockAlert
+        return StockAlertService.reconcile()
@@ -57,12 +57,16 @@ class PDFReportGenerator:
         # Résumé des ventes
         elements.append(Paragraph("Résumé des Ventes", self.heading_style))
         
+        average_sale = (
+            daily_report.total_sales / daily_report.number_of_sales
+            if daily_report.number_of_sales else Decimal('0')
+        )
         sales_data_table = [
             ['Indicateur', 'Valeur'],
-            ['Nombre de ventes', str(daily_report.total_sales_count)],
+            ['Nombre de ventes', str(daily_report.number_of_sales)],
             ['Chiffre d\'affaires', f"{daily_report.total_sales:,.0f} BIF"],
             ['Bénéfice brut', f"{daily_report.total_profit:,.0f} BIF"],
-            ['Ticket moyen', f"{daily_report.average_sale:,.0f} BIF"],
+            ['Ticket moyen', f"{average_sale:,.0f} BIF"],
         ]
         
         sales_table = Table(sales_data_table, colWidths=[3*inch, 2*inch])
@@ -0,0 +1,347 @@
+"""
+Génération des rapports en arrière-plan avec cache des fichiers produits
+"""
+
+import hashlib
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from time import time_ns
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+
+class ReportJobService:
+    """
+    Service des rapports générés en arrière-plan
+
+    Un rapport est identifié par (type, format, période). Le fichier est
+    stocké sous une clé calculée à partir de ces paramètres et, tant que la
+    période n'est pas close (elle inclut aujourd'hui), de la version des
+    données, incrémentée à chaque vente, mouvement de stock, produit ou
+    rapport quotidien modifié. Un jour clos ne change plus : son fichier est
+    généré une seule fois puis toujours servi depuis le stockage.
+
+    La version des données n'existe que dans le cache : une version absente
+    (cache vidé, évincé, ou propre au processus) est initialisée avec
+    l'horloge en nanosecondes, jamais avec une valeur déjà servie.
+
+    Une demande renvoie soit le fichier déjà généré, soit la génération en
+    cours pour la même clé, soit une nouvelle génération en attente. Comme
+    pour alerts.outbox, les demandes sont lues en base par le worker (tâche
+    Celery périodique ou commande process_report_jobs).
+    """
+
+    DATA_VERSION_KEY = 'reports:data_version'
+    ARTIFACT_DIRECTORY = 'reports/artifacts'
+    ACTIVE_STATUSES = ['pending', 'running']
+
+    CONTENT_TYPES = {
+        'pdf': 'application/pdf',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    }
+
+    SUPPORTED = {
+        ('daily', 'pdf'), ('daily', 'xlsx'),
+        ('stock', 'pdf'), ('stock', 'xlsx'),
+        ('sales', 'xlsx'),
+    }
+
+    # ===== VERSION DES DONNÉES =====
+
+    @staticmethod
+    def get_data_version() -> int:
+        return cache.get_or_set(ReportJobService.DATA_VERSION_KEY, time_ns, None)
+
+    @staticmethod
+    def bump_data_version():
+        """Les rapports des périodes non closes doivent être régénérés"""
+        try:
+            cache.incr(ReportJobService.DATA_VERSION_KEY)
+        except ValueError:
+            cache.add(ReportJobService.DATA_VERSION_KEY, time_ns(), None)
+
+    # ===== CLÉS =====
+
+    @staticmethod
+    def normalize_period(report_type: str, start_date: Optional[date] = None,
+                         end_date: Optional[date] = None) -> Tuple[date, date]:
+        """
+        Période effective d'un rapport
+
+        Le rapport de stock est un instantané du jour ; le rapport quotidien
+        porte sur une seule date ; le rapport de ventes couvre par défaut
+        les 30 derniers jours.
+        """
+        today = timezone.localdate()
+        if report_type == 'stock':
+            return today, today
+        if report_type == 'daily':
+            day = start_date or end_date or today
+            return day, day
+
+        end_date = end_date or today
+        return start_date or end_date - timedelta(days=30), end_date
+
+    @staticmethod
+    def is_closed(report_type: str, end_date: date) -> bool:
+        """Une période est close quand elle se termine avant aujourd'hui"""
+        return report_type != 'stock' and end_date < timezone.localdate()
+
+    @staticmethod
+    def artifact_key(report_type: str, report_format: str, start_date: date, end_date: date) -> str:
+        """
+        Clé du fichier : empreinte des paramètres et, si la période est
+        ouverte, de la version des données. Le rapport quotidien dépend aussi
+        de la date de modification du DailyReport, qui peut être régénéré
+        après la clôture du jour.
+        """
+        from .models import DailyReport
+
+        inputs = [report_type, report_format, start_date.isoformat(), end_date.isoformat()]
+        if not ReportJobService.is_closed(report_type, end_date):
+            inputs.append(ReportJobService.get_data_version())
+        if report_type == 'daily':
+            updated_at = DailyReport.objects.filter(date=start_date).values_list('updated_at', flat=True).first()
+            inputs.append(updated_at.isoformat() if updated_at else None)
+        return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+    @staticmethod
+    def artifact_name(artifact_key: str, report_format: str) -> str:
+        return f"{ReportJobService.ARTIFACT_DIRECTORY}/{artifact_key}.{report_format}"
+
+    @staticmethod
+    def download_filename(job) -> str:
+        if job.report_type == 'sales':
+            return f"rapport_ventes_{job.start_date.isoformat()}_{job.end_date.isoformat()}.{job.format}"
+        prefix = 'rapport_quotidien' if job.report_type == 'daily' else 'rapport_stock'
+        return f"{prefix}_{job.start_date.isoformat()}.{job.format}"
+
+    # ===== DEMANDES =====
+
+    @staticmethod
+    def request_report(report_type: str, report_format: str, start_date: Optional[date] = None,
+                       end_date: Optional[date] = None, user=None) -> ReportJob:
+        """
+        Demande un rapport
+
+        Returns:
+            ReportJob terminé si le fichier existe déjà, la génération en
+            cours pour la même clé, ou une nouvelle génération en attente
+            du worker (process_pending)
+        """
+        if (report_type, report_format) not in ReportJobService.SUPPORTED:
+            raise ValueError(f"Format {report_format} non disponible pour le rapport {report_type}")
+
+        start_date, end_date = ReportJobService.normalize_period(report_type, start_date, end_date)
+        if start_date > end_date:
+            raise ValueError("La date de début doit précéder la date de fin")
+
+        key = ReportJobService.artifact_key(report_type, report_format, start_date, end_date)
+        job_fields = {
+            'report_type': report_type,
+            'format': report_format,
+            'start_date': start_date,
+            'end_date': end_date,
+            'artifact_key': key,
+            'is_closed': ReportJobService.is_closed(report_type, end_date),
+            'requested_by': user if user is not None and user.is_authenticated else None,
+        }
+
+        with transaction.atomic():
+            existing = ReportJob.objects.filter(
+                artifact_key=key,
+                status__in=ReportJobService.ACTIVE_STATUSES + ['done']
+            ).order_by('-created_at').first()
+
+            if existing is not None and existing.status != 'done':
+                # Une demande en attente ou en cours est partagée, quelle que
+                # soit la file d'attente ; une génération abandonnée (worker
+                # arrêté) est remise en attente plutôt que dupliquée
+                if ReportJobService.is_abandoned(existing):
+                    ReportJob.objects.filter(pk=existing.pk, status='running').update(
+                        status='pending', started_at=None
+                    )
+                    existing.status, existing.started_at = 'pending', None
+                return existing
+
+            if default_storage.exists(ReportJobService.artifact_name(key, report_format)):
+                if existing is not None:
+                    return existing
+                return ReportJob.objects.create(status='done', completed_at=timezone.now(), **job_fields)
+
+            return ReportJob.objects.create(**job_fields)
+
+    # ===== GÉNÉRATION =====
+
+    @staticmethod
+    def abandoned_before():
+        """Une génération réservée avant cette date est considérée comme abandonnée"""
+        return timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_JOB_TIMEOUT_SECONDS', 600))
+
+    @staticmethod
+    def is_abandoned(job) -> bool:
+        return job.status == 'running' and (
+            job.started_at is None or job.started_at < ReportJobService.abandoned_before()
+        )
+
+    @staticmethod
+    def reset_abandoned() -> int:
+        """
+        Remet en attente les générations réservées depuis plus de
+        REPORT_JOB_TIMEOUT_SECONDS (le délai court à partir de la réservation,
+        pas de la demande)
+
+        Returns:
+            Nombre de demandes remises en attente
+        """
+        return ReportJob.objects.filter(
+            Q(started_at__isnull=True) | Q(started_at__lt=ReportJobService.abandoned_before()),
+            status='running'
+        ).update(status='pending', started_at=None)
+
+    @staticmethod
+    def process_pending(batch_size: int = 10) -> Dict:
+        """
+        Génère les rapports en attente (appelé par le worker)
+
+        Les générations abandonnées sont d'abord remises en attente. Les
+        demandes sont réservées (statut 'running', started_at) dans une
+        transaction courte, puis générées hors transaction.
+
+        Returns:
+            {'done': int, 'failed': int}
+        """
+        ReportJobService.reset_abandoned()
+
+        with transaction.atomic():
+            pending = ReportJob.objects.filter(status='pending').order_by('created_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                pending = pending.select_for_update(skip_locked=True)
+
+            jobs = list(pending[:batch_size])
+            ReportJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status='running', started_at=timezone.now()
+            )
+
+        summary = {'done': 0, 'failed': 0}
+        for job in jobs:
+            ReportJobService.render_job(job)
+            summary[job.status] += 1
+        return summary
+
+    @staticmethod
+    def render_job(job) -> ReportJob:
+        """Génère et stocke le fichier d'une demande réservée"""
+        name = ReportJobService.artifact_name(job.artifact_key, job.format)
+        try:
+            # Une autre demande a pu générer le même fichier entre-temps
+            if not default_storage.exists(name):
+                output = ReportJobService.render(job.report_type, job.format, job.start_date, job.end_date)
+                try:
+                    default_storage.save(name, File(output))
+                finally:
+                    output.close()
+        except Exception as e:
+            logger.warning(f"Erreur lors de la génération du rapport {job.pk}: {str(e)}")
+            job.status = 'failed'
+            job.error = str(e)
+        else:
+            job.status = 'done'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'completed_at'])
+        return job
+
+    @staticmethod
+    def render(report_type: str, report_format: str, start_date: date, end_date: date):
+        """Génère le rapport et renvoie un fichier positionné au début"""
+        from products.models import Product
+        from sales.models import SaleItem
+        from .excel_generator import ExcelReportGenerator
+        from .models import DailyReport, StockAlert
+        from .pdf_generator import PDFReportGenerator
+        from .services import DailyReportService
+
+        if report_type == 'daily':
+            daily_report = DailyReport.objects.filter(date=start_date).first()
+            if daily_report is None:
+                raise ValueError(f"Aucun rapport quotidien pour le {start_date.strftime('%d/%m/%Y')}")
+
+            product_figures = DailyReportService.get_product_figures(start_date)
+            stock_alerts = StockAlert.objects.filter(created_at__date=start_date).order_by('product__name')
+            if report_format == 'xlsx':
+                return ExcelReportGenerator().generate_daily_report_excel(
+                    daily_report, product_figures, stock_alerts
+                )
+            return PDFReportGenerator().generate_daily_report_pdf(
+                daily_report,
+                [
+                    {'product_name': product.name, 'quantity': product.quantity_sold, 'total_amount': product.revenue}
+                    for product in product_figures.filter(quantity_sold__gt=0)
+                ],
+                list(stock_alerts.select_related('product'))
+            )
+
+        if report_type == 'stock':
+            products = Product.objects.filter(is_active=True).order_by('category__name', 'name')
+            if report_format == 'xlsx':
+                return ExcelReportGenerator().generate_stock_report_excel(products)
+            return PDFReportGenerator().generate_stock_report_pdf(list(products.select_related('category')))
+
+        # Bornes en datetime : comparaison directe sur created_at, sans extraction de date
+        period_start = timezone.make_aware(datetime.combine(start_date, time.min))
+        period_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+        return ExcelReportGenerator().generate_sales_report_excel(
+            SaleItem.objects.filter(sale__created_at__gte=period_start, sale__created_at__lt=period_end),
+            start_date,
+            end_date
+        )
+
+    # ===== FICHIERS =====
+
+    @staticmethod
+    def open_artifact(job):
+        """Fichier généré d'une demande terminée (None s'il n'existe plus)"""
+        name = ReportJobService.artifact_name(job.artifact_key, job.format)
+        if job.status != 'done' or not default_storage.exists(name):
+            return None
+        return default_storage.open(name, 'rb')
+
+    @staticmethod
+    def cleanup(older_than_hours: Optional[int] = None) -> int:
+        """
+        Supprime les fichiers des périodes non closes générés depuis plus de
+        REPORT_ARTIFACT_RETENTION_HOURS heures (les périodes closes sont conservées)
+
+        Returns:
+            Nombre de demandes supprimées
+        """
+        if older_than_hours is None:
+            older_than_hours = getattr(settings, 'REPORT_ARTIFACT_RETENTION_HOURS', 24)
+
+        cutoff = timezone.now() - timedelta(hours=older_than_hours)
+        jobs = ReportJob.objects.filter(
+            is_closed=False,
+            created_at__lt=cutoff
+        ).exclude(
+            status__in=ReportJobService.ACTIVE_STATUSES
+        ).exclude(
+            # Fichiers encore servis à des demandes récentes
+            artifact_key__in=ReportJob.objects.filter(created_at__gte=cutoff).values('artifact_key')
+        )
+
+        for artifact_key, report_format in jobs.values_list('artifact_key', 'format').distinct():
+            default_storage.delete(ReportJobService.artifact_name(artifact_key, report_format))
+
+        return jobs.delete()[0]
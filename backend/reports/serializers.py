@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import DailyReport, StockAlert
+from django.urls import reverse
+from .models import DailyReport, ReportJob, StockAlert
 from products.serializers import ProductListSerializer
 
 class StockAlertSerializer(serializers.ModelSerializer):
@@ -96,3 +97,32 @@ class ReportSummarySerializer(serializers.Serializer):
     best_day_revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
     total_alerts = serializers.IntegerField()
     unresolved_alerts = serializers.IntegerField()
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Serializer pour le suivi des générations de rapports"""
+    
+    report_type_display = serializers.CharField(source='get_report_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'report_type_display', 'format',
+            'start_date', 'end_date', 'is_closed', 'status', 'status_display',
+            'error', 'created_at', 'started_at', 'completed_at', 'download_url'
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != 'done':
+            return None
+        return reverse('reports:report_job_download', args=[obj.pk])
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    """Serializer pour demander la génération d'un rapport"""
+    
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPES)
+    format = serializers.ChoiceField(choices=ReportJob.FORMATS)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
@@ -0,0 +1,145 @@
+"""
+Services de calcul des rapports
+"""
+
+from decimal import Decimal
+from typing import Dict
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from products.models import Product
+from sales.models import Sale
+
+
+class DailyReportService:
+    """Service de construction du rapport détaillé quotidien"""
+
+    @staticmethod
+    def get_product_figures(report_date):
+        """
+        Chiffres de vente par produit pour une date, en une seule requête
+
+        Chaque produit est annoté avec la quantité vendue et le chiffre
+        d'affaires des ventes payées du jour (jointure SaleItem -> Sale).
+        Les produits sans vente sont inclus avec des valeurs à zéro.
+        """
+        paid_items = Q(
+            saleitem__sale__status='paid',
+            saleitem__sale__created_at__date=report_date
+        )
+
+        return Product.objects.select_related('category').annotate(
+            quantity_sold=Coalesce(
+                Sum('saleitem__quantity', filter=paid_items),
+                Value(0)
+            ),
+            revenue=Coalesce(
+                Sum(
+                    F('saleitem__quantity') * F('saleitem__unit_price'),
+                    filter=paid_items,
+                    output_field=DecimalField(max_digits=14, decimal_places=2)
+                ),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            )
+        ).order_by('category__name', 'name')
+
+    @staticmethod
+    def get_sales_summary(report_date) -> Dict:
+        """
+        Compteurs des ventes du jour (total, CA payé, méthodes de paiement)
+        calculés en un seul aggregate()
+        """
+        return Sale.objects.filter(created_at__date=report_date).aggregate(
+            total_sales=Count('id'),
+            total_revenue=Sum('total_amount', filter=Q(status='paid')),
+            cash=Count('id', filter=Q(payment_method='cash')),
+            mobile=Count('id', filter=Q(payment_method='mobile')),
+            card=Count('id', filter=Q(payment_method='card')),
+        )
+
+    @staticmethod
+    def build_detailed_report(report_date) -> Dict:
+        """
+        Construit le rapport détaillé quotidien
+
+        Le nombre de requêtes est constant (2) quelle que soit la taille
+        du catalogue.
+
+        Returns:
+            {
+                'summary': dict,
+                'categories': dict,
+                'payment_methods': dict
+            }
+        """
+        summary = DailyReportService.get_sales_summary(report_date)
+
+        total_cost = Decimal('0')
+        total_profit = Decimal('0')
+        products_sold = 0
+        categories_data = {}
+
+        for product in DailyReportService.get_product_figures(report_date):
+            category_name = product.category.name if product.category else 'Autres'
+
+            if category_name not in categories_data:
+                categories_data[category_name] = {
+                    'products': [],
+                    'total_revenue': Decimal('0'),
+                    'total_profit': Decimal('0'),
+                    'total_sold': 0
+                }
+
+            quantity_sold = product.quantity_sold
+            revenue = product.revenue
+            cost = (product.purchase_price or Decimal('0')) * quantity_sold
+            profit = revenue - cost
+
+            # Stock initial approximatif : stock actuel + quantités vendues
+            initial_stock = product.current_stock + quantity_sold
+
+            categories_data[category_name]['products'].append({
+                'name': product.name,
+                'prix_unitaire': float(product.selling_price or 0),
+                'stock_initial': initial_stock,
+                'stock_entree': 0,  # À calculer avec les approvisionnements
+                'stock_total': initial_stock,
+                'consommation': quantity_sold,
+                'stock_restant': product.current_stock,
+                'prix_achat': float(product.purchase_price or 0),
+                'prix_vente': float(product.selling_price or 0),
+                'stock_vendu': quantity_sold,
+                'marge_unitaire': float((product.selling_price or 0) - (product.purchase_price or 0)),
+                'benefice_total': float(profit),
+                'revenue': float(revenue)
+            })
+            categories_data[category_name]['total_revenue'] += revenue
+            categories_data[category_name]['total_profit'] += profit
+            categories_data[category_name]['total_sold'] += quantity_sold
+
+            total_cost += cost
+            total_profit += profit
+            products_sold += quantity_sold
+
+        # Convertir les Decimal en float pour JSON
+        for category in categories_data.values():
+            category['total_revenue'] = float(category['total_revenue'])
+            category['total_profit'] = float(category['total_profit'])
+
+        return {
+            'summary': {
+                'total_sales': summary['total_sales'],
+                'total_revenue': float(summary['total_revenue'] or 0),
+                'total_cost': float(total_cost),
+                'total_profit': float(total_profit),
+                'products_sold': products_sold
+            },
+            'categories': categories_data,
+            'payment_methods': {
+                'cash': summary['cash'],
+                'mobile': summary['mobile'],
+                'card': summary['card']
+            }
+        }
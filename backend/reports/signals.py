@@ -1,81 +1,22 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.db.models import F
 from products.models import Product
-from sales.models import Sale
+from sales.models import Sale, SaleItem
 from inventory.models import StockMovement
-from .models import StockAlert
+from .models import DailyReport, StockAlert
 from .notifications import NotificationService
+from .dashboard import DashboardBroadcaster
+from .report_jobs import ReportJobService
+from .stock_alerts import StockAlertService
 
 @receiver(post_save, sender=Product)
 def check_stock_level(sender, instance, created, **kwargs):
     """Vérifier le niveau de stock après modification d'un produit"""
     if not created:  # Seulement pour les mises à jour
-        # Vérifier si le stock est faible
-        if instance.current_stock <= instance.minimum_stock and instance.current_stock > 0:
-            # Vérifier si une alerte existe déjà
-            existing_alert = StockAlert.objects.filter(
-                product=instance,
-                alert_type='low_stock',
-                status='active'
-            ).first()
-            
-            if not existing_alert:
-                # Créer une nouvelle alerte
-                StockAlert.objects.create(
-                    product=instance,
-                    alert_type='low_stock',
-                    current_stock=instance.current_stock,
-                    threshold=instance.minimum_stock,  # Utiliser le stock minimum comme seuil
-                    message=f"Stock faible pour {instance.name}: {instance.current_stock} unités restantes"
-                )
-                
-                # Envoyer la notification
-                NotificationService.send_stock_alert(instance, 'low_stock')
-        
-        # Vérifier si le produit est en rupture de stock
-        elif instance.current_stock == 0:
-            existing_alert = StockAlert.objects.filter(
-                product=instance,
-                alert_type='out_of_stock',
-                status='active'
-            ).first()
-            
-            if not existing_alert:
-                StockAlert.objects.create(
-                    product=instance,
-                    alert_type='out_of_stock',
-                    current_stock=instance.current_stock,
-                    threshold=instance.minimum_stock,  # Utiliser le stock minimum comme seuil
-                    message=f"Rupture de stock pour {instance.name}"
-                )
-                
-                NotificationService.send_stock_alert(instance, 'out_of_stock')
-        
-        # Si le stock est redevenu normal, résoudre les alertes
-        elif instance.current_stock > instance.minimum_stock:
-            # Résoudre les alertes actives pour ce produit
-            active_alerts = StockAlert.objects.filter(
-                product=instance,
-                status='active'
-            )
-            
-            for alert in active_alerts:
-                alert.status = 'resolved'
-                alert.save()
-                
-                # Notifier que l'alerte est résolue
-                from channels.layers import get_channel_layer
-                from asgiref.sync import async_to_sync
-                
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    'global_alerts',
-                    {
-                        'type': 'alert_resolved',
-                        'alert_id': alert.id
-                    }
-                )
+        # Après validation : pas d'alerte pour une modification annulée
+        transaction.on_commit(lambda: StockAlertService.reconcile([instance.pk]))
 
 @receiver(post_save, sender=Sale)
 def handle_new_sale(sender, instance, created, **kwargs):
@@ -84,8 +25,8 @@ def handle_new_sale(sender, instance, created, **kwargs):
         # Envoyer une notification de nouvelle vente
         NotificationService.send_sale_notification(instance)
         
-        # Mettre à jour les statistiques du tableau de bord
-        NotificationService.update_dashboard_stats()
+        # Mettre à jour les statistiques du tableau de bord (diffusion groupée)
+        transaction.on_commit(lambda: DashboardBroadcaster.sale_created(instance))
 
 @receiver(post_save, sender=StockMovement)
 def handle_stock_movement(sender, instance, created, **kwargs):
@@ -94,8 +35,8 @@ def handle_stock_movement(sender, instance, created, **kwargs):
         # NOTE: La mise à jour du stock est maintenant gérée dans StockMovementSerializer
         # pour éviter le doublement de quantité. Ce signal ne gère plus que les notifications.
         
-        # Mettre à jour les statistiques du tableau de bord
-        NotificationService.update_dashboard_stats()
+        # Mettre à jour les statistiques du tableau de bord (diffusion groupée)
+        transaction.on_commit(lambda: DashboardBroadcaster.stock_movement_created(instance))
 
 @receiver(post_save, sender=StockAlert)
 def handle_stock_alert_creation(sender, instance, created, **kwargs):
@@ -108,3 +49,13 @@ def handle_stock_alert_creation(sender, instance, created, **kwargs):
             level='warning',
             target_roles=['admin', 'gerant']
         )
+
+@receiver([post_save, post_delete], sender=Sale)
+@receiver([post_save, post_delete], sender=SaleItem)
+@receiver([post_save, post_delete], sender=StockMovement)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=StockAlert)
+@receiver([post_save, post_delete], sender=DailyReport)
+def invalidate_open_report_artifacts(sender, instance, **kwargs):
+    """Les rapports des périodes non closes sont à régénérer"""
+    transaction.on_commit(ReportJobService.bump_data_version)
@@ -0,0 +1,135 @@
+"""
+Rapprochement des alertes de stock avec le niveau de stock des produits
+"""
+
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import StockAlert
+
+
+class StockAlertService:
+    """
+    Service unique d'ouverture et de résolution des alertes de stock
+
+    L'état attendu d'un produit actif est une alerte 'out_of_stock' s'il est
+    à zéro, 'low_stock' s'il est au seuil minimum ou en dessous, aucune
+    sinon (et aucune pour un produit inactif). Les produits concernés sont
+    d'abord verrouillés (par id croissant) : deux rapprochements simultanés
+    d'un même produit s'exécutent l'un après l'autre et n'ouvrent pas deux
+    fois la même alerte. Les alertes actives sont comparées à cet état en
+    deux lectures ; les alertes manquantes sont
+    créées en un bulk_create, les alertes obsolètes résolues en un UPDATE,
+    et les changements notifiés en un seul envoi.
+    """
+
+    STOCK_ALERT_TYPES = ['low_stock', 'out_of_stock']
+
+    @staticmethod
+    def expected_alert_type(current_stock: int, minimum_stock: int) -> Optional[str]:
+        if current_stock == 0:
+            return 'out_of_stock'
+        if current_stock <= minimum_stock:
+            return 'low_stock'
+        return None
+
+    @staticmethod
+    def alert_message(product: Dict, alert_type: str) -> str:
+        if alert_type == 'out_of_stock':
+            return f"Rupture de stock pour {product['name']}"
+        return f"Stock faible pour {product['name']}: {product['current_stock']} unités restantes"
+
+    @staticmethod
+    @transaction.atomic
+    def reconcile(product_ids: Optional[Iterable[int]] = None, notify: bool = True) -> Dict:
+        """
+        Ouvre et résout les alertes de stock
+
+        Args:
+            product_ids: Produits à rapprocher (tout le catalogue par défaut)
+            notify: Diffuser les changements après validation
+
+        Returns:
+            {'opened': [StockAlert], 'resolved': [id des alertes résolues]}
+        """
+        from products.models import Product
+
+        products = Product.objects.filter(is_active=True, current_stock__lte=F('minimum_stock'))
+        alerts = StockAlert.objects.filter(status='active', alert_type__in=StockAlertService.STOCK_ALERT_TYPES)
+
+        # Verrou des produits à rapprocher avant toute lecture : ceux demandés,
+        # ou pour tout le catalogue ceux sous le seuil ou avec une alerte active
+        locked = Product.objects.select_for_update().order_by('pk')
+        if product_ids is not None:
+            locked = locked.filter(pk__in=list(product_ids))
+        else:
+            locked = locked.filter(
+                Q(pk__in=products.values('pk')) | Q(pk__in=alerts.values('product_id'))
+            )
+        product_ids = list(locked.values_list('pk', flat=True))
+        products = products.filter(pk__in=product_ids)
+        alerts = alerts.filter(product_id__in=product_ids)
+
+        expected = {}
+        for product in products.values('id', 'name', 'category__name', 'current_stock', 'minimum_stock'):
+            alert_type = StockAlertService.expected_alert_type(product['current_stock'], product['minimum_stock'])
+            expected[(product['id'], alert_type)] = product
+
+        active = {}
+        for alert_id, product_id, alert_type in alerts.values_list('id', 'product_id', 'alert_type'):
+            active.setdefault((product_id, alert_type), []).append(alert_id)
+
+        opened = StockAlert.objects.bulk_create([
+            StockAlert(
+                product_id=product_id,
+                alert_type=alert_type,
+                current_stock=product['current_stock'],
+                threshold=product['minimum_stock'],
+                message=StockAlertService.alert_message(product, alert_type)
+            )
+            for (product_id, alert_type), product in expected.items()
+            if (product_id, alert_type) not in active
+        ])
+
+        resolved = sorted(
+            alert_id
+            for key, alert_ids in active.items() if key not in expected
+            for alert_id in alert_ids
+        )
+        if resolved:
+            StockAlert.objects.filter(pk__in=resolved).update(status='resolved', resolved_at=timezone.now())
+
+        if opened or resolved:
+            from .dashboard import DashboardBroadcaster
+            from .report_jobs import ReportJobService
+
+            transaction.on_commit(ReportJobService.bump_data_version)
+            transaction.on_commit(
+                lambda: DashboardBroadcaster.stock_alerts_changed(len(opened), len(resolved))
+            )
+            if notify:
+                payload = [
+                    {
+                        'alert_id': alert.pk,
+                        'product_id': alert.product_id,
+                        'product_name': expected[(alert.product_id, alert.alert_type)]['name'],
+                        'category': expected[(alert.product_id, alert.alert_type)]['category__name'],
+                        'current_stock': alert.current_stock,
+                        'minimum_stock': alert.threshold,
+                        'alert_type': alert.alert_type,
+                    }
+                    for alert in opened
+                ]
+                transaction.on_commit(lambda: StockAlertService.notify(payload, resolved))
+
+        return {'opened': opened, 'resolved': resolved}
+
+    @staticmethod
+    def notify(opened, resolved):
+        """Un seul événement pour tous les changements d'un rapprochement"""
+        from .notifications import NotificationService
+
+        NotificationService.send_stock_alerts_changed(opened, resolved)
@@ -5,6 +5,8 @@ from .notifications import NotificationService
 from .models import DailyReport, StockAlert
 from products.models import Product
 from sales.models import Sale, SaleItem
+from sales.rollup_service import SalesRollupService
+from accounts.models import User
 from expenses.models import Expense
 from django.db.models import Sum, Count, Avg
 from decimal import Decimal
@@ -30,46 +32,33 @@ def generate_daily_report():
         if existing_report:
             return f"Rapport quotidien pour {today} existe déjà"
         
-        # Calculer les statistiques du jour
-        today_sales = Sale.objects.filter(
-            created_at__date=today,
-            status='completed'
-        )
-        
-        total_sales_count = today_sales.count()
-        total_sales = today_sales.aggregate(
-            total=Sum('total_amount')
-        )['total'] or Decimal('0.00')
-        
-        # Calculer le bénéfice (approximatif basé sur les prix d'achat)
-        total_profit = Decimal('0.00')
-        for sale in today_sales:
-            for item in sale.items.all():
-                profit_per_item = (item.unit_price - item.product.purchase_price) * item.quantity
-                total_profit += profit_per_item
-        
-        # Ticket moyen
-        average_sale = total_sales / total_sales_count if total_sales_count > 0 else Decimal('0.00')
-        
+        # Calculer les statistiques du jour (agrégats matérialisés)
+        paid_totals = SalesRollupService.get_totals(today)
+
+        total_sales_count = paid_totals['paid_sales']
+        total_sales = paid_totals['net_revenue']
+        total_profit = paid_totals['profit']
+
         # Dépenses du jour
-        today_expenses = Expense.objects.filter(expense_date=today).aggregate(
+        today_expenses = Expense.objects.filter(expense_date__date=today).aggregate(
             total=Sum('amount')
         )['total'] or Decimal('0.00')
-        
-        # Résultat net
-        net_result = total_profit - today_expenses
-        
-        # Créer le rapport
+
+        # Le rapport est attribué au premier administrateur
+        report_user = User.objects.filter(role='admin').order_by('id').first()
+        if report_user is None:
+            return f"Aucun administrateur pour le rapport quotidien du {today}"
+
+        # Créer le rapport (le résultat net est calculé à la sauvegarde)
         daily_report = DailyReport.objects.create(
             date=today,
-            total_sales_count=total_sales_count,
+            user=report_user,
+            number_of_sales=total_sales_count,
             total_sales=total_sales,
-            total_profit=total_profit,
-            average_sale=average_sale,
-            total_expenses=today_expenses,
-            net_result=net_result
+            total_profit=max(total_profit, Decimal('0.00')),
+            total_expenses=today_expenses
         )
-        
+
         # Envoyer une notification aux admins et gérants
         NotificationService.send_system_notification(
             message=f"Rapport quotidien généré pour {today.strftime('%d/%m/%Y')}",
@@ -99,6 +88,22 @@ def cleanup_old_alerts():
     except Exception as e:
         return f"Erreur lors du nettoyage: {str(e)}"
 
+@shared_task
+def render_report_jobs(batch_size=10):
+    """Tâche périodique pour générer les rapports demandés"""
+    from .report_jobs import ReportJobService
+
+    summary = ReportJobService.process_pending(batch_size=batch_size)
+    return f"Rapports générés: {summary['done']}, en échec: {summary['failed']}"
+
+@shared_task
+def cleanup_report_artifacts():
+    """Supprimer les rapports générés pour des périodes non closes devenus obsolètes"""
+    from .report_jobs import ReportJobService
+
+    deleted_count = ReportJobService.cleanup()
+    return f"Nettoyage effectué: {deleted_count} rapports supprimés"
+
 @shared_task
 def send_daily_summary():
     """Envoyer un résumé quotidien aux gestionnaires"""
@@ -1,3 +1,596 @@
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from products.models import Category, Product
+from sales.models import Sale, SaleItem
+from .excel_generator import ExcelReportGenerator
+from .services import DailyReportService
+
+
+class DailyReportServiceTests(TestCase):
+    """Tests du rapport détaillé quotidien"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='caissier', password='x', role='cashier')
+        cls.boissons = Category.objects.create(name='Bières', type='boissons')
+        cls.plats = Category.objects.create(name='Grillades', type='plats')
+
+    def create_products(self, count, category):
+        return [
+            Product.objects.create(
+                name=f"{category.name} {index}",
+                category=category,
+                code=f"{category.type}-{index}",
+                purchase_price=Decimal('1000'),
+                selling_price=Decimal('1500'),
+                current_stock=50
+            )
+            for index in range(count)
+        ]
+
+    def create_sale(self, items, status='paid', payment_method='cash'):
+        sale = Sale.objects.create(server=self.user, status=status, payment_method=payment_method)
+        total = Decimal('0')
+        for product, quantity in items:
+            item = SaleItem.objects.create(
+                sale=sale, product=product, quantity=quantity, unit_price=product.selling_price
+            )
+            total += item.total_price
+        sale.total_amount = total
+        sale.save()
+        return sale
+
+    def test_report_figures(self):
+        beer, other_beer = self.create_products(2, self.boissons)
+        (brochette,) = self.create_products(1, self.plats)
+        self.create_sale([(beer, 3), (brochette, 2)])
+        self.create_sale([(beer, 1)], payment_method='mobile')
+        self.create_sale([(other_beer, 5)], status='pending')
+
+        report = DailyReportService.build_detailed_report(timezone.localdate())
+
+        self.assertEqual(report['summary'], {
+            'total_sales': 3,
+            'total_revenue': 9000.0,
+            'total_cost': 6000.0,
+            'total_profit': 3000.0,
+            'products_sold': 6
+        })
+        self.assertEqual(report['payment_methods'], {'cash': 2, 'mobile': 1, 'card': 0})
+
+        beers = report['categories']['Bières']
+        self.assertEqual(beers['total_sold'], 4)
+        self.assertEqual(beers['total_revenue'], 6000.0)
+        self.assertEqual(beers['total_profit'], 2000.0)
+
+        sold_beer = next(p for p in beers['products'] if p['name'] == beer.name)
+        self.assertEqual(sold_beer['stock_vendu'], 4)
+        self.assertEqual(sold_beer['stock_initial'], 54)
+        self.assertEqual(sold_beer['stock_restant'], 50)
+
+        # Les ventes non payées ne comptent pas
+        unsold_beer = next(p for p in beers['products'] if p['name'] == other_beer.name)
+        self.assertEqual(unsold_beer['stock_vendu'], 0)
+        self.assertEqual(unsold_beer['revenue'], 0.0)
+
+    def test_query_count_is_constant(self):
+        """Le nombre de requêtes ne dépend pas de la taille du catalogue"""
+        products = self.create_products(5, self.boissons)
+        self.create_sale([(product, 1) for product in products])
+
+        with CaptureQueriesContext(connection) as small_catalogue:
+            DailyReportService.build_detailed_report(timezone.localdate())
+
+        products = self.create_products(100, self.plats)
+        self.create_sale([(product, 2) for product in products])
+
+        with CaptureQueriesContext(connection) as large_catalogue:
+            DailyReportService.build_detailed_report(timezone.localdate())
+
+        self.assertEqual(len(small_catalogue), 2)
+        self.assertEqual(len(large_catalogue), len(small_catalogue))
+
+
+class RoleBroadcastTests(TestCase):
+    """Tests de la diffusion des notifications par groupe de rôle"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admins = [
+            User.objects.create_user(username=f'admin{index}', password='x', role='admin')
+            for index in range(5)
+        ]
+        cls.server = User.objects.create_user(username='serveur', password='x', role='server')
+        cls.category = Category.objects.create(name='Bières', type='boissons')
+        cls.product = Product.objects.create(
+            name='Primus', category=cls.category, code='primus',
+            purchase_price=Decimal('1000'), selling_price=Decimal('1500'),
+            current_stock=2, minimum_stock=5
+        )
+
+    def test_one_group_send_per_role(self):
+        from unittest import mock
+        from . import notifications
+
+        with mock.patch.object(notifications.channel_layer, 'group_send', new=mock.AsyncMock()) as group_send:
+            with self.assertNumQueries(0):
+                notifications.NotificationService.send_system_notification('Fermeture', target_roles=['admin', 'server'])
+
+        self.assertEqual(
+            [call.args[0] for call in group_send.await_args_list],
+            ['role_admin', 'role_server']
+        )
+
+    def test_role_members_receive_alert(self):
+        from asgiref.sync import async_to_sync
+        from channels.db import database_sync_to_async
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from barstock_api.routing import websocket_urlpatterns
+        from .notifications import NotificationService
+
+        application = URLRouter(websocket_urlpatterns)
+
+        async def scenario():
+            communicators = []
+            for user in (self.admins[0], self.admins[1], self.server):
+                communicator = WebsocketCommunicator(application, f'/ws/notifications/{user.id}/')
+                connected, _ = await communicator.connect()
+                self.assertTrue(connected)
+                await communicator.receive_json_from()  # connection_established
+                communicators.append(communicator)
+
+            await database_sync_to_async(NotificationService.send_stock_alert)(self.product)
+
+            for communicator in communicators[:2]:
+                message = await communicator.receive_json_from()
+                self.assertEqual(message['type'], 'stock_alert')
+                self.assertEqual(message['alert']['product_id'], self.product.id)
+            self.assertTrue(await communicators[2].receive_nothing())
+
+            for communicator in communicators:
+                await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+
+class StockAlertServiceTests(TestCase):
+    """Tests du rapprochement des alertes de stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from .models import StockAlert
+
+        category = Category.objects.create(name='Bières', type='boissons')
+
+        def product(name, stock, is_active=True):
+            return Product.objects.create(
+                name=name, category=category, code=name, purchase_price=Decimal('1000'),
+                selling_price=Decimal('1500'), current_stock=stock, minimum_stock=5, is_active=is_active
+            )
+
+        cls.empty = product('Primus', 0)
+        cls.low = product('Amstel', 2)
+        cls.normal = product('Fanta', 10)
+        cls.inactive = product('Mutzig', 1, is_active=False)
+        cls.kept, cls.replaced, cls.stale = [
+            StockAlert.objects.create(
+                product=target, alert_type='low_stock', current_stock=2, threshold=5, message='Stock faible'
+            )
+            for target in (cls.low, cls.empty, cls.normal)
+        ]
+
+    def test_reconcile_opens_and_resolves_in_constant_queries(self):
+        from .models import StockAlert
+        from .stock_alerts import StockAlertService
+
+        # savepoint, verrou, produits, alertes actives, INSERT, UPDATE, libération
+        with self.assertNumQueries(7):
+            result = StockAlertService.reconcile()
+
+        self.assertEqual(
+            [(alert.product_id, alert.alert_type, alert.current_stock) for alert in result['opened']],
+            [(self.empty.pk, 'out_of_stock', 0)]
+        )
+        self.assertEqual(result['resolved'], sorted([self.replaced.pk, self.stale.pk]))
+        self.assertEqual(
+            set(StockAlert.objects.filter(status='active').values_list('product_id', 'alert_type')),
+            {(self.low.pk, 'low_stock'), (self.empty.pk, 'out_of_stock')}
+        )
+
+        result = StockAlertService.reconcile()
+        self.assertEqual((result['opened'], result['resolved']), ([], []))
+
+    def test_reconcile_is_limited_to_requested_products(self):
+        from .stock_alerts import StockAlertService
+
+        result = StockAlertService.reconcile([self.empty.pk, self.normal.pk, self.inactive.pk])
+
+        self.assertEqual([alert.product_id for alert in result['opened']], [self.empty.pk])
+        self.assertEqual(result['resolved'], sorted([self.replaced.pk, self.stale.pk]))
+        self.assertEqual(StockAlertService.reconcile([self.low.pk]), {'opened': [], 'resolved': []})
+
+    def test_changes_are_notified_once(self):
+        from unittest import mock
+        from . import notifications
+        from .stock_alerts import StockAlertService
+
+        with mock.patch.object(notifications.channel_layer, 'group_send', new=mock.AsyncMock()) as group_send:
+            with self.captureOnCommitCallbacks(execute=True):
+                StockAlertService.reconcile()
+
+        self.assertEqual(
+            [call.args[0] for call in group_send.await_args_list],
+            ['global_alerts', 'role_admin', 'role_gerant']
+        )
+        event = group_send.await_args_list[0].args[1]
+        self.assertEqual(event['type'], 'stock_alerts_changed')
+        self.assertEqual(event['opened'][0]['product_name'], 'Primus')
+        self.assertEqual(len(event['resolved']), 2)
+
+    def test_product_save_reconciles_after_commit(self):
+        from .models import StockAlert
+
+        self.normal.current_stock = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            self.normal.save()
+
+        self.assertEqual(
+            list(StockAlert.objects.filter(product=self.normal).values_list('alert_type', 'status')),
+            [('low_stock', 'active')]
+        )
+
+
+class DashboardBroadcasterTests(TestCase):
+    """Tests de la diffusion groupée du tableau de bord"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='caissier2', password='x', role='cashier')
+        cls.category = Category.objects.create(name='Bières', type='boissons')
+        cls.product = Product.objects.create(
+            name='Amstel', category=cls.category, code='amstel',
+            purchase_price=Decimal('1000'), selling_price=Decimal('1500'),
+            current_stock=20, minimum_stock=5
+        )
+
+    def setUp(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from .dashboard import DashboardBroadcaster
+
+        cache.clear()
+        # Un minuteur réel laissé par un test précédent empêcherait l'appel
+        DashboardBroadcaster.reset()
+        timer = mock.patch.object(DashboardBroadcaster, '_start_timer')
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+        self.addCleanup(DashboardBroadcaster.reset)
+
+    def test_events_are_coalesced_into_one_broadcast(self):
+        from unittest import mock
+        from channels.layers import get_channel_layer
+        from .dashboard import DashboardBroadcaster
+
+        DashboardBroadcaster.refresh_snapshot()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(10):
+                Sale.objects.create(
+                    server=self.user, customer_name=f'Client {index}',
+                    total_amount=Decimal('3000'), discount_amount=Decimal('500')
+                ).mark_as_paid(self.user)
+        self.assertEqual(self.timer.call_count, 1)
+
+        with mock.patch.object(get_channel_layer(), 'group_send', new=mock.AsyncMock()) as group_send:
+            with self.assertNumQueries(0):
+                stats = DashboardBroadcaster.flush()
+
+        group_send.assert_awaited_once()
+        self.assertEqual(stats['today_sales'], 10)
+        self.assertEqual(stats['today_revenue'], 25000.0)
+        self.assertEqual(stats, DashboardBroadcaster.compute_stats())
+
+    def test_concurrent_flushes_keep_both_deltas(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from .dashboard import DashboardBroadcaster
+
+        DashboardBroadcaster.refresh_snapshot()
+        get_many = cache.get_many
+
+        def flush_from_other_worker(keys):
+            # Un autre processus diffuse ses propres écarts au même moment
+            DashboardBroadcaster.apply_deltas(timezone.localdate().isoformat(), {'today_sales': 2})
+            return get_many(keys)
+
+        DashboardBroadcaster.mark_dirty({'today_sales': 1, 'today_revenue': 1500.5})
+        with mock.patch.object(cache, 'get_many', side_effect=flush_from_other_worker):
+            stats = DashboardBroadcaster.flush()
+
+        self.assertEqual((stats['today_sales'], stats['today_revenue']), (3, 1500.5))
+        self.assertEqual(DashboardBroadcaster.read_snapshot(timezone.localdate().isoformat()), stats)
+
+    def test_recompute_without_snapshot(self):
+        from .dashboard import DashboardBroadcaster
+
+        DashboardBroadcaster.mark_dirty({'today_sales': 1})
+        self.product.current_stock = 2
+        self.product.save()
+
+        stats = DashboardBroadcaster.flush()
+
+        self.assertEqual(stats['low_stock_products'], 1)
+        self.assertEqual(stats['total_products'], 1)
+
+    def test_payment_cancellation_and_alerts_move_the_snapshot(self):
+        from .dashboard import DashboardBroadcaster
+
+        sale = Sale.objects.create(
+            server=self.user, customer_name='Client', total_amount=Decimal('3000'), discount_amount=Decimal('500')
+        )
+        DashboardBroadcaster.refresh_snapshot()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.mark_as_paid(self.user)
+        self.assertEqual(DashboardBroadcaster.flush()['today_revenue'], 2500.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.cancel_sale()
+        self.assertEqual(DashboardBroadcaster.flush()['today_revenue'], 0.0)
+
+        self.product.current_stock = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        stats = DashboardBroadcaster.flush()
+
+        self.assertEqual(stats['active_alerts'], 1)
+        self.assertEqual(
+            (stats['today_revenue'], stats['active_alerts']),
+            (DashboardBroadcaster.compute_stats()['today_revenue'], DashboardBroadcaster.compute_stats()['active_alerts'])
+        )
+
+
+class ReportExportTestCase(TestCase):
+    """Données et outils communs aux tests des exports"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='gerant', password='x', role='manager', first_name='Jean', last_name='Ndayishimiye'
+        )
+        cls.category = Category.objects.create(name='Bières', type='boissons')
+        cls.products = [
+            Product.objects.create(
+                name=f'Primus {index}', category=cls.category, code=f'primus-{index}',
+                purchase_price=Decimal('1000'), selling_price=Decimal('1500'),
+                current_stock=index * 5, minimum_stock=5
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_sales(self, count):
+        for _ in range(count):
+            sale = Sale.objects.create(server=self.user, status='paid', payment_method='cash')
+            for product in self.products:
+                SaleItem.objects.create(sale=sale, product=product, quantity=2, unit_price=product.selling_price)
+
+    def export(self, url, params=None):
+        """Demande le rapport, le fait générer par le worker puis le télécharge"""
+        from .report_jobs import ReportJobService
+
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 202)
+        ReportJobService.process_pending()
+        return self.client.get(url, params)
+
+    def load(self, response):
+        from io import BytesIO
+        from openpyxl import load_workbook
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], ExcelReportGenerator.CONTENT_TYPE)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        return load_workbook(BytesIO(b''.join(response.streaming_content)))
+
+
+class ExcelExportTests(ReportExportTestCase):
+    """Tests des exports Excel en écriture seule"""
+
+    def test_sales_export_rows_and_total(self):
+        self.create_sales(4)
+
+        workbook = self.load(self.export('/api/reports/export/sales-report/excel/'))
+        rows = list(workbook['Rapport de Ventes'].values)
+
+        self.assertEqual(rows[2][0], 'Date')
+        items = rows[3:-2]
+        self.assertEqual(len(items), 12)
+        self.assertEqual(items[0][1:], ('N/A', 'Primus 0', 2, 1500, 3000, 'Jean Ndayishimiye', 'Payé'))
+        self.assertEqual(rows[-1][4:6], ('TOTAL:', 36000))
+
+    def test_sales_export_query_count_is_constant(self):
+        today = timezone.localdate()
+        self.create_sales(2)
+        with CaptureQueriesContext(connection) as small:
+            ExcelReportGenerator().generate_sales_report_excel(SaleItem.objects.all(), today, today).close()
+
+        self.create_sales(30)
+        with CaptureQueriesContext(connection) as large:
+            ExcelReportGenerator().generate_sales_report_excel(SaleItem.objects.all(), today, today).close()
+
+        self.assertEqual(len(small), 1)
+        self.assertEqual(len(large), 1)
+
+    def test_sales_export_rejects_invalid_period(self):
+        response = self.client.get('/api/reports/export/sales-report/excel/', {'start_date': '2025-13-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            '/api/reports/export/sales-report/excel/', {'start_date': '2025-02-01', 'end_date': '2025-01-01'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_stock_export(self):
+        workbook = self.load(self.export('/api/reports/export/stock-report/excel/'))
+        rows = list(workbook['Rapport de Stock'].values)
+
+        self.assertEqual([row[0] for row in rows[3:6]], ['Primus 0', 'Primus 1', 'Primus 2'])
+        self.assertEqual(rows[3][6], '⚠️ Stock Faible')
+        self.assertEqual(rows[5][5], 10000)
+        self.assertEqual(rows[-3][1], 3)
+        self.assertEqual(rows[-2][1], 2)
+        self.assertEqual(rows[-1][1], 15000)
+
+    def test_daily_export(self):
+        from .models import DailyReport
+
+        today = timezone.localdate()
+        self.assertEqual(self.client.get(f'/api/reports/export/daily-report/{today}/excel/').status_code, 404)
+
+        self.create_sales(1)
+        DailyReport.objects.create(
+            date=today, user=self.user, total_sales=Decimal('9000'), number_of_sales=1
+        )
+        workbook = self.load(self.export(f'/api/reports/export/daily-report/{today}/excel/'))
+
+        self.assertEqual(workbook.sheetnames, ['Résumé', 'Ventes Détaillées', 'Alertes Stock'])
+        sales_rows = list(workbook['Ventes Détaillées'].values)
+        self.assertEqual(sales_rows[1], ('Primus 0', 'Bières', 2, 1500, 3000))
+        self.assertEqual(len(sales_rows), 4)
+
+
+class ReportJobTests(ReportExportTestCase):
+    """Tests des générations de rapports en arrière-plan"""
+
+    def setUp(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from .report_jobs import ReportJobService
+
+        super().setUp()
+        cache.delete(ReportJobService.DATA_VERSION_KEY)
+        self.render = mock.patch.object(
+            ReportJobService, 'render', wraps=ReportJobService.render
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_closed_day_is_rendered_once(self):
+        from datetime import timedelta
+        from .models import DailyReport
+
+        yesterday = timezone.localdate() - timedelta(days=1)
+        DailyReport.objects.create(date=yesterday, user=self.user)
+        url = f'/api/reports/export/daily-report/{yesterday}/pdf/'
+
+        response = self.export(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        # Les nouvelles ventes ne concernent pas un jour clos
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_sales(1)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_open_period_follows_data_version(self):
+        url = '/api/reports/export/stock-report/pdf/'
+        self.assertEqual(self.export(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.render.call_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.products[0].pk).update(current_stock=100)
+            self.products[0].save()
+        self.assertEqual(self.export(url).status_code, 200)
+        self.assertEqual(self.render.call_count, 2)
+
+    def test_missing_data_version_is_never_reused(self):
+        from django.core.cache import cache
+        from .report_jobs import ReportJobService
+
+        today = timezone.localdate()
+        first = ReportJobService.artifact_key('stock', 'pdf', today, today)
+        self.assertEqual(ReportJobService.artifact_key('stock', 'pdf', today, today), first)
+
+        # Cache vidé ou évincé : nouvelle version, pas de retour à une version déjà servie
+        cache.delete(ReportJobService.DATA_VERSION_KEY)
+        self.assertNotEqual(ReportJobService.artifact_key('stock', 'pdf', today, today), first)
+
+    def test_timeout_runs_from_claim(self):
+        from datetime import timedelta
+        from .models import ReportJob
+        from .report_jobs import ReportJobService
+
+        job = ReportJobService.request_report('stock', 'xlsx')
+        ReportJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(hours=2))
+
+        # Toujours en file d'attente : partagée, pas dupliquée
+        self.assertEqual(ReportJobService.request_report('stock', 'xlsx').pk, job.pk)
+
+        # Réservée puis abandonnée par un worker arrêté : remise en attente et générée
+        ReportJob.objects.filter(pk=job.pk).update(
+            status='running', started_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(ReportJobService.process_pending(), {'done': 1, 'failed': 0})
+        self.assertEqual(ReportJob.objects.count(), 1)
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, 'done')
+
+    def test_pending_request_is_shared(self):
+        first = self.client.get('/api/reports/export/stock-report/excel/')
+        second = self.client.get('/api/reports/export/stock-report/excel/')
+        self.assertEqual((first.status_code, second.status_code), (202, 202))
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(first.data['status'], 'pending')
+
+    def test_job_api(self):
+        from .report_jobs import ReportJobService
+
+        response = self.client.post('/api/reports/jobs/', {'report_type': 'stock', 'format': 'xlsx'})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+        self.assertEqual(ReportJobService.process_pending(), {'done': 1, 'failed': 0})
+
+        response = self.client.get(f'/api/reports/jobs/{job_id}/')
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['download_url'], f'/api/reports/jobs/{job_id}/download/')
+        self.load(self.client.get(response.data['download_url']))
+
+        response = self.client.post('/api/reports/jobs/', {'report_type': 'stock', 'format': 'xlsx'})
+        self.assertEqual((response.status_code, response.data['id']), (200, job_id))
+
+        response = self.client.post('/api/reports/jobs/', {'report_type': 'sales', 'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_render_is_reported(self):
+        from .models import ReportJob
+        from .report_jobs import ReportJobService
+
+        job = ReportJobService.request_report('daily', 'pdf', timezone.localdate())
+        self.assertEqual(ReportJobService.process_pending(), {'done': 0, 'failed': 1})
 
-# Create your tests here.
+        job = ReportJob.objects.get(pk=job.pk)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Aucun rapport quotidien', job.error)
+        self.assertEqual(self.client.get(f'/api/reports/jobs/{job.pk}/download/').status_code, 410)
@@ -25,7 +25,12 @@ urlpatterns = [
     path('export/daily-report/<str:date_str>/excel/', views.ExportDailyReportExcelView.as_view(), name='export-daily-report-excel'),
     path('export/stock-report/pdf/', views.ExportStockReportPDFView.as_view(), name='export-stock-report-pdf'),
     path('export/stock-report/excel/', views.ExportStockReportExcelView.as_view(), name='export-stock-report-excel'),
-    path('export/sales-report/excel/', views.ExportSalesReportPDFView.as_view(), name='export-sales-report-excel'),
+    path('export/sales-report/excel/', views.ExportSalesReportExcelView.as_view(), name='export-sales-report-excel'),
+
+    # Générations de rapports en arrière-plan
+    path('jobs/', views.ReportJobCreateView.as_view(), name='report_job_create'),
+    path('jobs/<int:pk>/', views.ReportJobDetailView.as_view(), name='report_job_detail'),
+    path('jobs/<int:pk>/download/', views.report_job_download, name='report_job_download'),
 
     # Notifications en temps réel
     path('notifications/status/', views.NotificationStatusView.as_view(), name='notification-status'),
@@ -1,4 +1,4 @@
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
@@ -9,14 +9,17 @@ from django.db.models import Sum, Count, Avg, Max, F, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
-from .models import DailyReport, StockAlert
+from .models import DailyReport, ReportJob, StockAlert
 from .serializers import (
     DailyReportSerializer, DailyReportCreateSerializer,
     StockAlertSerializer, StockAlertCreateSerializer,
-    ReportSummarySerializer
+    ReportSummarySerializer, ReportJobSerializer, ReportJobCreateSerializer
 )
 from .pdf_generator import PDFReportGenerator
 from .excel_generator import ExcelReportGenerator
+from .report_jobs import ReportJobService
+from .services import DailyReportService
+from .stock_alerts import StockAlertService
 from products.models import Product
 from sales.models import Sale, SaleItem
 from expenses.models import Expense
@@ -170,53 +173,13 @@ def generate_stock_alerts(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
-    alerts_created = 0
-
-    # Produits en rupture de stock
-    out_of_stock_products = Product.objects.filter(
-        current_stock=0,
-        is_active=True
-    )
-
-    for product in out_of_stock_products:
-        # Vérifier qu'il n'y a pas déjà une alerte
-        if not StockAlert.objects.filter(
-            product=product,
-            alert_type='out_of_stock',
-            status='active'
-        ).exists():
-            StockAlert.objects.create(
-                product=product,
-                alert_type='out_of_stock',
-                message=f"Le produit {product.name} est en rupture de stock."
-            )
-            alerts_created += 1
-
-    # Produits avec stock faible
-    from django.db import models
-    low_stock_products = Product.objects.filter(
-        current_stock__lte=models.F('minimum_stock'),
-        current_stock__gt=0,
-        is_active=True
-    )
-
-    for product in low_stock_products:
-        # Vérifier qu'il n'y a pas déjà une alerte
-        if not StockAlert.objects.filter(
-            product=product,
-            alert_type='low_stock',
-            status='active'
-        ).exists():
-            StockAlert.objects.create(
-                product=product,
-                alert_type='low_stock',
-                message=f"Le stock du produit {product.name} est faible: {product.current_stock}/{product.minimum_stock}."
-            )
-            alerts_created += 1
+    result = StockAlertService.reconcile()
+    alerts_created = len(result['opened'])
 
     return Response({
         'message': f'{alerts_created} nouvelles alertes créées.',
-        'alerts_created': alerts_created
+        'alerts_created': alerts_created,
+        'alerts_resolved': len(result['resolved'])
     })
 
 
@@ -268,10 +231,10 @@ def dashboard_stats(request):
         pending_sales = Sale.objects.filter(status='pending').count()
         print(f"DEBUG: Ventes en attente: {pending_sales}")
 
-        # Données réelles des ventes du jour
-        daily_sales = Sale.objects.filter(created_at__date=today)
-        completed_sales = daily_sales.filter(status='paid')
-        completed_sales_count = completed_sales.count()
+        # Données réelles des ventes du jour (agrégats matérialisés)
+        from sales.rollup_service import SalesRollupService
+        paid_totals = SalesRollupService.get_totals(today)
+        completed_sales_count = paid_totals['paid_sales']
 
         # Données des commandes du jour
         try:
@@ -285,12 +248,9 @@ def dashboard_stats(request):
 
         # Debug: Afficher les informations
         print(f"DEBUG: Ventes complétées trouvées: {completed_sales_count}")
-        print(f"DEBUG: Ventes du jour: {daily_sales.count()}")
 
         # Calcul des revenus du jour
-        daily_revenue = completed_sales.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
+        daily_revenue = paid_totals['revenue']
 
         print(f"DEBUG: Revenus calculés: {daily_revenue}")
 
@@ -308,15 +268,11 @@ def dashboard_stats(request):
         print(f"DEBUG: Tables occupées: {occupied_tables}/{total_tables}")
 
         # Produits vendus aujourd'hui avec détails
-        products_sold_today = SaleItem.objects.filter(
-            sale__in=completed_sales
-        ).values(
-            'product__name',
-            'product__category'
-        ).annotate(
-            quantity_sold=Sum('quantity'),
-            revenue=Sum('total_price')
-        ).order_by('-quantity_sold')
+        products_sold_today = SalesRollupService.get_top_products(
+            today,
+            limit=None,
+            fields=('product__name', 'product__category')
+        )
 
     except ImportError as e:
         print(f"DEBUG: Erreur d'import: {e}")
@@ -471,106 +427,16 @@ def daily_detailed_report(request, date):
     Vue pour le rapport détaillé quotidien
     """
     try:
-        from datetime import datetime
-        from django.db.models import Sum, Count, F
-
         # Parser la date
         report_date = datetime.strptime(date, '%Y-%m-%d').date()
 
-        # Récupérer les ventes du jour
-        daily_sales = Sale.objects.filter(created_at__date=report_date)
-        completed_sales = daily_sales.filter(status='paid')
-
-        # Statistiques générales
-        total_sales_count = daily_sales.count()
-        total_revenue = completed_sales.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-
-        # Calculer les bénéfices
-        total_cost = Decimal('0')
-        total_profit = Decimal('0')
-        products_sold = 0
-
-        for sale in completed_sales:
-            for item in sale.items.all():
-                item_cost = item.product.purchase_price * item.quantity
-                item_profit = (item.unit_price - item.product.purchase_price) * item.quantity
-                total_cost += item_cost
-                total_profit += item_profit
-                products_sold += item.quantity
-
-        # Données par catégorie
-        categories_data = {}
-
-        # Récupérer tous les produits avec leurs ventes du jour
-        products = Product.objects.select_related('category').all()
-
-        for product in products:
-            category_name = product.category.name if product.category else 'Autres'
-
-            if category_name not in categories_data:
-                categories_data[category_name] = {
-                    'products': [],
-                    'total_revenue': Decimal('0'),
-                    'total_profit': Decimal('0'),
-                    'total_sold': 0
-                }
-
-            # Calculer les ventes pour ce produit aujourd'hui
-            product_sales = SaleItem.objects.filter(
-                sale__created_at__date=report_date,
-                sale__status='paid',
-                product=product
-            )
-
-            quantity_sold = product_sales.aggregate(total=Sum('quantity'))['total'] or 0
-            revenue = product_sales.aggregate(total=Sum(F('quantity') * F('unit_price')))['total'] or Decimal('0')
-            cost = (product.purchase_price or Decimal('0')) * quantity_sold
-            profit = revenue - cost
-
-            # Calculer le stock initial approximatif
-            initial_stock = product.current_stock + quantity_sold
-
-            product_data = {
-                'name': product.name,
-                'prix_unitaire': float(product.selling_price or 0),
-                'stock_initial': initial_stock,
-                'stock_entree': 0,  # À calculer avec les approvisionnements
-                'stock_total': initial_stock,
-                'consommation': quantity_sold,
-                'stock_restant': product.current_stock,
-                'prix_achat': float(product.purchase_price or 0),
-                'prix_vente': float(product.selling_price or 0),
-                'stock_vendu': quantity_sold,
-                'marge_unitaire': float((product.selling_price or 0) - (product.purchase_price or 0)),
-                'benefice_total': float(profit),
-                'revenue': float(revenue)
-            }
-
-            categories_data[category_name]['products'].append(product_data)
-            categories_data[category_name]['total_revenue'] += revenue
-            categories_data[category_name]['total_profit'] += profit
-            categories_data[category_name]['total_sold'] += quantity_sold
-
-        # Convertir les Decimal en float pour JSON
-        for category in categories_data.values():
-            category['total_revenue'] = float(category['total_revenue'])
-            category['total_profit'] = float(category['total_profit'])
+        report = DailyReportService.build_detailed_report(report_date)
 
         return Response({
             'date': date,
-            'summary': {
-                'total_sales': total_sales_count,
-                'total_revenue': float(total_revenue),
-                'total_cost': float(total_cost),
-                'total_profit': float(total_profit),
-                'products_sold': products_sold
-            },
-            'categories': categories_data,
-            'payment_methods': {
-                'cash': daily_sales.filter(payment_method='cash').count(),
-                'mobile': daily_sales.filter(payment_method='mobile').count(),
-                'card': daily_sales.filter(payment_method='card').count()
-            }
+            'summary': report['summary'],
+            'categories': report['categories'],
+            'payment_methods': report['payment_methods']
         })
 
     except Exception as e:
@@ -581,33 +447,95 @@ def daily_detailed_report(request, date):
         }, status=500)
 
 
-# Classes de vues pour l'export (stubs)
+def report_export_response(request, report_type, report_format, start_date=None, end_date=None):
+    """
+    Renvoie le fichier du rapport s'il est déjà généré, sinon la demande de
+    génération à suivre (202, voir report_job_detail)
+    """
+    try:
+        job = ReportJobService.request_report(
+            report_type, report_format, start_date, end_date, user=request.user
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    output = ReportJobService.open_artifact(job)
+    if output is None:
+        return Response(ReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=ReportJobService.download_filename(job),
+        content_type=ReportJobService.CONTENT_TYPES[job.format]
+    )
+
+
+def parse_report_date(value):
+    """Date AAAA-MM-JJ d'un paramètre (None si absent), ValueError si invalide"""
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+# Classes de vues pour l'export (générées en arrière-plan, voir reports.report_jobs)
 class ExportDailyReportPDFView(APIView):
-    permission_classes = [permissions.AllowAny]
+    """
+    Export PDF du rapport quotidien
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    report_format = 'pdf'
 
     def get(self, request, date_str):
-        return Response({'message': 'Export PDF - En développement'})
+        try:
+            report_date = parse_report_date(date_str)
+        except ValueError:
+            return Response({'error': 'Format de date invalide (AAAA-MM-JJ)'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if not DailyReport.objects.filter(date=report_date).exists():
+            return Response({'error': 'Aucun rapport pour cette date'}, status=status.HTTP_404_NOT_FOUND)
 
-class ExportDailyReportExcelView(APIView):
-    permission_classes = [permissions.AllowAny]
+        return report_export_response(request, 'daily', self.report_format, report_date, report_date)
 
-    def get(self, request, date_str):
-        return Response({'message': 'Export Excel - En développement'})
+
+class ExportDailyReportExcelView(ExportDailyReportPDFView):
+    """
+    Export Excel du rapport quotidien (ventes par produit et alertes de stock)
+    """
+    report_format = 'xlsx'
 
 
 class ExportStockReportPDFView(APIView):
-    permission_classes = [permissions.AllowAny]
+    """
+    Export PDF de l'état du stock des produits actifs
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    report_format = 'pdf'
 
     def get(self, request):
-        return Response({'message': 'Export Stock PDF - En développement'})
+        return report_export_response(request, 'stock', self.report_format)
 
 
-class ExportStockReportExcelView(APIView):
-    permission_classes = [permissions.AllowAny]
+class ExportStockReportExcelView(ExportStockReportPDFView):
+    """
+    Export Excel de l'état du stock des produits actifs
+    """
+    report_format = 'xlsx'
+
+
+class ExportSalesReportExcelView(APIView):
+    """
+    Export Excel des articles vendus sur une période
+    (?start_date=AAAA-MM-JJ&end_date=AAAA-MM-JJ, 30 derniers jours par défaut)
+    """
+    permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        return Response({'message': 'Export Stock Excel - En développement'})
+        try:
+            start_date = parse_report_date(request.query_params.get('start_date'))
+            end_date = parse_report_date(request.query_params.get('end_date'))
+        except ValueError:
+            return Response({'error': 'Format de date invalide (AAAA-MM-JJ)'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return report_export_response(request, 'sales', 'xlsx', start_date, end_date)
 
 
 class ExportSalesReportPDFView(APIView):
@@ -617,6 +545,65 @@ class ExportSalesReportPDFView(APIView):
         return Response({'message': 'Export Sales PDF - En développement'})
 
 
+class ReportJobCreateView(generics.CreateAPIView):
+    """
+    Vue pour demander la génération d'un rapport
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ReportJobCreateSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        try:
+            job = ReportJobService.request_report(
+                data['report_type'], data['format'], data.get('start_date'), data.get('end_date'),
+                user=request.user
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_status = status.HTTP_200_OK if job.status == 'done' else status.HTTP_202_ACCEPTED
+        return Response(ReportJobSerializer(job).data, status=response_status)
+
+
+class ReportJobDetailView(generics.RetrieveAPIView):
+    """
+    Vue pour suivre une génération de rapport
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ReportJobSerializer
+    queryset = ReportJob.objects.all()
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def report_job_download(request, pk):
+    """
+    Vue pour télécharger le fichier d'une génération terminée
+    """
+    try:
+        job = ReportJob.objects.get(pk=pk)
+    except ReportJob.DoesNotExist:
+        return Response({'error': 'Génération introuvable'}, status=status.HTTP_404_NOT_FOUND)
+
+    output = ReportJobService.open_artifact(job)
+    if output is None:
+        return Response(
+            {'error': 'Fichier non disponible', 'status': job.status},
+            status=status.HTTP_409_CONFLICT if job.status in ReportJobService.ACTIVE_STATUSES else status.HTTP_410_GONE
+        )
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=ReportJobService.download_filename(job),
+        content_type=ReportJobService.CONTENT_TYPES[job.format]
+    )
+
+
 class NotificationStatusView(APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.db.models import Sum, Count, Avg
 from django.urls import reverse
@@ -226,20 +226,30 @@ class SaleAdmin(admin.ModelAdmin):
     actions = ['mark_as_paid', 'mark_as_served', 'cancel_sales']
 
     def mark_as_paid(self, request, queryset):
-        """Marque les ventes comme payées"""
-        updated = queryset.update(status='paid', paid_at=timezone.now())
+        """Marque les ventes comme payées (stock et agrégats via Sale.mark_as_paid)"""
+        updated = 0
+        for sale in queryset.exclude(status__in=['paid', 'cancelled']):
+            try:
+                sale.mark_as_paid(request.user)
+            except ValueError as e:
+                self.message_user(request, f'Vente {sale.reference}: {str(e)}', level=messages.ERROR)
+            else:
+                updated += 1
         self.message_user(request, f'{updated} vente(s) marquée(s) comme payée(s).')
     mark_as_paid.short_description = "Marquer comme payé"
 
     def mark_as_served(self, request, queryset):
-        """Marque les ventes comme servies"""
-        updated = queryset.update(status='served')
+        """Marque les ventes comme servies (les ventes payées ou annulées sont ignorées)"""
+        updated = queryset.exclude(status__in=['paid', 'cancelled']).update(status='served')
         self.message_user(request, f'{updated} vente(s) marquée(s) comme servie(s).')
     mark_as_served.short_description = "Marquer comme servi"
 
     def cancel_sales(self, request, queryset):
-        """Annule les ventes sélectionnées"""
-        updated = queryset.update(status='cancelled')
+        """Annule les ventes sélectionnées (stock et agrégats via Sale.cancel_sale)"""
+        updated = 0
+        for sale in queryset.exclude(status='cancelled'):
+            sale.cancel_sale()
+            updated += 1
         self.message_user(request, f'{updated} vente(s) annulée(s).')
     cancel_sales.short_description = "Annuler les ventes"
 
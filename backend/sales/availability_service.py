@@ -0,0 +1,169 @@
+"""
+Service de disponibilité des tables pour les réservations
+"""
+
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Table, TableReservation
+
+
+class ReservationAvailabilityService:
+    """
+    Service pour détecter les conflits de réservation
+
+    Les réservations sont stockées comme intervalles [starts_at, ends_at[
+    (datetimes, donc sans problème de passage à minuit) : un chevauchement
+    est une seule requête indexée starts_at < fin ET ends_at > début.
+    """
+
+    BLOCKING_STATUSES = ['confirmed', 'seated']
+
+    # ===== CONFLITS =====
+
+    @staticmethod
+    def conflicts(starts_at: datetime, ends_at: datetime, tables=None, exclude_id: Optional[int] = None):
+        """Réservations bloquantes qui chevauchent l'intervalle [starts_at, ends_at["""
+        queryset = TableReservation.objects.filter(
+            status__in=ReservationAvailabilityService.BLOCKING_STATUSES,
+            starts_at__lt=ends_at,
+            ends_at__gt=starts_at
+        )
+        if tables is not None:
+            queryset = queryset.filter(table__in=tables)
+        if exclude_id is not None:
+            queryset = queryset.exclude(pk=exclude_id)
+        return queryset.order_by('starts_at')
+
+    @staticmethod
+    def find_conflict(table, reservation_date: date, reservation_time: time,
+                      duration_minutes: int = 120, exclude_id: Optional[int] = None) -> Optional[TableReservation]:
+        """Première réservation de la table en conflit avec le créneau demandé"""
+        starts_at, ends_at = TableReservation.compute_interval(reservation_date, reservation_time, duration_minutes)
+        return ReservationAvailabilityService.conflicts(
+            starts_at, ends_at, tables=[table], exclude_id=exclude_id
+        ).first()
+
+    @staticmethod
+    def available_tables(tables, reservation_date: date, reservation_time: time, duration_minutes: int = 120):
+        """Tables sans réservation bloquante sur le créneau (une requête)"""
+        starts_at, ends_at = TableReservation.compute_interval(reservation_date, reservation_time, duration_minutes)
+        return tables.exclude(
+            id__in=ReservationAvailabilityService.conflicts(starts_at, ends_at).values('table_id')
+        )
+
+    # ===== GRILLE DES CRÉNEAUX =====
+
+    @staticmethod
+    def get_slot_grid(
+        day: date,
+        party_size: int = 1,
+        duration_minutes: int = 120,
+        slot_minutes: Optional[int] = None,
+        start: Optional[time] = None,
+        end: Optional[time] = None
+    ) -> Dict:
+        """
+        Créneaux libres de chaque table pour une journée (deux requêtes)
+
+        Les réservations de la fenêtre sont chargées en une seule requête
+        puis, pour chaque table, triées par début avec le maximum cumulé
+        des fins : un créneau [s, s + durée[ est libre si aucune réservation
+        commençant avant s + durée ne finit après s (recherche bisect).
+
+        Args:
+            day: Journée
+            party_size: Nombre de personnes (capacité minimale des tables)
+            duration_minutes: Durée d'une réservation
+            slot_minutes: Pas entre deux créneaux
+            start: Premier créneau (ouverture par défaut)
+            end: Heure après laquelle aucun créneau ne commence (fermeture par
+                défaut, le lendemain si elle est avant le début)
+
+        Returns:
+            {
+                'date': date,
+                'party_size': int,
+                'duration_minutes': int,
+                'slot_minutes': int,
+                'slots': ['HH:MM', ...],
+                'tables': [{'table_id', 'table_number', 'capacity', 'location', 'free_slots'}],
+                'free_pairs': int
+            }
+        """
+        slot_minutes = slot_minutes or getattr(settings, 'RESERVATION_SLOT_MINUTES', 30)
+        start = start or datetime.strptime(getattr(settings, 'RESERVATION_OPENING_TIME', '11:00'), '%H:%M').time()
+        end = end or datetime.strptime(getattr(settings, 'RESERVATION_CLOSING_TIME', '23:00'), '%H:%M').time()
+
+        window_start = timezone.make_aware(datetime.combine(day, start))
+        window_end = timezone.make_aware(datetime.combine(day, end))
+        if window_end <= window_start:
+            window_end += timedelta(days=1)
+
+        duration = timedelta(minutes=duration_minutes)
+        step = timedelta(minutes=slot_minutes)
+        now = timezone.now()
+
+        slots = []
+        slot_start = window_start
+        while slot_start < window_end:
+            if slot_start >= now:
+                slots.append(slot_start)
+            slot_start += step
+
+        labels = [timezone.localtime(slot_start).strftime('%H:%M') for slot_start in slots]
+
+        tables = list(
+            Table.objects.filter(is_active=True, capacity__gte=party_size)
+            .order_by('number')
+            .values('id', 'number', 'capacity', 'location')
+        )
+
+        intervals = {}
+        if slots:
+            reservations = ReservationAvailabilityService.conflicts(
+                slots[0], slots[-1] + duration
+            ).filter(
+                table__is_active=True,
+                table__capacity__gte=party_size
+            ).values_list('table_id', 'starts_at', 'ends_at')
+            for table_id, starts_at, ends_at in reservations:
+                intervals.setdefault(table_id, []).append((starts_at, ends_at))
+
+        grid = []
+        free_pairs = 0
+        for table in tables:
+            table_intervals = intervals.get(table['id'], [])
+            starts = [starts_at for starts_at, _ in table_intervals]
+            max_ends = list(accumulate((ends_at for _, ends_at in table_intervals), max))
+
+            free_slots = []
+            for slot_start, label in zip(slots, labels):
+                # Réservations qui commencent avant la fin du créneau
+                count = bisect_left(starts, slot_start + duration)
+                if count == 0 or max_ends[count - 1] <= slot_start:
+                    free_slots.append(label)
+
+            free_pairs += len(free_slots)
+            grid.append({
+                'table_id': table['id'],
+                'table_number': table['number'],
+                'capacity': table['capacity'],
+                'location': table['location'],
+                'free_slots': free_slots
+            })
+
+        return {
+            'date': day,
+            'party_size': party_size,
+            'duration_minutes': duration_minutes,
+            'slot_minutes': slot_minutes,
+            'slots': labels,
+            'tables': grid,
+            'free_pairs': free_pairs
+        }
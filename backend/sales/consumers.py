@@ -7,7 +7,7 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from .models import Table, TableReservation
-from .serializers import TableListSerializer, TableReservationSerializer
+from .serializers import TableReservationSerializer
 
 
 class TableStatusConsumer(AsyncWebsocketConsumer):
@@ -103,10 +103,10 @@ class TableStatusConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def get_tables_data(self):
-        """Récupérer les données des tables"""
-        tables = Table.objects.filter(is_active=True).select_related().prefetch_related('sales')
-        serializer = TableListSerializer(tables, many=True)
-        return serializer.data
+        """Récupérer les données des tables (plan de salle en cache)"""
+        from .services import TableService
+        
+        return TableService.get_floor_plan()
 
 
 class ReservationConsumer(AsyncWebsocketConsumer):
@@ -5,14 +5,29 @@ Service de génération automatique de factures
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.http import quote_etag
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
 from decimal import Decimal
+from typing import Dict, Optional
+import hashlib
 import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 
 class InvoiceService:
     """Service pour générer des factures automatiquement"""
-    
+
+    CONTENT_TYPES = {
+        'json': 'application/json',
+        'html': 'text/html; charset=utf-8',
+    }
+
     @staticmethod
     def generate_invoice_data(sale):
         """Générer les données de facture pour une vente"""
@@ -135,10 +150,11 @@ class InvoiceService:
             return f"{int(amount):,} francs burundais".replace(",", " ")
     
     @staticmethod
-    def generate_invoice_html(sale):
+    def generate_invoice_html(sale, invoice_data=None):
         """Générer le HTML de la facture"""
-        
-        invoice_data = InvoiceService.generate_invoice_data(sale)
+
+        if invoice_data is None:
+            invoice_data = InvoiceService.generate_invoice_data(sale)
         
         html_template = """
         <!DOCTYPE html>
@@ -282,7 +298,7 @@ class InvoiceService:
         html = html.replace("{% endfor %}", "")
         html = html.replace("{% if item.notes %}", "")
         html = html.replace("{% endif %}", "")
-        html = html.replace("{% if discount_amount > 0 %}", "" if invoice_data['discount_amount'] <= 0 else "")
+        html = html.replace("{% if discount_amount > 0 %}", "" if invoice_data['summary']['discount_amount'] <= 0 else "")
         html = html.replace("{% if notes %}", "" if not invoice_data['notes'] else "")
         html = html.replace("|floatformat:0", "")
         
@@ -294,23 +310,124 @@ class InvoiceService:
         invoice_data = InvoiceService.generate_invoice_data(sale)
         return json.dumps(invoice_data, indent=2, ensure_ascii=False)
     
+    # ===== FACTURES RENDUES EN CACHE =====
+
     @staticmethod
-    def auto_generate_invoice(sale):
-        """Générer automatiquement une facture lors de la validation d'une vente"""
+    def version_key(sale_id) -> str:
+        return f"invoices:version:{sale_id}"
+
+    @staticmethod
+    def version_timeout() -> int:
+        """La version vit aussi longtemps que les factures rendues sous elle"""
+        return getattr(settings, 'INVOICE_CACHE_TIMEOUT', 86400)
+
+    @staticmethod
+    def get_version(sale_id) -> Optional[int]:
+        """Version de la facture d'une vente, None si elle n'a jamais été rendue"""
+        return cache.get(InvoiceService.version_key(sale_id))
+
+    @staticmethod
+    def create_version(sale_id) -> bool:
+        """
+        Crée la version initiale de la facture d'une vente existante
+
+        La version initiale est horodatée plutôt que fixée à 1 : si la clé
+        disparaît du cache (éviction, expiration), la nouvelle version ne peut
+        pas correspondre à une facture rendue auparavant.
+
+        Returns:
+            False si une modification de la vente a créé la version entre-temps
+        """
+        return cache.add(InvoiceService.version_key(sale_id), time.time_ns(), InvoiceService.version_timeout())
+
+    @staticmethod
+    def bump_version(sale_id):
+        """La vente ou ses articles ont changé : la facture doit être rendue à nouveau"""
+        key = InvoiceService.version_key(sale_id)
         try:
-            # Générer les données de facture
-            invoice_data = InvoiceService.generate_invoice_data(sale)
-            
-            # Ici, on pourrait sauvegarder la facture en base de données
-            # ou l'envoyer par email, etc.
-            
-            print(f"📄 Facture générée automatiquement pour la vente {sale.reference}")
-            print(f"   Client: {invoice_data['customer']['name']}")
-            print(f"   Total: {invoice_data['total_amount']:,.0f} FBu")
-            print(f"   Articles: {len(invoice_data['items'])}")
-            
-            return invoice_data
-            
-        except Exception as e:
-            print(f"❌ Erreur génération facture pour {sale.reference}: {e}")
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), InvoiceService.version_timeout())
+
+    @staticmethod
+    def invoice_queryset():
+        """Ventes avec table, serveur et articles préchargés (produit et catégorie)"""
+        from .models import Sale, SaleItem
+
+        return Sale.objects.select_related('table', 'server').prefetch_related(
+            Prefetch('items', queryset=SaleItem.objects.select_related('product__category').order_by('id'))
+        )
+
+    @staticmethod
+    def render_invoice(sale, format_type: str = 'json') -> Dict:
+        """
+        Rendre la facture d'une vente
+
+        Returns:
+            {'content', 'content_type', 'etag', 'last_modified'} ; l'ETag est
+            l'empreinte du contenu, last_modified l'horodatage du rendu
+        """
+        invoice_data = InvoiceService.generate_invoice_data(sale)
+        if format_type == 'html':
+            content = InvoiceService.generate_invoice_html(sale, invoice_data)
+        else:
+            content = json.dumps({'success': True, 'invoice': invoice_data}, ensure_ascii=False)
+
+        return {
+            'content': content,
+            'content_type': InvoiceService.CONTENT_TYPES[format_type],
+            'etag': quote_etag(hashlib.sha256(content.encode()).hexdigest()[:32]),
+            'last_modified': int(time.time()),
+        }
+
+    @staticmethod
+    def get_rendered_invoice(sale_id, format_type: str = 'json') -> Optional[Dict]:
+        """
+        Facture rendue d'une vente, depuis le cache si elle n'a pas changé
+
+        Le rendu est stocké sous la version courante de la vente, incrémentée
+        (signaux) à chaque modification de la vente ou de ses articles. Une
+        facture inchangée est servie sans aucune requête SQL. La version n'est
+        créée qu'une fois la vente trouvée : un id inexistant ne laisse aucune
+        clé en cache.
+
+        Returns:
+            Facture rendue (voir render_invoice), None si la vente n'existe pas
+        """
+        # Version lue avant la vente : un rendu concurrent d'une modification
+        # est stocké sous l'ancienne version, qui ne sera plus servie
+        version = InvoiceService.get_version(sale_id)
+        if version is not None:
+            invoice = cache.get(f"invoices:{sale_id}:{version}:{format_type}")
+            if invoice is not None:
+                return invoice
+
+        sale = InvoiceService.invoice_queryset().filter(pk=sale_id).first()
+        if sale is None:
             return None
+        invoice = InvoiceService.render_invoice(sale, format_type)
+
+        if version is None:
+            # Une modification validée après la lecture de la vente a déjà créé
+            # la version : ce rendu est peut-être périmé, il n'est pas stocké
+            if not InvoiceService.create_version(sale_id):
+                return invoice
+            version = InvoiceService.get_version(sale_id)
+        cache.set(f"invoices:{sale_id}:{version}:{format_type}", invoice, InvoiceService.version_timeout())
+        return invoice
+
+    @staticmethod
+    def auto_generate_invoice(sale):
+        """
+        Générer la facture lors de la création d'une vente
+
+        La facture JSON est rendue une seule fois, après validation de la
+        transaction, et mise en cache pour le premier appel de l'endpoint
+        """
+        def render():
+            try:
+                InvoiceService.get_rendered_invoice(sale.pk)
+            except Exception as e:
+                logger.warning(f"Erreur génération facture pour {sale.reference}: {str(e)}")
+
+        transaction.on_commit(render)
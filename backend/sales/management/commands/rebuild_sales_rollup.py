@@ -0,0 +1,43 @@
+"""
+Commande Django pour reconstruire les agrégats de ventes
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.rollup_service import SalesRollupService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit la table SalesRollup à partir de l\'historique des ventes payées'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date-from',
+            help='Date de début (YYYY-MM-DD), par défaut tout l\'historique',
+        )
+        parser.add_argument(
+            '--date-to',
+            help='Date de fin (YYYY-MM-DD), par défaut aujourd\'hui',
+        )
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Date invalide: {value} (format attendu: YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        date_from = self.parse_date(options['date_from'])
+        date_to = self.parse_date(options['date_to'])
+
+        self.stdout.write('📊 Reconstruction des agrégats de ventes...')
+
+        rows = SalesRollupService.rebuild(date_from=date_from, date_to=date_to)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {rows} lignes d\'agrégats reconstruites')
+        )
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:27
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0004_alter_ingredient_supplier'),
+        ('sales', '0003_table_customer_table_server'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='Heure')),
+                ('payment_method', models.CharField(blank=True, default='', max_length=20, verbose_name='Mode de paiement')),
+                ('sales_count', models.IntegerField(default=0, verbose_name='Nombre de ventes')),
+                ('quantity_sold', models.IntegerField(default=0, verbose_name='Quantité vendue')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name="Chiffre d'affaires (BIF)")),
+                ('discount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Remises (BIF)')),
+                ('cost', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name="Coût d'achat (BIF)")),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='products.product', verbose_name='Produit')),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Serveur')),
+            ],
+            options={
+                'verbose_name': 'Agrégat de ventes',
+                'verbose_name_plural': 'Agrégats de ventes',
+                'ordering': ['date', 'hour'],
+                'indexes': [models.Index(fields=['date', 'hour'], name='sales_rollup_date_hour_idx'), models.Index(fields=['product', 'date'], name='sales_rollup_product_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('product__isnull', False)), fields=('date', 'hour', 'server', 'payment_method', 'product'), name='unique_sales_rollup_product'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('product__isnull', True)), fields=('date', 'hour', 'server', 'payment_method'), name='unique_sales_rollup_sale'),
+        ),
+    ]
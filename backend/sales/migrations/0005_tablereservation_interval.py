@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:49
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_intervals(apps, schema_editor):
+    TableReservation = apps.get_model('sales', 'TableReservation')
+    reservations = list(TableReservation.objects.all())
+    for reservation in reservations:
+        reservation.starts_at = timezone.make_aware(
+            datetime.combine(reservation.reservation_date, reservation.reservation_time)
+        )
+        reservation.ends_at = reservation.starts_at + timedelta(minutes=reservation.duration_minutes)
+    TableReservation.objects.bulk_update(reservations, ['starts_at', 'ends_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_salesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tablereservation',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Fin'),
+        ),
+        migrations.AddField(
+            model_name='tablereservation',
+            name='starts_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Début'),
+        ),
+        migrations.AddIndex(
+            model_name='tablereservation',
+            index=models.Index(fields=['table', 'starts_at', 'ends_at'], name='reservation_table_interval_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tablereservation',
+            index=models.Index(fields=['starts_at', 'ends_at'], name='reservation_interval_idx'),
+        ),
+        migrations.RunPython(fill_intervals, migrations.RunPython.noop),
+    ]
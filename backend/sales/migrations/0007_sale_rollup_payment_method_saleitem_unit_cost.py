@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_sale_created_id_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='rollup_payment_method',
+            field=models.CharField(blank=True, help_text='Mode de paiement sous lequel la vente a été ajoutée aux agrégats', max_length=20, null=True, verbose_name='Mode de paiement comptabilisé'),
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text="Prix d'achat du produit au moment du paiement", max_digits=10, null=True, verbose_name='Coût unitaire (BIF)'),
+        ),
+    ]
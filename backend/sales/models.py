@@ -1,9 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
 from django.conf import settings
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 class Table(models.Model):
     """
@@ -120,10 +120,14 @@ class Table(models.Model):
             return int(duration.total_seconds() / 60)
         return 0
 
+    OPEN_SALE_STATUSES = ['pending', 'preparing', 'ready', 'served']
+
     @property
     def current_sale(self):
-        """Vente en cours pour cette table"""
-        return self.sales.filter(status__in=['pending', 'preparing', 'ready', 'served']).first()
+        """Vente en cours pour cette table (préchargée par TableService.floor_plan_queryset)"""
+        if hasattr(self, 'open_sales'):
+            return self.open_sales[0] if self.open_sales else None
+        return self.sales.filter(status__in=self.OPEN_SALE_STATUSES).first()
 
     def occupy(self, user=None):
         """Marque la table comme occupée"""
@@ -207,6 +211,21 @@ class TableReservation(models.Model):
         verbose_name='Durée prévue (minutes)'
     )
 
+    # Intervalle [début, fin[ calculé à l'enregistrement (détection des chevauchements)
+    starts_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='Début'
+    )
+
+    ends_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='Fin'
+    )
+
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -263,10 +282,29 @@ class TableReservation(models.Model):
         verbose_name_plural = 'Réservations'
         ordering = ['reservation_date', 'reservation_time']
         unique_together = ['table', 'reservation_date', 'reservation_time']
+        indexes = [
+            models.Index(fields=['table', 'starts_at', 'ends_at'], name='reservation_table_interval_idx'),
+            models.Index(fields=['starts_at', 'ends_at'], name='reservation_interval_idx'),
+        ]
 
     def __str__(self):
         return f"Réservation {self.customer_name} - Table {self.table.number} - {self.reservation_date} {self.reservation_time}"
 
+    @staticmethod
+    def compute_interval(reservation_date, reservation_time, duration_minutes):
+        """Début et fin d'une réservation en datetimes du fuseau local"""
+        starts_at = timezone.make_aware(datetime.combine(reservation_date, reservation_time))
+        return starts_at, starts_at + timedelta(minutes=duration_minutes)
+
+    def save(self, *args, **kwargs):
+        self.starts_at, self.ends_at = self.compute_interval(
+            self.reservation_date, self.reservation_time, self.duration_minutes
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'starts_at', 'ends_at'}
+        super().save(*args, **kwargs)
+
     @property
     def is_today(self):
         """Vérifie si la réservation est pour aujourd'hui"""
@@ -320,6 +358,33 @@ class TableReservation(models.Model):
         self.save()
 
 
+class SaleQuerySet(models.QuerySet):
+    """QuerySet des ventes"""
+
+    def with_totals(self):
+        """
+        Annote items_count et profit en SQL
+
+        Évite une requête par vente lors de la sérialisation (items.count()
+        et parcours des articles pour le bénéfice).
+        """
+        from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+        from django.db.models.functions import Coalesce
+
+        item_profit = ExpressionWrapper(
+            (F('items__unit_price') - F('items__product__purchase_price')) * F('items__quantity'),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        )
+        return self.annotate(
+            items_count=Count('items'),
+            profit=Coalesce(
+                Sum(item_profit),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+
+
 class Sale(models.Model):
     """
     Modèle pour les ventes/commandes
@@ -439,10 +504,25 @@ class Sale(models.Model):
         verbose_name='Date de paiement'
     )
 
+    rollup_payment_method = models.CharField(
+        max_length=20,
+        blank=True,
+        null=True,
+        verbose_name='Mode de paiement comptabilisé',
+        help_text='Mode de paiement sous lequel la vente a été ajoutée aux agrégats'
+    )
+
+    objects = SaleQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Vente'
         verbose_name_plural = 'Ventes'
         ordering = ['-created_at']
+        indexes = [
+            # Pagination par curseur (created_at, id) de la liste des ventes
+            models.Index(fields=['created_at', 'id'], name='sale_created_id_idx'),
+            models.Index(fields=['server', 'created_at', 'id'], name='sale_server_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"Vente {self.reference} - {self.total_amount} BIF"
@@ -462,12 +542,18 @@ class Sale(models.Model):
 
     @property
     def profit(self):
-        """Calcule le bénéfice total de la vente"""
+        """Calcule le bénéfice total de la vente (annoté par with_totals())"""
+        if '_profit' in self.__dict__:
+            return self._profit
         total_profit = Decimal('0.00')
         for item in self.items.all():
             total_profit += item.profit
         return total_profit
 
+    @profit.setter
+    def profit(self, value):
+        self._profit = value
+
     @property
     def final_amount(self):
         """Calcule le montant final après remise"""
@@ -477,31 +563,49 @@ class Sale(models.Model):
         """
         Marque la vente comme payée et met à jour le stock
         """
+        from inventory.services import StockLedgerService
+        from reports.dashboard import DashboardBroadcaster
+        from .rollup_service import SalesRollupService
+
         if self.status == 'paid':
             return  # Déjà payé
 
-        # Mettre à jour le stock pour chaque item
-        for item in self.items.all():
-            # Vérifier si le produit a une recette
-            if hasattr(item.product, 'recipe') and item.product.recipe:
-                # Pour les plats avec recette, décompter les ingrédients
-                try:
-                    recipe = item.product.recipe
-                    recipe.consume_ingredients(quantity=item.quantity, user=user)
-                except Exception as e:
-                    raise ValueError(f"Impossible de préparer {item.product.name}: {str(e)}")
-            else:
-                # Pour les produits simples, décompter le stock produit
-                if item.product.current_stock >= item.quantity:
-                    item.product.current_stock -= item.quantity
-                    item.product.save()
+        with transaction.atomic():
+            # Verrouiller la vente pour éviter un double paiement simultané
+            locked_status = Sale.objects.select_for_update().values_list('status', flat=True).get(pk=self.pk)
+            if locked_status == 'paid':
+                self.refresh_from_db()
+                return
+
+            # Mettre à jour le stock pour chaque item
+            simple_quantities = {}
+            for item in self.items.select_related('product__recipe'):
+                # Vérifier si le produit a une recette
+                if hasattr(item.product, 'recipe') and item.product.recipe:
+                    # Pour les plats avec recette, décompter les ingrédients
+                    try:
+                        recipe = item.product.recipe
+                        recipe.consume_ingredients(quantity=item.quantity, user=user or self.server)
+                    except Exception as e:
+                        raise ValueError(f"Impossible de préparer {item.product.name}: {str(e)}")
                 else:
-                    raise ValueError(f"Stock insuffisant pour {item.product.name}")
+                    # Pour les produits simples, décompter le stock produit en un lot
+                    simple_quantities[item.product_id] = simple_quantities.get(item.product_id, 0) + item.quantity
 
-        # Marquer comme payé
-        self.status = 'paid'
-        self.paid_at = timezone.now()
-        self.save()
+            StockLedgerService.consume(
+                simple_quantities, user=user or self.server, reference=self.reference,
+                notes=f"Vente {self.reference}"
+            )
+
+            # Marquer comme payé
+            self.status = 'paid'
+            self.paid_at = timezone.now()
+            self.save()
+
+            # Alimenter les agrégats de ventes
+            SalesRollupService.apply_sale(self)
+
+            transaction.on_commit(lambda: DashboardBroadcaster.sale_paid(self))
 
         # Libérer la table si elle était occupée
         if self.table and self.table.status == 'occupied':
@@ -511,16 +615,40 @@ class Sale(models.Model):
         """
         Annule la vente et remet le stock si nécessaire
         """
-        if self.status == 'paid':
-            # Remettre le stock si la vente était déjà payée
-            for item in self.items.all():
-                item.product.current_stock += item.quantity
-                item.product.save()
-
-        self.status = 'cancelled'
-        if reason:
-            self.notes = f"{self.notes or ''}\nAnnulé: {reason}".strip()
-        self.save()
+        from inventory.services import StockLedgerService
+        from reports.dashboard import DashboardBroadcaster
+        from .rollup_service import SalesRollupService
+
+        with transaction.atomic():
+            # Verrouiller la vente : une annulation simultanée ne remet pas le stock deux fois
+            locked_status = Sale.objects.select_for_update().values_list('status', flat=True).get(pk=self.pk)
+            if locked_status == 'cancelled':
+                self.refresh_from_db()
+                return
+
+            self.status = locked_status
+            was_paid = locked_status == 'paid'
+            if was_paid:
+                # Remettre en stock les produits simples si la vente était déjà payée
+                simple_quantities = {}
+                for item in self.items.select_related('product__recipe'):
+                    if not (hasattr(item.product, 'recipe') and item.product.recipe):
+                        simple_quantities[item.product_id] = simple_quantities.get(item.product_id, 0) + item.quantity
+
+                StockLedgerService.restore(
+                    simple_quantities, user=self.server, reference=self.reference,
+                    notes=f"Annulation vente {self.reference}"
+                )
+
+                # Retirer la vente des agrégats
+                SalesRollupService.apply_sale(self, sign=-1)
+
+            self.status = 'cancelled'
+            if reason:
+                self.notes = f"{self.notes or ''}\nAnnulé: {reason}".strip()
+            self.save()
+
+            transaction.on_commit(lambda: DashboardBroadcaster.sale_cancelled(self, was_paid))
 
 
 class SaleItem(models.Model):
@@ -559,6 +687,15 @@ class SaleItem(models.Model):
         verbose_name='Prix total (BIF)'
     )
 
+    unit_cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name='Coût unitaire (BIF)',
+        help_text='Prix d\'achat du produit au moment du paiement'
+    )
+
     notes = models.TextField(
         blank=True,
         null=True,
@@ -587,3 +724,103 @@ class SaleItem(models.Model):
         # Calculer le prix total
         self.total_price = self.unit_price * self.quantity
         super().save(*args, **kwargs)
+
+
+class SalesRollup(models.Model):
+    """
+    Agrégats matérialisés des ventes payées
+    Une ligne par (date, heure, serveur, mode de paiement, produit),
+    alimentée lors du paiement et de l'annulation des ventes.
+    Les lignes sans produit portent les totaux au niveau de la vente.
+    """
+
+    date = models.DateField(
+        verbose_name='Date'
+    )
+
+    hour = models.PositiveSmallIntegerField(
+        verbose_name='Heure'
+    )
+
+    server = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups',
+        verbose_name='Serveur'
+    )
+
+    payment_method = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        verbose_name='Mode de paiement'
+    )
+
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='sales_rollups',
+        verbose_name='Produit'
+    )
+
+    sales_count = models.IntegerField(
+        default=0,
+        verbose_name='Nombre de ventes'
+    )
+
+    quantity_sold = models.IntegerField(
+        default=0,
+        verbose_name='Quantité vendue'
+    )
+
+    revenue = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Chiffre d\'affaires (BIF)'
+    )
+
+    discount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Remises (BIF)'
+    )
+
+    cost = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Coût d\'achat (BIF)'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Date de modification'
+    )
+
+    class Meta:
+        verbose_name = 'Agrégat de ventes'
+        verbose_name_plural = 'Agrégats de ventes'
+        ordering = ['date', 'hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'hour', 'server', 'payment_method', 'product'],
+                condition=models.Q(product__isnull=False),
+                name='unique_sales_rollup_product'
+            ),
+            models.UniqueConstraint(
+                fields=['date', 'hour', 'server', 'payment_method'],
+                condition=models.Q(product__isnull=True),
+                name='unique_sales_rollup_sale'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'hour'], name='sales_rollup_date_hour_idx'),
+            models.Index(fields=['product', 'date'], name='sales_rollup_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}h - {self.product or 'Vente'}"
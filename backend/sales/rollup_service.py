@@ -0,0 +1,287 @@
+"""
+Service d'agrégats matérialisés des ventes payées
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from core.time_buckets import TimeBuckets
+
+from .models import Sale, SalesRollup
+
+
+class SalesRollupService:
+    """
+    Service pour alimenter et lire la table SalesRollup
+
+    Les lignes sont mises à jour de façon incrémentale (F()) lors du
+    paiement ou de l'annulation d'une vente, dans la même transaction. Le
+    coût unitaire des articles et le mode de paiement sont figés au
+    paiement : l'annulation retire exactement les montants ajoutés, même si
+    le prix d'achat ou le mode de paiement ont changé entre-temps.
+    """
+
+    COUNTER_FIELDS = ['sales_count', 'quantity_sold', 'revenue', 'discount', 'cost']
+
+    @staticmethod
+    def _sale_key(sale) -> Dict:
+        """Clé (date, heure, serveur, mode de paiement) d'une vente"""
+        created_at = timezone.localtime(sale.created_at)
+        return {
+            'date': created_at.date(),
+            'hour': created_at.hour,
+            'server_id': sale.server_id,
+            'payment_method': (
+                sale.rollup_payment_method if sale.rollup_payment_method is not None
+                else sale.payment_method or ''
+            )
+        }
+
+    @staticmethod
+    def _sale_deltas(sale, sign=1) -> Dict:
+        """
+        Calcule les compteurs d'une vente, indexés par produit
+        (None = ligne de totaux de la vente)
+        """
+        deltas = {
+            None: {
+                'sales_count': sign,
+                'revenue': sign * (sale.total_amount or Decimal('0.00')),
+                'discount': sign * (sale.discount_amount or Decimal('0.00')),
+            }
+        }
+
+        for item in sale.items.select_related('product'):
+            product_deltas = deltas.setdefault(item.product_id, {
+                'quantity_sold': 0,
+                'revenue': Decimal('0.00'),
+                'cost': Decimal('0.00'),
+            })
+            product_deltas['quantity_sold'] += sign * item.quantity
+            product_deltas['revenue'] += sign * item.total_price
+            unit_cost = item.unit_cost if item.unit_cost is not None else item.product.purchase_price
+            product_deltas['cost'] += sign * unit_cost * item.quantity
+
+        return deltas
+
+    @staticmethod
+    @transaction.atomic
+    def apply_sale(sale, sign=1):
+        """
+        Ajoute (sign=1) ou retire (sign=-1) une vente payée des agrégats
+        """
+        if sign > 0:
+            SalesRollupService._freeze_sale(sale)
+        else:
+            # L'instance peut avoir été chargée avant le paiement
+            sale.rollup_payment_method = Sale.objects.values_list(
+                'rollup_payment_method', flat=True
+            ).get(pk=sale.pk)
+        key = SalesRollupService._sale_key(sale)
+
+        for product_id, deltas in SalesRollupService._sale_deltas(sale, sign).items():
+            rollup, _ = SalesRollup.objects.get_or_create(product_id=product_id, **key)
+            SalesRollup.objects.filter(pk=rollup.pk).update(**{
+                field: F(field) + value for field, value in deltas.items()
+            })
+
+    @staticmethod
+    def _freeze_sale(sale):
+        """Fige le mode de paiement et le coût unitaire comptabilisés au paiement"""
+        from products.models import Product
+
+        sale.rollup_payment_method = sale.payment_method or ''
+        Sale.objects.filter(pk=sale.pk).update(rollup_payment_method=sale.rollup_payment_method)
+        sale.items.filter(unit_cost__isnull=True).update(unit_cost=Subquery(
+            Product.objects.filter(pk=OuterRef('product_id')).values('purchase_price')[:1]
+        ))
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(date_from=None, date_to=None) -> int:
+        """
+        Reconstruit les agrégats à partir de l'historique des ventes payées
+
+        Returns:
+            Nombre de lignes d'agrégats créées
+        """
+        rollups = SalesRollup.objects.all()
+        sales = Sale.objects.filter(status='paid')
+
+        if date_from:
+            rollups = rollups.filter(date__gte=date_from)
+            sales = sales.filter(created_at__date__gte=date_from)
+        if date_to:
+            rollups = rollups.filter(date__lte=date_to)
+            sales = sales.filter(created_at__date__lte=date_to)
+
+        rollups.delete()
+
+        rows = defaultdict(lambda: dict.fromkeys(SalesRollupService.COUNTER_FIELDS, 0))
+        for sale in sales.prefetch_related('items__product').iterator(chunk_size=500):
+            key = SalesRollupService._sale_key(sale)
+            for product_id, deltas in SalesRollupService._sale_deltas(sale).items():
+                row = rows[tuple(key.values()) + (product_id,)]
+                for field, value in deltas.items():
+                    row[field] += value
+
+        SalesRollup.objects.bulk_create([
+            SalesRollup(
+                date=date, hour=hour, server_id=server_id,
+                payment_method=payment_method, product_id=product_id,
+                **counters
+            )
+            for (date, hour, server_id, payment_method, product_id), counters in rows.items()
+        ], batch_size=1000)
+
+        return len(rows)
+
+    # ===== LECTURE =====
+
+    @staticmethod
+    def get_rollups(date_from, date_to=None, server=None):
+        """Agrégats sur une période, éventuellement pour un serveur"""
+        rollups = SalesRollup.objects.filter(
+            date__gte=date_from,
+            date__lte=date_to or date_from
+        )
+        if server is not None:
+            rollups = rollups.filter(server=server)
+        return rollups
+
+    @staticmethod
+    def get_totals(date_from, date_to=None, server=None) -> Dict:
+        """
+        Totaux des ventes payées sur une période
+
+        Returns:
+            {
+                'paid_sales': int,
+                'revenue': Decimal,
+                'discount': Decimal,
+                'net_revenue': Decimal,
+                'products_sold': int,
+                'cost': Decimal,
+                'profit': Decimal
+            }
+        """
+        sale_rows = Q(product__isnull=True)
+        totals = SalesRollupService.get_rollups(date_from, date_to, server).aggregate(
+            paid_sales=Sum('sales_count', filter=sale_rows),
+            sales_revenue=Sum('revenue', filter=sale_rows),
+            sales_discount=Sum('discount', filter=sale_rows),
+            products_sold=Sum('quantity_sold', filter=~sale_rows),
+            items_revenue=Sum('revenue', filter=~sale_rows),
+            items_cost=Sum('cost', filter=~sale_rows),
+        )
+
+        revenue = totals['sales_revenue'] or Decimal('0.00')
+        discount = totals['sales_discount'] or Decimal('0.00')
+        cost = totals['items_cost'] or Decimal('0.00')
+
+        return {
+            'paid_sales': totals['paid_sales'] or 0,
+            'revenue': revenue,
+            'discount': discount,
+            'net_revenue': revenue - discount,
+            'products_sold': totals['products_sold'] or 0,
+            'cost': cost,
+            'profit': (totals['items_revenue'] or Decimal('0.00')) - cost,
+        }
+
+    @staticmethod
+    def get_payment_methods(date_from, date_to=None, server=None) -> List[Dict]:
+        """Nombre et montant des ventes payées par mode de paiement"""
+        return list(
+            SalesRollupService.get_rollups(date_from, date_to, server)
+            .filter(product__isnull=True)
+            .values('payment_method')
+            .annotate(count=Sum('sales_count'), total=Sum('revenue') - Sum('discount'))
+            .order_by('payment_method')
+        )
+
+    @staticmethod
+    def get_top_products(date_from, date_to=None, server=None, limit: Optional[int] = 10,
+                         fields=('product__name',)) -> List[Dict]:
+        """Produits les plus vendus (ventes payées)"""
+        products = (
+            SalesRollupService.get_rollups(date_from, date_to, server)
+            .filter(product__isnull=False)
+            .values(*fields)
+            .annotate(total_quantity=Sum('quantity_sold'), total_revenue=Sum('revenue'))
+            .order_by('-total_quantity')
+        )
+        return [
+            {
+                **{field: row[field] for field in fields},
+                'quantity_sold': row['total_quantity'],
+                'revenue': row['total_revenue']
+            }
+            for row in (products[:limit] if limit else products)
+        ]
+
+    @staticmethod
+    def get_by_server(date_from, date_to=None) -> List[Dict]:
+        """Ventes payées par serveur"""
+        servers = (
+            SalesRollupService.get_rollups(date_from, date_to)
+            .filter(product__isnull=True)
+            .values('server__username', 'server__first_name', 'server__last_name')
+            .annotate(paid_count=Sum('sales_count'), net_revenue=Sum('revenue') - Sum('discount'))
+            .order_by('-net_revenue')
+        )
+        return [
+            {
+                'server__username': row['server__username'],
+                'server__first_name': row['server__first_name'],
+                'server__last_name': row['server__last_name'],
+                'sales_count': row['paid_count'],
+                'revenue': row['net_revenue']
+            }
+            for row in servers
+        ]
+
+    @staticmethod
+    def get_timeline(granularity: str, date_from, date_to=None, server=None) -> List[Dict]:
+        """
+        Ventes payées par créneau (heure, jour, semaine ou mois)
+
+        Tous les créneaux de la période sont lus en une requête, les créneaux
+        sans vente valent 0.
+        """
+        buckets = TimeBuckets(granularity, date_from, date_to)
+        rollups = SalesRollup.objects.filter(product__isnull=True)
+        if server is not None:
+            rollups = rollups.filter(server=server)
+
+        rows = buckets.aggregate(
+            rollups, 'date', hour_field='hour',
+            paid_count=Sum('sales_count'),
+            net_revenue=Sum('revenue') - Sum('discount')
+        )
+        return [
+            {
+                'bucket': row['bucket'],
+                'label': buckets.label(row['bucket']),
+                'sales_count': row['paid_count'],
+                'revenue': row['net_revenue']
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def get_hourly(report_date) -> List[Dict]:
+        """Ventes payées par heure de la journée (24 créneaux)"""
+        return [
+            {
+                'hour': row['label'],
+                'sales_count': row['sales_count'],
+                'revenue': row['revenue']
+            }
+            for row in SalesRollupService.get_timeline('hour', report_date)
+        ]
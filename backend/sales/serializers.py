@@ -78,30 +78,16 @@ class TableReservationSerializer(serializers.ModelSerializer):
 
         # Vérifier les conflits de réservation (seulement pour les nouvelles réservations)
         if not self.instance and table and reservation_date and reservation_time:
-            from datetime import datetime, timedelta
+            from .availability_service import ReservationAvailabilityService
 
-            existing_reservations = TableReservation.objects.filter(
-                table=table,
-                reservation_date=reservation_date,
-                status__in=['confirmed', 'seated']
+            conflict = ReservationAvailabilityService.find_conflict(
+                table, reservation_date, reservation_time,
+                data.get('duration_minutes', 120)
             )
-
-            duration = data.get('duration_minutes', 120)
-            new_start = reservation_time
-            new_end = (datetime.combine(reservation_date, reservation_time) +
-                      timedelta(minutes=duration)).time()
-
-            for existing in existing_reservations:
-                existing_start = existing.reservation_time
-                existing_end = (datetime.combine(reservation_date, existing_start) +
-                              timedelta(minutes=existing.duration_minutes)).time()
-
-                # Vérifier le chevauchement
-                if (existing_start <= new_start <= existing_end or
-                    new_start <= existing_start <= new_end):
-                    raise serializers.ValidationError(
-                        f"Conflit avec une réservation existante à {existing_start}."
-                    )
+            if conflict:
+                raise serializers.ValidationError(
+                    f"Conflit avec une réservation existante à {conflict.reservation_time}."
+                )
 
         return data
 
@@ -130,10 +116,14 @@ class TableListSerializer(serializers.ModelSerializer):
         """Prochaine réservation pour cette table"""
         from django.utils import timezone
 
-        next_reservation = obj.reservations.filter(
-            status='confirmed',
-            reservation_date__gte=timezone.now().date()
-        ).first()
+        # Préchargée par TableService.floor_plan_queryset
+        if hasattr(obj, 'upcoming_reservations'):
+            next_reservation = obj.upcoming_reservations[0] if obj.upcoming_reservations else None
+        else:
+            next_reservation = obj.reservations.filter(
+                status='confirmed',
+                reservation_date__gte=timezone.now().date()
+            ).first()
 
         if next_reservation:
             return {
@@ -228,13 +218,13 @@ class SaleSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'total_amount', 'subtotal', 'tax_amount', 'reference']
     
     def get_items_count(self, obj):
+        # Annoté par Sale.objects.with_totals()
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.items.count()
     
     def get_profit(self, obj):
-        return sum(
-            (item.unit_price - item.product.purchase_price) * item.quantity
-            for item in obj.items.all()
-        )
+        return obj.profit
 
 class SaleCreateSerializer(serializers.ModelSerializer):
     """Serializer pour créer une vente"""
@@ -341,12 +331,9 @@ class SaleCreateSerializer(serializers.ModelSerializer):
         sale.status = 'pending'  # Marquer comme en attente (pas encore payée)
         sale.save()
 
-        # Générer automatiquement la facture
-        try:
-            from .invoice_service import InvoiceService
-            InvoiceService.auto_generate_invoice(sale)
-        except Exception as e:
-            print(f"⚠️ Erreur génération facture: {e}")
+        # Générer automatiquement la facture (une fois, mise en cache)
+        from .invoice_service import InvoiceService
+        InvoiceService.auto_generate_invoice(sale)
 
         return sale
 
@@ -370,6 +357,9 @@ class SaleListSerializer(serializers.ModelSerializer):
         ]
 
     def get_items_count(self, obj):
+        # Annoté par Sale.objects.with_totals()
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.items.count()
 
 class SaleUpdateStatusSerializer(serializers.ModelSerializer):
@@ -385,6 +375,10 @@ class SaleUpdateStatusSerializer(serializers.ModelSerializer):
         Valide le changement de statut
         """
         instance = self.instance
+        if instance and instance.status == 'cancelled' and value != 'cancelled':
+            raise serializers.ValidationError(
+                "Impossible de modifier le statut d'une vente annulée."
+            )
         if instance and instance.status == 'paid' and value != 'paid':
             raise serializers.ValidationError(
                 "Impossible de modifier le statut d'une vente déjà payée."
@@ -5,8 +5,10 @@ Services pour la gestion des tables et réservations
 from django.db import transaction
 from django.utils import timezone
 from datetime import datetime, timedelta, time
+from time import time_ns
 from typing import Dict, List, Optional
 from .models import Table, TableReservation, Sale
+from .availability_service import ReservationAvailabilityService
 
 
 class TableService:
@@ -80,24 +82,10 @@ class TableService:
                 reservation_date = datetime.strptime(date, '%Y-%m-%d').date()
                 reservation_time = datetime.strptime(time_slot, '%H:%M').time()
                 
-                # Exclure les tables avec réservations conflictuelles
-                conflicting_reservations = TableReservation.objects.filter(
-                    reservation_date=reservation_date,
-                    status__in=['confirmed', 'seated'],
-                    table__in=tables
+                # Exclure les tables avec une réservation qui chevauche le créneau (2h)
+                tables = ReservationAvailabilityService.available_tables(
+                    tables, reservation_date, reservation_time
                 )
-                
-                # Vérifier les conflits d'horaires (2h de marge)
-                for reservation in conflicting_reservations:
-                    start_time = reservation.reservation_time
-                    end_time = (datetime.combine(reservation_date, start_time) + 
-                              timedelta(minutes=reservation.duration_minutes)).time()
-                    
-                    if (start_time <= reservation_time <= end_time or
-                        reservation_time <= start_time <= 
-                        (datetime.combine(reservation_date, reservation_time) + 
-                         timedelta(hours=2)).time()):
-                        tables = tables.exclude(id=reservation.table.id)
             
             except ValueError:
                 pass  # Format de date/heure invalide, ignorer le filtrage
@@ -139,9 +127,8 @@ class TableService:
 
             # Diffuser la mise à jour via WebSocket
             from .consumers import broadcast_table_occupied
-            from .serializers import TableListSerializer
 
-            table_data = TableListSerializer(table).data
+            table_data = TableService.get_floor_plan_table(table.id)
             broadcast_table_occupied(
                 table_id=table.id,
                 customer_name=customer_name,
@@ -198,9 +185,8 @@ class TableService:
 
             # Diffuser la mise à jour via WebSocket
             from .consumers import broadcast_table_freed
-            from .serializers import TableListSerializer
 
-            table_data = TableListSerializer(table).data
+            table_data = TableService.get_floor_plan_table(table.id)
             broadcast_table_freed(
                 table_id=table.id,
                 table_data=table_data
@@ -277,6 +263,92 @@ class TableService:
             'total_sales': sales.count(),
             'table_performance': table_performance[:10]  # Top 10
         }
+    
+    # ===== PLAN DE SALLE =====
+    
+    FLOOR_PLAN_VERSION_KEY = 'tables:floor_plan_version'
+    
+    @staticmethod
+    def floor_plan_queryset(queryset=None):
+        """
+        Tables avec leur vente en cours et leur prochaine réservation préchargées
+        
+        Trois requêtes au total (tables, ventes ouvertes, réservations à venir),
+        lues par Table.current_sale et TableListSerializer via open_sales et
+        upcoming_reservations.
+        """
+        from django.db.models import Prefetch
+        
+        if queryset is None:
+            queryset = Table.objects.filter(is_active=True)
+        
+        return queryset.prefetch_related(
+            Prefetch(
+                'sales',
+                queryset=Sale.objects.filter(
+                    status__in=Table.OPEN_SALE_STATUSES
+                ).order_by('-created_at'),
+                to_attr='open_sales'
+            ),
+            Prefetch(
+                'reservations',
+                queryset=TableReservation.objects.filter(
+                    status='confirmed',
+                    reservation_date__gte=timezone.localdate()
+                ).order_by('reservation_date', 'reservation_time'),
+                to_attr='upcoming_reservations'
+            )
+        )
+    
+    @staticmethod
+    def get_floor_plan_version() -> int:
+        """
+        Version du plan de salle, horodatée à sa création : après éviction de
+        la clé, elle ne peut pas retrouver la version d'un plan encore en cache
+        """
+        from django.core.cache import cache
+        
+        return cache.get_or_set(TableService.FLOOR_PLAN_VERSION_KEY, time_ns, None)
+    
+    @staticmethod
+    def bump_floor_plan_version():
+        """Invalide le plan de salle en cache (nouvelle version)"""
+        from django.core.cache import cache
+        
+        try:
+            cache.incr(TableService.FLOOR_PLAN_VERSION_KEY)
+        except ValueError:
+            cache.add(TableService.FLOOR_PLAN_VERSION_KEY, time_ns(), None)
+    
+    @staticmethod
+    def get_floor_plan() -> List[Dict]:
+        """
+        Plan de salle sérialisé (TableListSerializer), mis en cache
+        
+        La clé dépend du compteur de version, incrémenté à chaque modification
+        d'une table, vente ou réservation, et de la date du jour.
+        """
+        from django.conf import settings
+        from django.core.cache import cache
+        from .serializers import TableListSerializer
+        
+        cache_key = (
+            f"tables:floor_plan:{TableService.get_floor_plan_version()}:"
+            f"{timezone.localdate().isoformat()}"
+        )
+        floor_plan = cache.get(cache_key)
+        if floor_plan is None:
+            floor_plan = TableListSerializer(TableService.floor_plan_queryset(), many=True).data
+            cache.set(cache_key, floor_plan, getattr(settings, 'FLOOR_PLAN_CACHE_TIMEOUT', 60))
+        return floor_plan
+    
+    @staticmethod
+    def get_floor_plan_table(table_id: int) -> Dict:
+        """Données d'une table au format du plan de salle (3 requêtes)"""
+        from .serializers import TableListSerializer
+        
+        table = TableService.floor_plan_queryset(Table.objects.filter(pk=table_id)).get()
+        return TableListSerializer(table).data
 
 
 class ReservationService:
@@ -304,7 +376,9 @@ class ReservationService:
             }
         """
         try:
-            table = Table.objects.get(id=table_id, is_active=True)
+            # Verrou sur la table : deux réservations simultanées ne peuvent
+            # pas passer la vérification des conflits en même temps
+            table = Table.objects.select_for_update().get(id=table_id, is_active=True)
             
             # Vérifier la capacité
             if party_size > table.capacity:
@@ -317,26 +391,16 @@ class ReservationService:
             res_date = datetime.strptime(reservation_date, '%Y-%m-%d').date()
             res_time = datetime.strptime(reservation_time, '%H:%M').time()
             
-            # Vérifier les conflits
-            existing = TableReservation.objects.filter(
-                table=table,
-                reservation_date=res_date,
-                status__in=['confirmed', 'seated']
+            # Vérifier les conflits (chevauchement d'intervalles, une requête)
+            duration_minutes = kwargs.get('duration_minutes', 120)
+            conflict = ReservationAvailabilityService.find_conflict(
+                table, res_date, res_time, duration_minutes
             )
-            
-            for existing_res in existing:
-                # Vérifier le chevauchement (2h de marge)
-                existing_start = existing_res.reservation_time
-                existing_end = (datetime.combine(res_date, existing_start) + 
-                              timedelta(minutes=existing_res.duration_minutes)).time()
-                
-                if (existing_start <= res_time <= existing_end or
-                    res_time <= existing_start <= 
-                    (datetime.combine(res_date, res_time) + timedelta(hours=2)).time()):
-                    return {
-                        'success': False,
-                        'message': f'Conflit avec réservation existante à {existing_start}'
-                    }
+            if conflict:
+                return {
+                    'success': False,
+                    'message': f'Conflit avec réservation existante à {conflict.reservation_time}'
+                }
             
             # Créer la réservation
             reservation = TableReservation.objects.create(
@@ -349,19 +413,16 @@ class ReservationService:
                 customer_phone=kwargs.get('customer_phone'),
                 customer_email=kwargs.get('customer_email'),
                 special_requests=kwargs.get('special_requests'),
-                duration_minutes=kwargs.get('duration_minutes', 120)
+                duration_minutes=duration_minutes
             )
             
-            # Envoyer les notifications de confirmation
+            # Mettre en file d'attente les notifications de confirmation
+            # (envoyées par le worker, hors de la requête)
             from core.notifications import NotificationService
             try:
-                notification_result = NotificationService.send_reservation_confirmation(reservation)
-                if notification_result['email_sent'] or notification_result['sms_sent']:
-                    message = 'Réservation créée avec succès. '
-                    if notification_result['email_sent']:
-                        message += 'Email de confirmation envoyé. '
-                    if notification_result['sms_sent']:
-                        message += 'SMS de confirmation envoyé.'
+                notification_result = NotificationService.queue_reservation_confirmation(reservation)
+                if notification_result['email_queued'] or notification_result['sms_queued']:
+                    message = 'Réservation créée avec succès. Confirmation en cours d\'envoi.'
                 else:
                     message = 'Réservation créée avec succès (notifications non envoyées)'
             except Exception as e:
@@ -0,0 +1,29 @@
+"""
+Signaux d'invalidation du plan de salle et des factures en cache
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .invoice_service import InvoiceService
+from .models import Sale, SaleItem, Table, TableReservation
+from .services import TableService
+
+
+@receiver([post_save, post_delete], sender=Table)
+@receiver([post_save, post_delete], sender=Sale)
+@receiver([post_save, post_delete], sender=TableReservation)
+def invalidate_floor_plan(sender, instance, **kwargs):
+    """Une table, vente ou réservation a changé : nouvelle version du plan de salle"""
+    # Après validation, pour qu'une lecture concurrente pendant la
+    # transaction ne mette pas l'ancien état en cache sous la nouvelle version
+    transaction.on_commit(TableService.bump_floor_plan_version)
+
+
+@receiver([post_save, post_delete], sender=Sale)
+@receiver([post_save, post_delete], sender=SaleItem)
+def invalidate_invoice(sender, instance, **kwargs):
+    """Une vente ou un de ses articles a changé : nouvelle version de la facture"""
+    sale_id = instance.pk if sender is Sale else instance.sale_id
+    transaction.on_commit(lambda: InvoiceService.bump_version(sale_id))
@@ -0,0 +1,99 @@
+"""
+Service de statistiques des ventes
+"""
+
+from decimal import Decimal
+from typing import Dict
+
+from django.db.models import Count, Q, Sum
+
+from .models import Sale
+
+
+class SalesStatsService:
+    """
+    Service pour calculer les compteurs des ventes d'une période
+
+    Les ventes payées (nombre, montants, modes de paiement) sont lues dans
+    les agrégats matérialisés (SalesRollup) en une requête groupée par mode
+    de paiement ; seuls les compteurs et remises des autres statuts sont
+    calculés sur Sale, en un seul aggregate() avec des clauses filter=Q().
+    """
+
+    STATUSES = [choice[0] for choice in Sale.STATUS_CHOICES]
+    UNPAID_STATUSES = [status for status in STATUSES if status != 'paid']
+    PAYMENT_METHODS = [choice[0] for choice in Sale.PAYMENT_METHODS]
+
+    @staticmethod
+    def get_queryset(date_from, date_to=None, server=None):
+        """Ventes d'une période, éventuellement pour un serveur"""
+        queryset = Sale.objects.filter(
+            created_at__date__gte=date_from,
+            created_at__date__lte=date_to or date_from
+        )
+        if server is not None:
+            queryset = queryset.filter(server=server)
+        return queryset
+
+    @staticmethod
+    def get_stats(date_from, date_to=None, server=None) -> Dict:
+        """
+        Compteurs et montants des ventes d'une période (deux requêtes)
+
+        Returns:
+            {
+                'total_sales': int,
+                'by_status': {statut: int},
+                'paid_sales': int,
+                'revenue': Decimal,
+                'discount': Decimal,
+                'total_discount': Decimal (remises de toutes les ventes, tous statuts),
+                'net_revenue': Decimal,
+                'average_sale': Decimal,
+                'payment_methods': {mode: {'count': int, 'total': Decimal}}
+            }
+        """
+        from .rollup_service import SalesRollupService
+
+        by_status = SalesStatsService.get_queryset(date_from, date_to, server).aggregate(
+            unpaid_discount=Sum('discount_amount', filter=~Q(status='paid')),
+            **{status: Count('id', filter=Q(status=status)) for status in SalesStatsService.UNPAID_STATUSES}
+        )
+        unpaid_discount = by_status.pop('unpaid_discount') or Decimal('0.00')
+
+        payment_methods = {
+            method: {'count': 0, 'total': Decimal('0.00')} for method in SalesStatsService.PAYMENT_METHODS
+        }
+        paid_sales, revenue, discount = 0, Decimal('0.00'), Decimal('0.00')
+        rows = (
+            SalesRollupService.get_rollups(date_from, date_to, server)
+            .filter(product__isnull=True)
+            .values('payment_method')
+            .annotate(count=Sum('sales_count'), revenue=Sum('revenue'), discount=Sum('discount'))
+            .order_by()
+        )
+        for row in rows:
+            paid_sales += row['count']
+            revenue += row['revenue']
+            discount += row['discount']
+            if row['payment_method'] in payment_methods:
+                payment_methods[row['payment_method']] = {
+                    'count': row['count'],
+                    'total': row['revenue'] - row['discount']
+                }
+
+        by_status['paid'] = paid_sales
+        by_status = {status: by_status[status] for status in SalesStatsService.STATUSES}
+        net_revenue = revenue - discount
+
+        return {
+            'total_sales': sum(by_status.values()),
+            'by_status': by_status,
+            'paid_sales': paid_sales,
+            'revenue': revenue,
+            'discount': discount,
+            'total_discount': discount + unpaid_discount,
+            'net_revenue': net_revenue,
+            'average_sale': round(net_revenue / paid_sales, 2) if paid_sales else Decimal('0.00'),
+            'payment_methods': payment_methods
+        }
@@ -1,3 +1,526 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from products.models import Category, Product
+from .models import Sale, SaleItem, SalesRollup
+from .rollup_service import SalesRollupService
+from .stats_service import SalesStatsService
+
+
+class SalesTestMixin:
+    """Données communes aux tests des ventes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.server = User.objects.create_user(username='serveur', password='x', role='server')
+        cls.category = Category.objects.create(name='Bières', type='boissons')
+        cls.beer = Product.objects.create(
+            name='Primus', category=cls.category, code='BOI-PRI',
+            purchase_price=Decimal('1000'), selling_price=Decimal('1500'), current_stock=50
+        )
+        cls.soda = Product.objects.create(
+            name='Fanta', category=cls.category, code='BOI-FAN',
+            purchase_price=Decimal('500'), selling_price=Decimal('1000'), current_stock=50
+        )
+
+    def create_sale(self, items, payment_method='cash', discount=Decimal('0.00')):
+        sale = Sale.objects.create(
+            server=self.server, payment_method=payment_method, discount_amount=discount
+        )
+        total = Decimal('0.00')
+        for product, quantity in items:
+            item = SaleItem.objects.create(
+                sale=sale, product=product, quantity=quantity, unit_price=product.selling_price
+            )
+            total += item.total_price
+        sale.subtotal = sale.total_amount = total
+        sale.save()
+        return sale
+
+
+class SalesRollupTests(SalesTestMixin, TestCase):
+    """Tests des agrégats matérialisés des ventes"""
+
+    def test_payment_feeds_rollup(self):
+        self.create_sale([(self.beer, 2), (self.soda, 1)]).mark_as_paid(self.server)
+        self.create_sale([(self.beer, 1)], payment_method='mobile', discount=Decimal('500')).mark_as_paid(self.server)
+        self.create_sale([(self.soda, 4)])  # Non payée
+
+        today = timezone.localdate()
+        totals = SalesRollupService.get_totals(today)
+
+        self.assertEqual(totals['paid_sales'], 2)
+        self.assertEqual(totals['revenue'], Decimal('5500'))
+        self.assertEqual(totals['discount'], Decimal('500'))
+        self.assertEqual(totals['net_revenue'], Decimal('5000'))
+        self.assertEqual(totals['products_sold'], 4)
+        self.assertEqual(totals['cost'], Decimal('3500'))
+        self.assertEqual(totals['profit'], Decimal('2000'))
+
+        payment_methods = {row['payment_method']: row['count'] for row in SalesRollupService.get_payment_methods(today)}
+        self.assertEqual(payment_methods, {'cash': 1, 'mobile': 1})
+
+        top_products = SalesRollupService.get_top_products(today)
+        self.assertEqual(top_products[0], {'product__name': 'Primus', 'quantity_sold': 3, 'revenue': Decimal('4500')})
+
+        hourly = SalesRollupService.get_hourly(today)
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(sum(hour['sales_count'] for hour in hourly), 2)
+
+    def test_cancel_reverses_rollup(self):
+        sale = self.create_sale([(self.beer, 2)])
+        sale.mark_as_paid(self.server)
+        sale.cancel_sale('Erreur de saisie')
+
+        totals = SalesRollupService.get_totals(timezone.localdate())
+        self.assertEqual(totals['paid_sales'], 0)
+        self.assertEqual(totals['revenue'], Decimal('0'))
+        self.assertEqual(totals['products_sold'], 0)
+
+    def test_cancel_reverses_amounts_frozen_at_payment(self):
+        from .models import SalesRollup
+
+        sale = self.create_sale([(self.beer, 2)])
+        sale.mark_as_paid(self.server)
+
+        # Prix d'achat et mode de paiement modifiés après le paiement
+        Product.objects.filter(pk=self.beer.pk).update(purchase_price=Decimal('1200'))
+        Sale.objects.filter(pk=sale.pk).update(payment_method='mobile')
+        Sale.objects.get(pk=sale.pk).cancel_sale()
+
+        totals = SalesRollupService.get_totals(timezone.localdate())
+        self.assertEqual((totals['paid_sales'], totals['cost'], totals['profit']), (0, Decimal('0'), Decimal('0')))
+        self.assertFalse(SalesRollup.objects.filter(payment_method='mobile').exists())
+        self.assertFalse(SalesRollup.objects.filter(sales_count__lt=0).exists())
+
+    def test_second_cancel_is_ignored(self):
+        sale = self.create_sale([(self.beer, 2)])
+        sale.mark_as_paid(self.server)
+        stale = Sale.objects.get(pk=sale.pk)
+
+        sale.cancel_sale()
+        stale.cancel_sale()
+
+        self.beer.refresh_from_db()
+        self.assertEqual(self.beer.current_stock, 50)
+        self.assertEqual(SalesRollupService.get_totals(timezone.localdate())['paid_sales'], 0)
+
+    def test_status_endpoint_and_admin_action_feed_rollup(self):
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+        from rest_framework.test import APIClient
+
+        sale = self.create_sale([(self.beer, 2)])
+        response = APIClient().post(f'/api/sales/{sale.pk}/update-status/', {'status': 'paid'})
+        self.assertEqual(response.status_code, 200)
+
+        admin_sale = self.create_sale([(self.soda, 3)])
+        request = RequestFactory().post('/admin/')
+        request.user = self.server
+        with mock.patch.object(site._registry[Sale], 'message_user'):
+            site._registry[Sale].mark_as_paid(request, Sale.objects.filter(pk=admin_sale.pk))
+
+        totals = SalesRollupService.get_totals(timezone.localdate())
+        self.assertEqual(totals['paid_sales'], 2)
+        self.assertEqual(totals['products_sold'], 5)
+        self.beer.refresh_from_db()
+        self.assertEqual(self.beer.current_stock, 48)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.create_sale([(self.beer, 2), (self.soda, 1)]).mark_as_paid(self.server)
+        self.create_sale([(self.soda, 3)], payment_method='card').mark_as_paid(self.server)
+
+        incremental = sorted(SalesRollup.objects.values_list(
+            'product_id', 'payment_method', 'sales_count', 'quantity_sold', 'revenue', 'cost'
+        ), key=str)
+
+        SalesRollup.objects.all().delete()
+        call_command('rebuild_sales_rollup', stdout=open('/dev/null', 'w'))
+
+        rebuilt = sorted(SalesRollup.objects.values_list(
+            'product_id', 'payment_method', 'sales_count', 'quantity_sold', 'revenue', 'cost'
+        ), key=str)
+        self.assertEqual(rebuilt, incremental)
+
+    def test_hourly_timeline_matches_per_hour_aggregates(self):
+        today = timezone.localdate()
+        for hour, quantity in [(0, 1), (9, 2), (9, 1), (23, 3)]:
+            sale = self.create_sale([(self.beer, quantity)])
+            Sale.objects.filter(pk=sale.pk).update(
+                created_at=timezone.make_aware(datetime.combine(today, time(hour, 30)))
+            )
+            sale.refresh_from_db()
+            sale.mark_as_paid(self.server)
+
+        paid_sales = Sale.objects.filter(status='paid', created_at__date=today)
+        expected = [
+            {
+                'hour': f"{hour:02d}:00",
+                'sales_count': paid_sales.filter(created_at__hour=hour).count(),
+                'revenue': paid_sales.filter(created_at__hour=hour).aggregate(
+                    total=Sum('total_amount'))['total'] or 0
+            }
+            for hour in range(24)
+        ]
+
+        with self.assertNumQueries(1):
+            hourly = SalesRollupService.get_hourly(today)
+
+        self.assertEqual(hourly, expected)
+
+
+class SalesStatsServiceTests(SalesTestMixin, TestCase):
+    """Tests des compteurs de ventes (statuts sur Sale, ventes payées sur SalesRollup)"""
+
+    def test_stats_match_per_status_counts(self):
+        self.create_sale([(self.beer, 2)]).mark_as_paid(self.server)
+        self.create_sale([(self.soda, 1)], payment_method='mobile', discount=Decimal('200')).mark_as_paid(self.server)
+        self.create_sale([(self.beer, 1)])
+        self.create_sale([(self.soda, 2)]).cancel_sale('Client parti')
+
+        today = timezone.localdate()
+        # Statuts non payés sur Sale + ventes payées depuis SalesRollup
+        with self.assertNumQueries(2):
+            stats = SalesStatsService.get_stats(today)
+
+        sales = Sale.objects.filter(created_at__date=today)
+        self.assertEqual(stats['total_sales'], sales.count())
+        for status, _ in Sale.STATUS_CHOICES:
+            self.assertEqual(stats['by_status'][status], sales.filter(status=status).count())
+
+        self.assertEqual(stats['paid_sales'], 2)
+        self.assertEqual(stats['revenue'], Decimal('4000'))
+        self.assertEqual(stats['discount'], Decimal('200'))
+        self.assertEqual(stats['total_discount'], Decimal('200'))
+        self.assertEqual(stats['net_revenue'], Decimal('3800'))
+        self.assertEqual(stats['average_sale'], Decimal('1900'))
+        self.assertEqual(stats['payment_methods']['cash'], {'count': 1, 'total': Decimal('3000')})
+        self.assertEqual(stats['payment_methods']['mobile'], {'count': 1, 'total': Decimal('800')})
+        self.assertEqual(stats['payment_methods']['card'], {'count': 0, 'total': Decimal('0.00')})
+
+    def test_statistics_endpoint_discount_covers_every_sale(self):
+        from rest_framework.test import APIClient
+
+        admin = User.objects.create_user(username='admin', password='x', role='admin')
+        self.create_sale([(self.beer, 2)], discount=Decimal('300')).mark_as_paid(self.server)
+        self.create_sale([(self.soda, 1)], discount=Decimal('100'))
+        self.create_sale([(self.soda, 2)], discount=Decimal('50')).cancel_sale()
+
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/sales/statistics/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['total_discount'], Decimal('450'))
+
+    def test_stats_for_server(self):
+        other = User.objects.create_user(username='autre', password='x', role='server')
+        self.create_sale([(self.beer, 1)]).mark_as_paid(self.server)
+        Sale.objects.create(server=other, payment_method='cash')
+
+        stats = SalesStatsService.get_stats(timezone.localdate(), server=self.server)
+        self.assertEqual(stats['total_sales'], 1)
+        self.assertEqual(stats['by_status']['pending'], 0)
+
+
+@override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0)
+class SaleListQueryTests(SalesTestMixin, TestCase):
+    """Tests du coût en requêtes de la liste des ventes"""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='gerant', password='x', role='admin'))
+
+    def list_sales(self, queries):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/sales/')
+        self.assertEqual(response.status_code, 200)
+        queries.append(len(context.captured_queries))
+        return response.data['results']
+
+    def test_page_cost_is_constant(self):
+        queries = []
+        for _ in range(2):
+            self.create_sale([(self.beer, 2), (self.soda, 1)])
+        self.list_sales(queries)
+
+        for _ in range(18):
+            self.create_sale([(self.beer, 1), (self.soda, 3)])
+        results = self.list_sales(queries)
+
+        self.assertEqual(len(results), 20)
+        # Ventes annotées + articles + produits (pagination par curseur, sans COUNT)
+        self.assertEqual(queries, [3, 3])
+
+    def test_annotated_counts_and_profit(self):
+        from .serializers import SaleSerializer
+
+        sale = self.create_sale([(self.beer, 2), (self.soda, 3)])
+        annotated = Sale.objects.with_totals().get(pk=sale.pk)
+
+        self.assertEqual(annotated.items_count, 2)
+        self.assertEqual(annotated.profit, Decimal('2500'))
+        self.assertEqual(annotated.profit, sale.profit)
+
+        data = SaleSerializer(annotated).data
+        self.assertEqual(data['items_count'], 2)
+        self.assertEqual(data['profit'], Decimal('2500'))
+
+
+class FloorPlanTests(SalesTestMixin, TestCase):
+    """Tests du plan de salle préchargé et mis en cache"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import Table, TableReservation
+
+        cache.clear()
+        self.tables = [
+            Table.objects.create(number=f'T{index}', capacity=4) for index in range(6)
+        ]
+        for table in self.tables[:3]:
+            Sale.objects.create(table=table, server=self.server, customer_name=f'Client {table.number}')
+            TableReservation.objects.create(
+                table=table, customer_name='Réservation', party_size=2,
+                reservation_date=timezone.localdate(), reservation_time=time(20, 0),
+                status='confirmed', created_by=self.server
+            )
+
+    def test_floor_plan_matches_per_table_serialization(self):
+        from .models import Table
+        from .serializers import TableListSerializer
+        from .services import TableService
+
+        expected = TableListSerializer(Table.objects.filter(is_active=True), many=True).data
+
+        with self.assertNumQueries(3):
+            floor_plan = TableListSerializer(TableService.floor_plan_queryset(), many=True).data
+
+        self.assertEqual(floor_plan, expected)
+        self.assertIsNotNone(floor_plan[0]['current_sale_reference'])
+        self.assertEqual(floor_plan[0]['next_reservation']['customer_name'], 'Réservation')
+
+    def test_snapshot_is_versioned(self):
+        from .services import TableService
+
+        TableService.get_floor_plan()
+        with self.assertNumQueries(0):
+            TableService.get_floor_plan()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tables[5].occupy(self.server)
+
+        floor_plan = TableService.get_floor_plan()
+        self.assertEqual(floor_plan[5]['status'], 'occupied')
+
+    def test_evicted_version_is_never_reused(self):
+        from django.core.cache import cache
+        from .models import Table
+        from .services import TableService
+
+        TableService.get_floor_plan()
+
+        # Version évincée pendant qu'une table change (sans signal)
+        cache.delete(TableService.FLOOR_PLAN_VERSION_KEY)
+        Table.objects.filter(pk=self.tables[5].pk).update(status='occupied')
+        self.assertEqual(TableService.get_floor_plan()[5]['status'], 'occupied')
+
+        cache.delete(TableService.FLOOR_PLAN_VERSION_KEY)
+        TableService.bump_floor_plan_version()
+        Table.objects.filter(pk=self.tables[5].pk).update(status='available')
+        self.assertEqual(TableService.get_floor_plan()[5]['status'], 'available')
+
+
+class ReservationAvailabilityTests(SalesTestMixin, TestCase):
+    """Tests de la disponibilité des tables par intervalles"""
+
+    def setUp(self):
+        from .models import Table
+
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.tables = [Table.objects.create(number=f'R{index:02d}', capacity=4) for index in range(60)]
+
+    def reserve(self, table, day, hour, minute=0, duration=120, status='confirmed'):
+        from .models import TableReservation
+
+        return TableReservation.objects.create(
+            table=table, customer_name='Client', party_size=2,
+            reservation_date=day, reservation_time=time(hour, minute),
+            duration_minutes=duration, status=status, created_by=self.server
+        )
+
+    def test_overlap_across_midnight(self):
+        from .availability_service import ReservationAvailabilityService
+
+        self.reserve(self.tables[0], self.day, 23, 30)
+        next_day = self.day + timedelta(days=1)
+
+        self.assertIsNotNone(
+            ReservationAvailabilityService.find_conflict(self.tables[0], next_day, time(0, 30))
+        )
+        self.assertIsNone(
+            ReservationAvailabilityService.find_conflict(self.tables[0], next_day, time(1, 30))
+        )
+        self.assertIsNone(
+            ReservationAvailabilityService.find_conflict(self.tables[0], self.day, time(21, 30))
+        )
+
+    def test_create_reservation_rejects_conflict(self):
+        from .services import ReservationService, TableService
+
+        self.reserve(self.tables[1], self.day, 19)
+        result = ReservationService.create_reservation(
+            table_id=self.tables[1].id, customer_name='Autre', party_size=2,
+            reservation_date=self.day.isoformat(), reservation_time='20:00', user=self.server
+        )
+        self.assertFalse(result['success'])
+
+        tables = TableService.get_available_tables(2, self.day.isoformat(), '20:00')
+        self.assertNotIn(self.tables[1], tables)
+        self.assertIn(self.tables[2], tables)
+
+    def test_slot_grid(self):
+        from .availability_service import ReservationAvailabilityService
+
+        self.reserve(self.tables[0], self.day, 19)
+        self.reserve(self.tables[1], self.day, 20, 30, duration=60)
+        self.reserve(self.tables[2], self.day, 19, status='cancelled')
+
+        with self.assertNumQueries(2):
+            grid = ReservationAvailabilityService.get_slot_grid(
+                self.day, party_size=2, start=time(18), end=time(23)
+            )
+
+        self.assertEqual(grid['slots'][0], '18:00')
+        self.assertEqual(len(grid['slots']), 10)
+        by_number = {row['table_number']: row['free_slots'] for row in grid['tables']}
+        # 19:00-21:00 bloque les créneaux de 17:30 à 20:30
+        self.assertEqual(by_number['R00'], ['21:00', '21:30', '22:00', '22:30'])
+        # 20:30-21:30 bloque les créneaux de 19:00 à 21:00 (18:30-20:30 ne fait que le toucher)
+        self.assertEqual(by_number['R01'], ['18:00', '18:30', '21:30', '22:00', '22:30'])
+        self.assertEqual(len(by_number['R02']), 10)
+        self.assertEqual(grid['free_pairs'], 4 + 5 + 58 * 10)
+
+    def test_slot_grid_endpoint_is_fast(self):
+        import time as clock
+        from rest_framework.test import APIClient
+
+        for index, table in enumerate(self.tables):
+            self.reserve(table, self.day, 18 + index % 4, 30 * (index % 2))
+
+        client = APIClient()
+        client.force_authenticate(self.server)
+        started = clock.perf_counter()
+        response = client.get('/api/sales/reservations/slots/', {
+            'date': self.day.isoformat(), 'start': '17:00', 'end': '23:00'
+        })
+        elapsed = clock.perf_counter() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['tables']), 60)
+        self.assertLess(elapsed, 0.1)
+
+
+@override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0)
+class InvoiceCacheTests(SalesTestMixin, TestCase):
+    """Tests des factures rendues en cache avec ETag"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        from reports.dashboard import DashboardBroadcaster
+
+        # Diffusion du tableau de bord déclenchée par la vente : pas de thread
+        DashboardBroadcaster.reset()
+        mock.patch.object(DashboardBroadcaster, '_start_timer').start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(DashboardBroadcaster.reset)
+
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sale = self.create_sale([(self.beer, 2), (self.soda, 1)])
+        self.url = f'/api/sales/{self.sale.pk}/invoice/'
+
+    def test_invoice_is_rendered_once_per_version(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['invoice']['summary']['total_amount'], 4000)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SaleItem.objects.filter(sale=self.sale, product=self.soda).delete()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['invoice']['summary']['total_items'], 1)
+
+    def test_html_invoice_and_missing_sale(self):
+        response = self.client.get(self.url, {'format': 'html'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn(self.sale.reference, response.content.decode())
+
+        self.assertEqual(self.client.get('/api/sales/0/invoice/').status_code, 404)
+
+    def test_unsupported_format_is_rejected(self):
+        for format_type in ('pdf', 'api'):
+            response = self.client.get(self.url, {'format': format_type})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+    def test_missing_sale_leaves_no_version_key(self):
+        from django.core.cache import cache
+        from .invoice_service import InvoiceService
+
+        self.assertEqual(self.client.get('/api/sales/0/invoice/').status_code, 404)
+        self.assertIsNone(cache.get(InvoiceService.version_key(0)))
+
+    def test_render_racing_a_change_is_not_cached(self):
+        from django.core.cache import cache
+        from .invoice_service import InvoiceService
+
+        cache.clear()
+        render = InvoiceService.render_invoice
+
+        def render_during_change(sale, format_type='json'):
+            # Modification validée entre la lecture de la vente et le stockage
+            InvoiceService.bump_version(sale.pk)
+            return render(sale, format_type)
+
+        with mock.patch.object(InvoiceService, 'render_invoice', side_effect=render_during_change):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        version = InvoiceService.get_version(self.sale.pk)
+        self.assertIsNotNone(version)
+        self.assertIsNone(cache.get(f"invoices:{self.sale.pk}:{version}:json"))
+
+    def test_render_queries_do_not_depend_on_item_count(self):
+        from .invoice_service import InvoiceService
+
+        # Vente, articles (avec produit et catégorie)
+        with self.assertNumQueries(2):
+            InvoiceService.render_invoice(InvoiceService.invoice_queryset().get(pk=self.sale.pk))
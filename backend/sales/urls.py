@@ -23,6 +23,7 @@ urlpatterns = [
     path('reservations/<int:reservation_id>/seat/', views.seat_reservation, name='seat_reservation'),
     path('reservations/today/', views.todays_reservations, name='todays_reservations'),
     path('reservations/upcoming/', views.upcoming_reservations, name='upcoming_reservations'),
+    path('reservations/slots/', views.reservation_slots, name='reservation_slots'),
 
     # Ventes
     path('', views.SaleListCreateView.as_view(), name='sale_list_create'),
@@ -30,7 +31,7 @@ urlpatterns = [
     path('<int:pk>/update-status/', views.update_sale_status, name='update_status'),
     path('<int:pk>/cancel/', views.cancel_sale, name='cancel_sale'),
     path('<int:sale_id>/mark-paid/', views.mark_sale_as_paid, name='mark_sale_as_paid'),
-    path('<int:pk>/invoice/', views.generate_invoice, name='generate_invoice'),
+    path('<int:pk>/invoice/', views.InvoiceView.as_view(), name='generate_invoice'),
 
     # Statistiques et rapports
     path('statistics/', views.sales_statistics, name='statistics'),
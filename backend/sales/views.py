@@ -1,20 +1,30 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import NotFound
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import viewsets
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.db.models import Sum, Count, Q, Avg
 from django.utils import timezone
 from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from datetime import datetime, timedelta
 from .models import Table, TableReservation, Sale, SaleItem
 from .services import TableService, ReservationService
+from .availability_service import ReservationAvailabilityService
 from .invoice_service import InvoiceService
+from .rollup_service import SalesRollupService
+from .stats_service import SalesStatsService
 from .serializers import (
     TableSerializer, TableListSerializer, TableReservationSerializer,
     SaleSerializer, SaleListSerializer, SaleCreateSerializer, SaleUpdateStatusSerializer
 )
+from core.pagination import KeysetPagination
 from accounts.permissions import IsAuthenticated, IsAdminOrGerant, CanViewSales, CanCreateSales
 
 class TableListCreateView(generics.ListCreateAPIView):
@@ -61,16 +71,18 @@ class TableDetailView(generics.RetrieveUpdateDestroyAPIView):
 class SaleListCreateView(generics.ListCreateAPIView):
     """
     Vue pour lister et créer des ventes
+
+    Liste paginée par curseur (created_at, id), de la plus récente à la
+    plus ancienne (voir core.pagination)
     """
     permission_classes = [CanViewSales]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['status', 'payment_method', 'table', 'server']
     search_fields = ['table__number', 'server__username', 'notes']
-    ordering_fields = ['created_at', 'total_amount', 'final_amount']
-    ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = Sale.objects.select_related('table', 'server').prefetch_related('items__product')
+        queryset = Sale.objects.with_totals().select_related('table', 'server').prefetch_related('items__product')
 
         # Les serveurs ne voient que leurs propres ventes (seulement si authentifié)
         if self.request.user.is_authenticated and hasattr(self.request.user, 'role') and self.request.user.role == 'serveur':
@@ -114,15 +126,9 @@ class SaleListCreateView(generics.ListCreateAPIView):
         """Override create pour retourner les données complètes"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        # La facture est générée (et mise en cache) par SaleCreateSerializer
         sale = serializer.save()
 
-        # Générer automatiquement la facture après la création de la vente
-        try:
-            invoice_data = InvoiceService.auto_generate_invoice(sale)
-            print(f"✅ Facture générée automatiquement pour la vente {sale.reference}")
-        except Exception as e:
-            print(f"⚠️  Erreur génération facture pour {sale.reference}: {e}")
-
         # Utiliser SaleSerializer pour retourner les données complètes avec l'URL de la facture
         response_serializer = SaleSerializer(sale)
         response_data = response_serializer.data
@@ -141,7 +147,7 @@ class SaleDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [CanViewSales]
 
     def get_queryset(self):
-        queryset = Sale.objects.select_related('table', 'server').prefetch_related('items__product')
+        queryset = Sale.objects.with_totals().select_related('table', 'server').prefetch_related('items__product')
 
         # Les serveurs ne voient que leurs propres ventes (seulement si authentifié)
         if (self.request.user.is_authenticated and 
@@ -214,13 +220,19 @@ def update_sale_status(request, pk):
 
     serializer = SaleUpdateStatusSerializer(sale, data=request.data, partial=True)
     if serializer.is_valid():
-        updated_sale = serializer.save()
-
-        # Si la vente est marquée comme payée, libérer la table
-        if updated_sale.status == 'paid' and updated_sale.table:
-            updated_sale.table.is_occupied = False
-            updated_sale.table.current_sale_id = None
-            updated_sale.table.save()
+        new_status = serializer.validated_data.get('status')
+        try:
+            # Paiement et annulation : stock, agrégats et tableau de bord
+            if new_status == 'paid':
+                sale.mark_as_paid(request.user if request.user.is_authenticated else None)
+                updated_sale = sale
+            elif new_status == 'cancelled':
+                sale.cancel_sale()
+                updated_sale = sale
+            else:
+                updated_sale = serializer.save()
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             'message': 'Statut de la vente mis à jour avec succès.',
@@ -316,45 +328,23 @@ def sales_statistics(request):
         except ValueError:
             date_to = today
 
-    # Requête de base
-    queryset = Sale.objects.filter(
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to
-    )
-
     # Les serveurs ne voient que leurs propres statistiques
-    if request.user.role == 'serveur':
-        queryset = queryset.filter(server=request.user)
-
-    # Calculs
-    total_sales = queryset.count()
-    paid_sales = queryset.filter(status='paid').count()
-    pending_sales = queryset.filter(status='pending').count()
-
-    total_revenue = queryset.filter(status='paid').aggregate(
-        total=Sum('final_amount')
-    )['total'] or 0
+    server = request.user if request.user.role == 'serveur' else None
 
-    total_discount = queryset.aggregate(
-        total=Sum('discount_amount')
-    )['total'] or 0
+    # Compteurs par statut et mode de paiement (une seule requête)
+    sales_stats = SalesStatsService.get_stats(date_from, date_to, server)
+    paid_sales = sales_stats['paid_sales']
+    total_revenue = sales_stats['net_revenue']
 
     # Ventes par méthode de paiement
-    payment_methods = queryset.filter(status='paid').values('payment_method').annotate(
-        count=Count('id'),
-        total=Sum('final_amount')
-    )
+    payment_methods = [
+        {'payment_method': method, **figures}
+        for method, figures in sales_stats['payment_methods'].items()
+        if figures['count']
+    ]
 
     # Top produits vendus
-    top_products = SaleItem.objects.filter(
-        sale__in=queryset,
-        sale__status='paid'
-    ).values(
-        'product__name'
-    ).annotate(
-        quantity_sold=Sum('quantity'),
-        revenue=Sum('unit_price')
-    ).order_by('-quantity_sold')[:10]
+    top_products = SalesRollupService.get_top_products(date_from, date_to, server, limit=10)
 
     return Response({
         'period': {
@@ -362,15 +352,15 @@ def sales_statistics(request):
             'date_to': date_to
         },
         'summary': {
-            'total_sales': total_sales,
+            'total_sales': sales_stats['total_sales'],
             'paid_sales': paid_sales,
-            'pending_sales': pending_sales,
+            'pending_sales': sales_stats['by_status']['pending'],
             'total_revenue': total_revenue,
-            'total_discount': total_discount,
-            'average_sale': round(total_revenue / paid_sales, 2) if paid_sales > 0 else 0
+            'total_discount': sales_stats['total_discount'],
+            'average_sale': sales_stats['average_sale']
         },
-        'payment_methods': list(payment_methods),
-        'top_products': list(top_products)
+        'payment_methods': payment_methods,
+        'top_products': top_products
     })
 
 
@@ -396,53 +386,28 @@ def daily_sales_report(request):
         except ValueError:
             report_date = today
 
-    # Ventes du jour
-    daily_sales = Sale.objects.filter(created_at__date=report_date)
+    # Compteurs du jour (une seule requête)
+    sales_stats = SalesStatsService.get_stats(report_date)
 
     # Statistiques générales
     stats = {
         'date': report_date,
-        'total_sales': daily_sales.count(),
-        'paid_sales': daily_sales.filter(status='paid').count(),
-        'pending_sales': daily_sales.filter(status='pending').count(),
-        'total_revenue': daily_sales.filter(status='paid').aggregate(
-            total=Sum('final_amount')
-        )['total'] or 0,
-        'total_discount': daily_sales.aggregate(
-            total=Sum('discount_amount')
-        )['total'] or 0
+        'total_sales': sales_stats['total_sales'],
+        'paid_sales': sales_stats['paid_sales'],
+        'pending_sales': sales_stats['by_status']['pending'],
+        'total_revenue': sales_stats['net_revenue'],
+        'total_discount': sales_stats['total_discount']
     }
 
-    # Ventes par serveur
-    sales_by_server = daily_sales.values(
-        'server__username',
-        'server__first_name',
-        'server__last_name'
-    ).annotate(
-        sales_count=Count('id'),
-        revenue=Sum('final_amount', filter=Q(status='paid'))
-    ).order_by('-revenue')
-
-    # Ventes par heure
-    sales_by_hour = []
-    for hour in range(24):
-        hour_sales = daily_sales.filter(
-            created_at__hour=hour,
-            status='paid'
-        ).aggregate(
-            count=Count('id'),
-            revenue=Sum('final_amount')
-        )
+    # Ventes payées par serveur
+    sales_by_server = SalesRollupService.get_by_server(report_date)
 
-        sales_by_hour.append({
-            'hour': f"{hour:02d}:00",
-            'sales_count': hour_sales['count'] or 0,
-            'revenue': hour_sales['revenue'] or 0
-        })
+    # Ventes payées par heure (un seul GROUP BY, heures vides complétées)
+    sales_by_hour = SalesRollupService.get_hourly(report_date)
 
     return Response({
         'stats': stats,
-        'sales_by_server': list(sales_by_server),
+        'sales_by_server': sales_by_server,
         'sales_by_hour': sales_by_hour
     })
 
@@ -460,6 +425,10 @@ class TableListView(generics.ListAPIView):
     ordering_fields = ['number', 'capacity']
     ordering = ['number']
 
+    def get_queryset(self):
+        # Vente en cours et prochaine réservation préchargées
+        return TableService.floor_plan_queryset(super().get_queryset())
+
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -587,6 +556,48 @@ def upcoming_reservations(request):
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def reservation_slots(request):
+    """
+    Grille des créneaux libres (table, heure) d'une journée
+    
+    Paramètres:
+        date: YYYY-MM-DD (aujourd'hui par défaut)
+        party_size: Nombre de personnes (1 par défaut)
+        duration: Durée d'une réservation en minutes (120 par défaut)
+        step: Pas entre deux créneaux en minutes
+        start, end: Fenêtre HH:MM (horaires d'ouverture par défaut)
+    """
+    try:
+        day = request.GET.get('date')
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else timezone.localdate()
+        start = request.GET.get('start')
+        start = datetime.strptime(start, '%H:%M').time() if start else None
+        end = request.GET.get('end')
+        end = datetime.strptime(end, '%H:%M').time() if end else None
+        party_size = int(request.GET.get('party_size', 1))
+        duration = int(request.GET.get('duration', 120))
+        step = int(request.GET['step']) if request.GET.get('step') else None
+    except ValueError:
+        return Response(
+            {'error': 'Paramètres invalides (date YYYY-MM-DD, heures HH:MM, entiers)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if duration <= 0 or (step is not None and step <= 0):
+        return Response(
+            {'error': 'La durée et le pas doivent être positifs'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    grid = ReservationAvailabilityService.get_slot_grid(
+        day, party_size=party_size, duration_minutes=duration,
+        slot_minutes=step, start=start, end=end
+    )
+    return Response(grid)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def table_analytics(request):
@@ -616,82 +627,75 @@ def sales_stats(request):
         start_date = now.date()
         end_date = start_date
     
-    # Requête des ventes pour la période
-    sales = Sale.objects.filter(
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
-    )
-    
+    # Compteurs par statut et mode de paiement (une seule requête)
+    sales_stats = SalesStatsService.get_stats(start_date, end_date)
+    paid_sales = sales_stats['paid_sales']
+    payment_methods = sales_stats['payment_methods']
+
     # Calculer les statistiques
     stats = {
         'period': period,
         'start_date': start_date,
         'end_date': end_date,
-        'total_sales': sales.count(),
-        'total_revenue': sales.aggregate(total=Sum('total_amount'))['total'] or 0,
-        'average_sale': sales.aggregate(avg=Avg('total_amount'))['avg'] or 0,
-        'completed_sales': sales.filter(status='completed').count(),
-        'pending_sales': sales.filter(status='pending').count(),
-        'cancelled_sales': sales.filter(status='cancelled').count(),
+        'total_sales': sales_stats['total_sales'],
+        'total_revenue': sales_stats['revenue'],
+        'average_sale': sales_stats['revenue'] / paid_sales if paid_sales else 0,
+        'completed_sales': paid_sales,
+        'pending_sales': sales_stats['by_status']['pending'],
+        'cancelled_sales': sales_stats['by_status']['cancelled'],
         'payment_methods': {
-            'cash': sales.filter(payment_method='cash').count(),
-            'card': sales.filter(payment_method='card').count(),
-            'mobile': sales.filter(payment_method='mobile').count(),
+            'cash': payment_methods['cash']['count'],
+            'card': payment_methods['card']['count'],
+            'mobile': payment_methods['mobile']['count'],
         },
-        'top_products': list(
-            SaleItem.objects.filter(sale__in=sales)
-            .values('product__name')
-            .annotate(
-                quantity_sold=Sum('quantity'),
-                revenue=Sum('total_price')
-            )
-            .order_by('-quantity_sold')[:5]
-        )
+        'top_products': SalesRollupService.get_top_products(start_date, end_date, limit=5)
     }
 
     return Response(stats)
 
 
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])  # Temporairement public pour tests
-def generate_invoice(request, pk):
+class InvoiceContentNegotiation(DefaultContentNegotiation):
     """
-    Générer la facture d'une vente
+    ?format= désigne le format de la facture, pas celui du rendu DRF : une
+    valeur inconnue est refusée par la vue (400) et non par la négociation
+    (404). Les erreurs sont rendues en JSON.
     """
-    try:
-        sale = Sale.objects.get(pk=pk)
 
-        # Générer les données de facture
-        invoice_data = InvoiceService.generate_invoice_data(sale)
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return super().select_renderer(request, renderers, format_suffix='json')
 
-        # Retourner selon le format demandé
-        format_type = request.GET.get('format', 'json')
 
-        if format_type == 'html':
-            html_content = InvoiceService.generate_invoice_html(sale)
-            return HttpResponse(html_content, content_type='text/html')
+class InvoiceView(APIView):
+    """
+    Générer la facture d'une vente (?format=json ou html)
 
-        elif format_type == 'json':
-            return Response({
-                'success': True,
-                'invoice': invoice_data
-            })
+    La facture rendue est mise en cache pour chaque version de la vente.
+    La réponse porte ETag et Last-Modified : une requête conditionnelle
+    (If-None-Match, If-Modified-Since) sur une facture inchangée reçoit 304.
+    """
+    permission_classes = [permissions.AllowAny]  # Temporairement public pour tests
+    renderer_classes = [JSONRenderer]
+    content_negotiation_class = InvoiceContentNegotiation
 
-        else:
+    def get(self, request, pk):
+        format_type = request.GET.get('format', 'json')
+        if format_type not in InvoiceService.CONTENT_TYPES:
             return Response(
                 {'error': 'Format non supporté. Utilisez json ou html.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    except Sale.DoesNotExist:
-        return Response(
-            {'error': 'Vente non trouvée'},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    except Exception as e:
-        return Response(
-            {'error': f'Erreur génération facture: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        invoice = InvoiceService.get_rendered_invoice(pk, format_type)
+        if invoice is None:
+            raise NotFound('Vente non trouvée')
+
+        response = HttpResponse(invoice['content'], content_type=invoice['content_type'])
+        response['ETag'] = invoice['etag']
+        response['Last-Modified'] = http_date(invoice['last_modified'])
+        # Le client garde la facture mais la revalide à chaque affichage
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(
+            request, etag=invoice['etag'], last_modified=invoice['last_modified'], response=response
         )
 
 